@@ -0,0 +1,491 @@
+"""Just enough of Red and Discord to run the giveaway cog without a connection.
+
+Every call that would hit Discord or an outside API is counted in ``Stats.api`` and every
+Config driver operation in ``Stats.config``, so a benchmark can report both next to timings.
+"""
+import asyncio
+import pickle
+
+from collections import Counter
+from datetime import datetime, timedelta
+from typing import Dict, List, Optional
+
+import discord
+
+from redbot.core import Config
+
+try:
+    from redbot.core.drivers import BaseDriver
+except ImportError:  # Red 3.5 made the drivers private
+    from redbot.core._drivers import BaseDriver
+
+
+class Stats:
+    def __init__(self):
+        self.api = Counter()
+        self.config = Counter()
+
+    def snapshot(self):
+        return Counter(self.api), Counter(self.config)
+
+
+# ---------------------------------------------Config---------------------------------------------
+
+
+class MemoryDriver(BaseDriver):
+    """A Config driver that keeps everything in a dict and counts every operation"""
+
+    def __init__(self, cog_name: str, identifier: str, stats: Stats):
+        super().__init__(cog_name, identifier)
+        self.stats = stats
+        self.data = {}
+
+    @classmethod
+    async def initialize(cls, **storage_details):
+        pass
+
+    @classmethod
+    async def teardown(cls):
+        pass
+
+    @staticmethod
+    def get_config_details():
+        return {}
+
+    @classmethod
+    async def aiter_cogs(cls):
+        return
+        yield
+
+    async def get(self, identifier_data):
+        self.stats.config["get"] += 1
+        partial = self.data
+        for key in identifier_data.to_tuple():
+            partial = partial[key]
+        return pickle.loads(pickle.dumps(partial, -1))
+
+    async def set(self, identifier_data, value=None):
+        self.stats.config["set"] += 1
+        partial = self.data
+        keys = identifier_data.to_tuple()
+        for key in keys[:-1]:
+            partial = partial.setdefault(key, {})
+        partial[keys[-1]] = pickle.loads(pickle.dumps(value, -1))
+
+    async def clear(self, identifier_data):
+        self.stats.config["clear"] += 1
+        partial = self.data
+        keys = identifier_data.to_tuple()
+        try:
+            for key in keys[:-1]:
+                partial = partial[key]
+            del partial[keys[-1]]
+        except KeyError:
+            pass
+
+
+def memory_config(stats: Stats):
+    """A replacement for Config.get_conf that hands out in-memory configs"""
+
+    def get_conf(cog, identifier: int, force_registration: bool = False, cog_name=None):
+        name = cog_name or type(cog).__name__
+        driver = MemoryDriver(name, str(identifier), stats)
+        return Config(
+            cog_name=name,
+            unique_identifier=str(identifier),
+            driver=driver,
+            force_registration=force_registration,
+        )
+
+    return get_conf
+
+
+# --------------------------------------------Discord---------------------------------------------
+
+
+class FakePermissions:
+    def __getattr__(self, name):
+        return True
+
+
+class FakeTyping:
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *args):
+        return False
+
+
+class FakeUser:
+    def __init__(self, user_id: int, name: str, bot: bool = False):
+        self.id = user_id
+        self.name = name
+        self.bot = bot
+        self.discriminator = "0001"
+        self.global_name = None
+        self.created_at = datetime.utcnow() - timedelta(days=365)
+
+
+class FakeRole:
+    def __init__(self, guild: "FakeGuild", role_id: int, name: str, position: int = 0):
+        self.guild = guild
+        self.id = role_id
+        self.name = name
+        self.position = position
+
+    @property
+    def mention(self):
+        return f"<@&{self.id}>"
+
+    def __str__(self):
+        return self.name
+
+
+class FakeMember(discord.Member):
+    """Passes ``isinstance(member, discord.Member)`` without any connection state"""
+
+    __slots__ = ("_fake_roles", "_stats")
+
+    def __init__(self, guild, user: FakeUser, roles: List[FakeRole], joined_at, stats: Stats):
+        self._user = user
+        self.guild = guild
+        self.nick = None
+        self.joined_at = joined_at
+        self._fake_roles = roles
+        self._stats = stats
+
+    @property
+    def roles(self):
+        return self._fake_roles
+
+    @property
+    def mention(self):
+        return f"<@{self._user.id}>"
+
+    async def send(self, content=None, *, embed=None, **kwargs):
+        self._stats.api["dm"] += 1
+
+    def __repr__(self):
+        return f"<FakeMember id={self.id}>"
+
+
+
+class FakeReaction:
+    PAGE_SIZE = 100
+
+    def __init__(self, message: "FakeMessage", emoji: str):
+        self.message = message
+        self.emoji = emoji
+        self.me = False
+        self._users: Dict[int, FakeMember] = {}
+
+    @property
+    def count(self):
+        return len(self._users) + int(self.me)
+
+    def __str__(self):
+        return self.emoji
+
+    async def users(self, limit=None, after=None):
+        stats = self.message.channel.stats
+        users = sorted(self._users.values(), key=lambda m: m.id)
+        if after is not None:
+            users = [u for u in users if u.id > after.id]
+        if self.me:
+            users.append(self.message.guild.me)
+        for i in range(0, len(users), self.PAGE_SIZE):
+            stats.api["reaction_users"] += 1
+            for user in users[i : i + self.PAGE_SIZE]:
+                yield user
+
+
+class FakeMessage:
+    def __init__(self, channel: "FakeChannel", message_id: int, author, content=None, embed=None):
+        self.channel = channel
+        self.guild = channel.guild
+        self.id = message_id
+        self.author = author
+        self.content = content or ""
+        self.embeds = [embed] if embed else []
+        self.reactions: List[FakeReaction] = []
+        self.reference = None
+
+    @property
+    def jump_url(self):
+        return f"https://discord.com/channels/{self.guild.id}/{self.channel.id}/{self.id}"
+
+    def _reaction(self, emoji: str) -> FakeReaction:
+        for reaction in self.reactions:
+            if reaction.emoji == emoji:
+                return reaction
+        reaction = FakeReaction(self, emoji)
+        self.reactions.append(reaction)
+        return reaction
+
+    async def edit(self, **kwargs):
+        self.channel.stats.api["edit"] += 1
+        if "content" in kwargs:
+            self.content = kwargs["content"]
+        if kwargs.get("embed"):
+            self.embeds = [kwargs["embed"]]
+
+    async def delete(self):
+        self.channel.stats.api["delete"] += 1
+
+    async def pin(self):
+        self.channel.stats.api["pin"] += 1
+
+    async def add_reaction(self, emoji):
+        self.channel.stats.api["add_reaction"] += 1
+        self._reaction(str(emoji)).me = True
+
+    async def remove_reaction(self, emoji, member):
+        self.channel.stats.api["remove_reaction"] += 1
+        reaction = self._reaction(str(emoji))
+        if reaction._users.pop(member.id, None) is not None:
+            self.channel.bot.dispatch(
+                "raw_reaction_remove",
+                FakePayload(self, member.id, str(emoji), None),
+            )
+
+    async def clear_reactions(self):
+        self.channel.stats.api["clear_reactions"] += 1
+        self.reactions = []
+
+    def react(self, member: FakeMember, emoji: str) -> "FakePayload":
+        """A member reacting, returns the raw event Discord would send"""
+        self._reaction(emoji)._users[member.id] = member
+        return FakePayload(self, member.id, emoji, member)
+
+
+class FakePayload:
+    def __init__(self, message: FakeMessage, user_id: int, emoji: str, member):
+        self.message_id = message.id
+        self.channel_id = message.channel.id
+        self.guild_id = message.guild.id
+        self.user_id = user_id
+        self.emoji = emoji
+        self.member = member
+
+
+class FakeChannel:
+    def __init__(self, bot: "FakeBot", guild: "FakeGuild", channel_id: int, name: str):
+        self.bot = bot
+        self.stats = bot.stats
+        self.guild = guild
+        self.id = channel_id
+        self.name = name
+
+    @property
+    def mention(self):
+        return f"<#{self.id}>"
+
+    def is_news(self):
+        return False
+
+    def permissions_for(self, member):
+        return FakePermissions()
+
+    def typing(self):
+        return FakeTyping()
+
+    async def send(self, content=None, *, embed=None, **kwargs):
+        self.stats.api["send"] += 1
+        message = FakeMessage(self, self.bot.next_id(), self.guild.me, content, embed)
+        self.bot.messages[message.id] = message
+        return message
+
+    async def fetch_message(self, message_id: int):
+        self.stats.api["fetch_message"] += 1
+        message = self.bot.messages.get(int(message_id))
+        if message is None:
+            raise discord.NotFound(FakeResponse(404), "Unknown Message")
+        return message
+
+    def get_partial_message(self, message_id: int):
+        return self.bot.messages.get(int(message_id))
+
+    async def create_invite(self, **kwargs):
+        raise discord.Forbidden(FakeResponse(403), "Missing Permissions")
+
+
+class FakeResponse:
+    def __init__(self, status: int):
+        self.status = status
+        self.reason = ""
+        self.headers = {}
+
+
+class FakeGuild:
+    def __init__(self, bot: "FakeBot", guild_id: int, name: str):
+        self.bot = bot
+        self.id = guild_id
+        self.name = name
+        self.owner_id = 0
+        self._members: Dict[int, FakeMember] = {}
+        self._roles: Dict[int, FakeRole] = {}
+        self.text_channels: List[FakeChannel] = []
+        self.default_role = self.add_role("@everyone")
+        self.me = self.add_member("Giveaways", bot=True)
+
+    @property
+    def members(self):
+        return list(self._members.values())
+
+    @property
+    def member_count(self):
+        return len(self._members)
+
+    @property
+    def roles(self):
+        return list(self._roles.values())
+
+    @property
+    def channels(self):
+        return self.text_channels
+
+    def get_member(self, member_id: int) -> Optional[FakeMember]:
+        return self._members.get(member_id)
+
+    def get_role(self, role_id: int) -> Optional[FakeRole]:
+        return self._roles.get(role_id)
+
+    def get_channel(self, channel_id: int) -> Optional[FakeChannel]:
+        return self.bot.channels.get(channel_id)
+
+    def add_role(self, name: str) -> FakeRole:
+        role = FakeRole(self, self.bot.next_id(), name, len(self._roles))
+        self._roles[role.id] = role
+        return role
+
+    def add_member(self, name: str, roles=(), joined_days: int = 30, bot: bool = False):
+        user = FakeUser(self.bot.next_id(), name, bot)
+        roles = [self.default_role, *roles]
+        joined_at = datetime.utcnow() - timedelta(days=joined_days)
+        member = FakeMember(self, user, roles, joined_at, self.bot.stats)
+        self._members[user.id] = member
+        return member
+
+    def add_channel(self, name: str) -> FakeChannel:
+        channel = FakeChannel(self.bot, self, self.bot.next_id(), name)
+        self.text_channels.append(channel)
+        self.bot.channels[channel.id] = channel
+        return channel
+
+    async def invites(self):
+        self.bot.stats.api["invites"] += 1
+        return []
+
+
+class FakeConnection:
+    def __init__(self, bot: "FakeBot"):
+        self.bot = bot
+
+    def _get_message(self, message_id: int):
+        return self.bot.messages.get(int(message_id))
+
+
+class FakeBot:
+    def __init__(self, stats: Stats):
+        self.stats = stats
+        self.loop = asyncio.get_event_loop()
+        self._next_id = 10 ** 17
+        self._guilds: Dict[int, FakeGuild] = {}
+        self.channels: Dict[int, FakeChannel] = {}
+        self.messages: Dict[int, FakeMessage] = {}
+        self.cogs = {}
+        self.user = FakeUser(self.next_id(), "Giveaways", bot=True)
+        self._connection = FakeConnection(self)
+        self._tasks = set()
+
+    def next_id(self) -> int:
+        self._next_id += 1
+        return self._next_id
+
+    def add_guild(self, name: str) -> FakeGuild:
+        guild = FakeGuild(self, self.next_id(), name)
+        self._guilds[guild.id] = guild
+        return guild
+
+    @property
+    def guilds(self):
+        return list(self._guilds.values())
+
+    def get_guild(self, guild_id: int):
+        return self._guilds.get(guild_id)
+
+    def get_channel(self, channel_id: int):
+        return self.channels.get(channel_id)
+
+    def get_cog(self, name: str):
+        return self.cogs.get(name)
+
+    async def wait_until_ready(self):
+        pass
+
+    async def is_owner(self, user):
+        return True
+
+    async def wait_for(self, event, *, check=None, timeout=None):
+        raise asyncio.TimeoutError
+
+    def dispatch(self, event: str, *args):
+        for cog in self.cogs.values():
+            listener = getattr(cog, f"on_{event}", None)
+            if listener:
+                task = asyncio.ensure_future(listener(*args))
+                self._tasks.add(task)
+                task.add_done_callback(self._tasks.discard)
+
+    async def drain(self):
+        """Wait for every dispatched listener to finish"""
+        while self._tasks:
+            await asyncio.gather(*list(self._tasks), return_exceptions=True)
+
+
+class FakeContext:
+    def __init__(self, bot: FakeBot, channel: FakeChannel, author: FakeMember, content: str = ""):
+        self.bot = bot
+        self.guild = channel.guild
+        self.channel = channel
+        self.author = author
+        self.me = channel.guild.me
+        self.prefix = "!"
+        self.message = FakeMessage(channel, bot.next_id(), author, content)
+        self.sent = []
+
+    async def send(self, content=None, *, embed=None, **kwargs):
+        message = await self.channel.send(content, embed=embed)
+        self.sent.append(message)
+        return message
+
+    def typing(self):
+        return FakeTyping()
+
+    async def embed_color(self):
+        return discord.Color.green()
+
+
+# ----------------------------------------------APIs----------------------------------------------
+
+
+class FakeMee6:
+    """Stands in for mee6_py_api.API, with every member at ``level``"""
+
+    def __init__(self, guild: FakeGuild, stats: Stats, level: int, latency: float):
+        self.levels = self
+        self.guild = guild
+        self.stats = stats
+        self.level = level
+        self.latency = latency
+
+    async def get_user_level(self, user_id: int):
+        self.stats.api["mee6"] += 1
+        await asyncio.sleep(self.latency)
+        return self.level
+
+    async def get_leaderboard_page(self, page: int):
+        self.stats.api["mee6"] += 1
+        await asyncio.sleep(self.latency)
+        members = sorted(self.guild._members)[page * 100 : (page + 1) * 100]
+        return {"players": [{"id": str(m), "level": self.level} for m in members]}
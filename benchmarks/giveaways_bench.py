@@ -0,0 +1,258 @@
+"""Benchmarks for the giveaway cog's hot paths against a simulated Discord.
+
+Run from the repository root with Red installed::
+
+    python -m benchmarks.giveaways_bench --giveaways 100 --entrants 1000
+
+Each phase (start, react, end, reroll, list) reports latency percentiles along with the
+Config driver operations and Discord/API calls it made. Use ``--tracemalloc`` for the
+peak Python allocation, it slows everything down so timings from that run are inflated.
+"""
+import argparse
+import asyncio
+import logging
+import random
+import resource
+import sys
+import tempfile
+import time
+import tracemalloc
+import warnings
+
+from collections import Counter
+from pathlib import Path
+from typing import Dict, List
+from unittest import mock
+
+from redbot.core import Config
+
+from giveaways import giveaway as giveaway_module
+
+from .fakes import FakeBot, FakeContext, FakeMee6, Stats, memory_config
+
+EMOJI = "🎉"
+
+
+class Phase:
+    def __init__(self, name: str, stats: Stats):
+        self.name = name
+        self.stats = stats
+        self.samples: List[float] = []
+        self.api = Counter()
+        self.config = Counter()
+
+    def __enter__(self):
+        self._api, self._config = self.stats.snapshot()
+        self._started = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.elapsed = time.perf_counter() - self._started
+        self.api = self.stats.api - self._api
+        self.config = self.stats.config - self._config
+        return False
+
+    async def time(self, coro):
+        started = time.perf_counter()
+        result = await coro
+        self.samples.append(time.perf_counter() - started)
+        return result
+
+
+def percentile(samples: List[float], pct: float) -> float:
+    if not samples:
+        return 0.0
+    ordered = sorted(samples)
+    index = min(len(ordered) - 1, max(0, round(pct / 100 * len(ordered)) - 1))
+    return ordered[index]
+
+
+def report(phases: List[Phase], args, peak_traced: int):
+    print(
+        f"\n{args.giveaways} giveaways x {args.entrants} entrants, "
+        f"{args.members} members, reject rate {args.reject_rate}"
+    )
+    header = f"{'phase':<8}{'count':>8}{'total s':>10}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}{'max ms':>10}"
+    print(header)
+    print("-" * len(header))
+    for phase in phases:
+        samples = phase.samples
+        print(
+            f"{phase.name:<8}{len(samples):>8}{phase.elapsed:>10.2f}"
+            f"{percentile(samples, 50) * 1000:>10.2f}"
+            f"{percentile(samples, 95) * 1000:>10.2f}"
+            f"{percentile(samples, 99) * 1000:>10.2f}"
+            f"{(max(samples) if samples else 0) * 1000:>10.2f}"
+        )
+
+    print("\nConfig operations")
+    for phase in phases:
+        ops = ", ".join(f"{k}={v}" for k, v in sorted(phase.config.items())) or "none"
+        print(f"  {phase.name:<8}{ops}")
+
+    print("\nDiscord/API calls")
+    for phase in phases:
+        calls = ", ".join(f"{k}={v}" for k, v in sorted(phase.api.items())) or "none"
+        print(f"  {phase.name:<8}{calls}")
+
+    # ru_maxrss is in kilobytes on Linux and bytes on macOS
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    rss_mb = rss / 1024 ** 2 if sys.platform == "darwin" else rss / 1024
+    print(f"\nPeak RSS: {rss_mb:.1f} MiB")
+    if peak_traced:
+        print(f"Peak traced allocations: {peak_traced / 1024 ** 2:.1f} MiB")
+
+
+async def run(args) -> List[Phase]:
+    stats = Stats()
+    rng = random.Random(args.seed)
+    bot = FakeBot(stats)
+    guild = bot.add_guild("Benchmark")
+    channels = [guild.add_channel(f"giveaways-{i}") for i in range(args.channels)]
+    required = guild.add_role("Required")
+    multiplier_roles = [guild.add_role(f"Multiplier {i}") for i in range(args.multiplier_roles)]
+
+    members = []
+    for i in range(args.members):
+        roles = [] if rng.random() < args.reject_rate else [required]
+        roles += rng.sample(multiplier_roles, k=min(len(multiplier_roles), rng.randint(0, 3)))
+        members.append(guild.add_member(f"member{i}", roles, joined_days=rng.randint(0, 400)))
+    host = members[0]
+
+    data_path = Path(tempfile.mkdtemp(prefix="giveaways-bench-"))
+    with mock.patch.object(Config, "get_conf", memory_config(stats)), mock.patch.object(
+        giveaway_module, "cog_data_path", lambda cog: data_path
+    ):
+        cog = giveaway_module.Giveaways(bot)
+
+    async def menu(ctx, pages, controls, message=None, page=0, timeout=30.0):
+        # the reaction menu itself is interactive, only its first page is part of the command
+        return await ctx.send(embed=pages[page])
+
+    giveaway_module.menu = menu
+    bot.cogs["Giveaways"] = cog
+
+    for role in multiplier_roles:
+        await cog.config.role(role).multiplier.set(rng.randint(1, 3))
+    await cog.config.guild(guild).dmwin.set(args.dm)
+    await cog.config.guild(guild).dmhost.set(args.dm)
+
+    if args.remote:
+        mee6 = FakeMee6(guild, stats, level=10, latency=args.api_latency)
+        giveaway_module.mee6_api._api = lambda guild_id: mee6
+
+    await cog.registry.wait_until_loaded()
+
+    phases = []
+    messages: Dict[int, dict] = {}
+
+    # ---------------------------------------------start---------------------------------------
+    start = Phase("start", stats)
+    with start:
+        for i in range(args.giveaways):
+            channel = channels[i % len(channels)]
+            ctx = FakeContext(bot, channel, host, f"!g start {args.duration} 1 none Giveaway {i}")
+            requirements = {
+                "mee6": 5 if args.remote else None,
+                "amari": None,
+                "weeklyamari": None,
+                "roles": [required],
+                "joindays": None,
+                "invites": None,
+                "server": None,
+                "shared": None,
+            }
+            await start.time(
+                cog.g_start.callback(
+                    cog, ctx, None, args.duration, "1", requirements, title=f"Giveaway {i}"
+                )
+            )
+            message = ctx.sent[0]
+            messages[message.id] = cog.registry.get(message.id)
+    phases.append(start)
+
+    # let the scheduler do its first round of countdown edits
+    await asyncio.sleep(0.1)
+
+    # ---------------------------------------------react---------------------------------------
+    react = Phase("react", stats)
+    with react:
+        for messageid in messages:
+            message = bot.messages[messageid]
+            for member in rng.sample(members, k=min(args.entrants, len(members))):
+                payload = message.react(member, EMOJI)
+                await react.time(cog.on_raw_reaction_add(payload))
+        await bot.drain()
+    phases.append(react)
+
+    # ----------------------------------------------end----------------------------------------
+    end = Phase("end", stats)
+    with end:
+        for messageid, info in messages.items():
+            await end.time(cog.end_giveaway(messageid, info))
+    phases.append(end)
+
+    # ---------------------------------------------reroll--------------------------------------
+    reroll = Phase("reroll", stats)
+    with reroll:
+        for messageid in list(messages)[: args.rerolls]:
+            ctx = FakeContext(bot, bot.messages[messageid].channel, host, "!g reroll")
+            await reroll.time(cog.reroll.callback(cog, ctx, messageid, 1))
+    phases.append(reroll)
+
+    # ----------------------------------------------list---------------------------------------
+    # the list only shows live giveaways, so start a fresh batch for it
+    for i in range(args.giveaways):
+        channel = channels[i % len(channels)]
+        ctx = FakeContext(bot, channel, host, f"!g start {args.duration} 1 none Listed {i}")
+        await cog.g_start.callback(cog, ctx, None, args.duration, "1", None, title=f"Listed {i}")
+
+    listing = Phase("list", stats)
+    with listing:
+        for member in rng.sample(members, k=min(args.lists, len(members))):
+            ctx = FakeContext(bot, channels[0], member, "!g list true")
+            await listing.time(cog.g_list.callback(cog, ctx, True))
+    phases.append(listing)
+
+    cog.cog_unload()
+    await asyncio.sleep(0)
+    return phases
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--giveaways", type=int, default=10, help="concurrent giveaways")
+    parser.add_argument("--entrants", type=int, default=100, help="reactions per giveaway")
+    parser.add_argument("--members", type=int, default=None, help="guild size, defaults to entrants")
+    parser.add_argument("--channels", type=int, default=5)
+    parser.add_argument("--multiplier-roles", type=int, default=5)
+    parser.add_argument("--reject-rate", type=float, default=0.2, help="share of members missing the required role")
+    parser.add_argument("--duration", type=int, default=3600, help="giveaway length in seconds")
+    parser.add_argument("--rerolls", type=int, default=10)
+    parser.add_argument("--lists", type=int, default=10, help="how many members run g list true")
+    parser.add_argument("--remote", action="store_true", help="add a MEE6 level requirement, lookups are rate limited like in production")
+    parser.add_argument("--api-latency", type=float, default=0.05, help="simulated MEE6 latency in seconds")
+    parser.add_argument("--dm", action="store_true", help="turn on winner and host DMs")
+    parser.add_argument("--tracemalloc", action="store_true")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args(argv)
+    if args.members is None:
+        args.members = args.entrants
+    return args
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    logging.basicConfig(level=logging.WARNING)
+    # is_manager is called without being awaited by the commands
+    warnings.filterwarnings("ignore", message="coroutine 'is_manager' was never awaited")
+
+    if args.tracemalloc:
+        tracemalloc.start()
+    phases = asyncio.run(run(args))
+    peak = tracemalloc.get_traced_memory()[1] if args.tracemalloc else 0
+    report(phases, args, peak)
+
+
+if __name__ == "__main__":
+    main()
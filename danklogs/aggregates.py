@@ -0,0 +1,144 @@
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+
+from .skiplist import SkipList
+from .store import Total
+
+
+class Leaderboard:
+    """Members ranked by one running total, highest first.
+
+    Totals are read from a dict and the ``(-total, member_id)`` order is held in a skip
+    list, so moving one member is O(log n) and a page of the top k costs O(k).
+    """
+
+    def __init__(self, totals: Optional[Dict[int, int]] = None):
+        self._totals: Dict[int, int] = {
+            member_id: total for member_id, total in (totals or {}).items() if total > 0
+        }
+        self._entries = SkipList((-total, member_id) for member_id, total in self._totals.items())
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def get(self, member_id: int) -> int:
+        return self._totals.get(member_id, 0)
+
+    def set(self, member_id: int, total: int) -> None:
+        previous = self._totals.pop(member_id, None)
+        if previous is not None:
+            self._entries.remove((-previous, member_id))
+        if total > 0:
+            self._totals[member_id] = total
+            self._entries.insert((-total, member_id))
+
+    def add(self, member_id: int, amount: int) -> None:
+        self.set(member_id, self.get(member_id) + amount)
+
+    def bulk_add(self, amounts: Dict[int, int]) -> None:
+        """Add to many totals at once, a change to most of the board rebuilds it in one go"""
+        if len(amounts) * 4 < len(self._totals):
+            for member_id, amount in amounts.items():
+                self.add(member_id, amount)
+            return
+        for member_id, amount in amounts.items():
+            total = self._totals.get(member_id, 0) + amount
+            if total > 0:
+                self._totals[member_id] = total
+            else:
+                self._totals.pop(member_id, None)
+        self._entries.build(sorted((-total, member_id) for member_id, total in self._totals.items()))
+
+    def rank(self, member_id: int) -> Optional[int]:
+        total = self._totals.get(member_id)
+        if total is None:
+            return None
+        return self._entries.rank((-total, member_id))
+
+    def top(
+        self, amount: int, include: Optional[Callable[[int], bool]] = None
+    ) -> List[Tuple[int, int]]:
+        """The top ``amount`` (member_id, total) pairs, skipping members ``include`` rejects"""
+        results = []
+        for negative, member_id in self._entries:
+            if len(results) >= amount:
+                break
+            if include and not include(member_id):
+                continue
+            results.append((member_id, -negative))
+        return results
+
+
+class GuildAggregates:
+    """A guild's share and gift totals, built once from the store's totals and then kept
+    up to date by the share handler.
+
+    Gifted and received items are also kept per item as {member id: amount}, so a price
+    change is applied as one batch over the members holding the items that changed,
+    instead of repricing everyone's item dicts.
+    """
+
+    def __init__(self, totals: Iterable[Total], prices: Dict[str, int]):
+        self.prices = dict(prices)
+        self.holdings: Dict[str, Dict[str, Dict[int, int]]] = {"gifted": {}, "received": {}}
+        shared: Dict[int, int] = {}
+        received: Dict[int, int] = {}
+        for total in totals:
+            if not total.item:
+                shared[total.member] = total.sent
+                received[total.member] = total.received
+                continue
+            for kind, amount in (("gifted", total.sent), ("received", total.received)):
+                if amount:
+                    self.holdings[kind].setdefault(total.item, {})[total.member] = amount
+
+        self.boards: Dict[str, Leaderboard] = {
+            "shared": Leaderboard(shared),
+            "received": Leaderboard(received),
+            "giftedvalue": Leaderboard(self._values("gifted")),
+            "receivedvalue": Leaderboard(self._values("received")),
+        }
+
+    def _values(self, kind: str) -> Dict[int, int]:
+        values: Dict[int, int] = {}
+        for item, holders in self.holdings[kind].items():
+            price = self.prices.get(item, 0)
+            if not price:
+                continue
+            for member_id, amount in holders.items():
+                values[member_id] = values.get(member_id, 0) + amount * price
+        return values
+
+    def __getitem__(self, board: str) -> Leaderboard:
+        return self.boards[board]
+
+    def share(self, sender: int, receiver: int, amount: int) -> None:
+        self.boards["shared"].add(sender, amount)
+        self.boards["received"].add(receiver, amount)
+
+    def gift(self, sender: int, receiver: int, item: str, amount: int) -> None:
+        for kind, member_id in (("gifted", sender), ("received", receiver)):
+            holders = self.holdings[kind].setdefault(item, {})
+            holders[member_id] = holders.get(member_id, 0) + amount
+        value = amount * self.prices.get(item, 0)
+        if not value:
+            return
+        self.boards["giftedvalue"].add(sender, value)
+        self.boards["receivedvalue"].add(receiver, value)
+
+    def reprice(self, prices: Dict[str, int]) -> int:
+        """Apply new item values, returns how many member totals changed"""
+        deltas = {
+            item: prices.get(item, 0) - self.prices.get(item, 0)
+            for item in set(prices) | set(self.prices)
+            if prices.get(item, 0) != self.prices.get(item, 0)
+        }
+        self.prices = dict(prices)
+        changed = 0
+        for kind, board in (("gifted", "giftedvalue"), ("received", "receivedvalue")):
+            totals: Dict[int, int] = {}
+            for item, delta in deltas.items():
+                for member_id, amount in self.holdings[kind].get(item, {}).items():
+                    totals[member_id] = totals.get(member_id, 0) + amount * delta
+            self.boards[board].bulk_add(totals)
+            changed += len(totals)
+        return changed
@@ -24,18 +24,23 @@ SOFTWARE.
 
 import asyncio
 import discord
-import contextlib
+import logging
 import re
 import stringcase
-import unicodedata
 
 from datetime import datetime
-from rapidfuzz import process
 from redbot.core import commands, Config
+from redbot.core.data_manager import cog_data_path
 from redbot.core.utils.chat_formatting import pagify
 from redbot.core.utils.menus import DEFAULT_CONTROLS, menu
 from typing import Optional
-from unidecode import unidecode
+from .aggregates import GuildAggregates
+from .names import NameIndex, decode_cancer_name
+from .prices import normalize_item, parse_price_table
+from .store import Total, Transaction, TransactionStore
+from .tracker import InvocationTracker, is_invocation
+
+log = logging.getLogger("red.andycogs.danklogs")
 
 gift_regex = re.compile(
     r"You gave (?P<user>.*?[a-zA-Z0-9_]{2,32})  ?(?P<amount>[0-9,]+) ?(?:(?P<item>[a-zA-Z0-9_]{2,32}))?"
@@ -133,10 +138,35 @@ class DankLogs(commands.Cog):
         self.config.register_member(**default_member)
         self.config.register_channel(**default_channel)
 
+        self.name_indexes = {}
+        self.store = TransactionStore(cog_data_path(self) / "transactions")
+        self.migrated_guilds = set()
+        self.migration_locks = {}
+        self.invocations = InvocationTracker()
+        self.aggregates = {}
+
+    def cog_unload(self):
+        self.store.close()
+
     def comma_format(self, number: int):
         return "{:,}".format(int(number))
 
     async def get_last_message(self, message: discord.Message):
+        reference = message.reference
+        if reference and reference.message_id:
+            referenced = getattr(reference, "resolved", None)
+            if not isinstance(referenced, discord.Message):
+                referenced = self.invocations.get(
+                    message.channel.id, reference.message_id
+                ) or self.bot._connection._get_message(reference.message_id)
+            if referenced and is_invocation(referenced):
+                return referenced
+
+        certain, last_message = self.invocations.last_before(message)
+        if certain:
+            return last_message
+
+        log.debug("No tracked command for %s in %s, checking history", message.id, message.channel.id)
         async for m in message.channel.history(before=message, limit=5):
             if m.author.bot:
                 continue
@@ -145,59 +175,144 @@ class DankLogs(commands.Cog):
             else:
                 return m
 
-    def strip_accs(self, text: str):
-        try:
-            text = unicodedata.normalize("NFKC", text)
-            text = unicodedata.normalize("NFD", text)
-            text = unidecode(text)
-            text = text.encode("ascii", "ignore")
-            text = text.decode("utf-8")
-        except Exception as e:
-            pass
-        return str(text)
-
-    def decode_cancer_name(self, old_name):
-        if not self.is_cancer_name(old_name):
-            return old_name
-        old_name = self.strip_accs(old_name)
-        new_name = re.sub("[^a-zA-Z0-9 \n.]", "", old_name)
-        new_name = " ".join(new_name.split())
-
-        return new_name
-
-    def is_cancer_name(self, text: str) -> bool:
-        for segment in text.split():
-            for char in segment:
-                if not (char.isascii() and char.isalnum()):
-                    return True
-        return False
+    async def get_aggregates(self, guild: discord.Guild) -> GuildAggregates:
+        """The guild's share and gift totals, built from the store once"""
+        aggregates = self.aggregates.get(guild.id)
+        if aggregates is None:
+            store = await self.get_store(guild)
+            prices = await self.config.guild(guild).itemvalues()
+            aggregates = self.aggregates.get(guild.id)
+            if aggregates is None:
+                aggregates = GuildAggregates(store.totals(guild.id), prices)
+                self.aggregates[guild.id] = aggregates
+        return aggregates
+
+    async def get_store(self, guild: discord.Guild) -> TransactionStore:
+        """The transaction store, with the guild's old config logs and totals moved into it.
+
+        Callers wait while a guild is being migrated so nothing is logged halfway through.
+        """
+        if guild.id in self.migrated_guilds:
+            return self.store
+        async with self.migration_locks.setdefault(guild.id, asyncio.Lock()):
+            if guild.id in self.migrated_guilds:
+                return self.store
+            if not self.store.migrated(guild.id):
+                await self.migrate_logs(guild)
+            if not self.store.totals_seeded(guild.id):
+                await self.migrate_totals(guild)
+            if not self.store.has_prices(guild.id):
+                # everything logged before the first recorded change used these values
+                prices = await self.config.guild(guild).itemvalues()
+                self.store.record_prices(guild.id, prices, source="baseline", timestamp=0)
+            self.migrated_guilds.add(guild.id)
+        return self.store
+
+    async def set_item_values(
+        self, guild: discord.Guild, values: dict, author: discord.abc.User, source: str
+    ) -> dict:
+        """Update item values as one price version and reprice the totals in one pass,
+        returns the values that actually changed"""
+        store = await self.get_store(guild)
+        async with self.config.guild(guild).itemvalues() as item_values:
+            changed = {item: value for item, value in values.items() if item_values.get(item) != value}
+            item_values.update(changed)
+            prices = dict(item_values)
+        if not changed:
+            return changed
+        store.record_prices(guild.id, changed, author=author.id, source=source)
+        aggregates = self.aggregates.get(guild.id)
+        if aggregates:
+            aggregates.reprice(prices)
+        return changed
+
+    async def migrate_logs(self, guild: discord.Guild):
+        logs = {
+            int(member_id): data["logs"]
+            for member_id, data in (await self.config.all_members(guild)).items()
+            if data["logs"]
+        }
+        moved = self.store.migrate_legacy(guild.id, logs)
+        for member_id in logs:
+            await self.config.member_from_ids(guild.id, member_id).logs.clear()
+        if moved:
+            log.info("Moved %s log lines out of config for %s", moved, guild.id)
+
+    async def migrate_totals(self, guild: discord.Guild):
+        totals = []
+        for member_id, data in (await self.config.all_members(guild)).items():
+            member_id = int(member_id)
+            if data["shared"] or data["received"]:
+                totals.append(Total(member_id, "", data["shared"], data["received"]))
+            for item in set(data["gifted"]) | set(data["receiveditems"]):
+                gifted = data["gifted"].get(item, 0)
+                received = data["receiveditems"].get(item, 0)
+                if gifted or received:
+                    totals.append(Total(member_id, item, gifted, received))
+        self.store.seed_totals(guild.id, totals)
+
+    def format_transaction(self, guild: discord.Guild, member_id: int, transaction: Transaction) -> str:
+        when = datetime.utcfromtimestamp(transaction.timestamp).strftime("%a, %d %b %Y %H:%M:%S")
+        if transaction.item:
+            what = f"{self.comma_format(transaction.amount)} {transaction.item}"
+        else:
+            what = f"{self.comma_format(transaction.amount)} coins"
+        if transaction.sender == member_id:
+            line = f"At {when}, {what} was {'gifted' if transaction.item else 'shared'} to <@{transaction.receiver}>"
+        else:
+            line = f"At {when}, {what} was received from <@{transaction.sender}>"
+        if transaction.value:
+            line += f" (worth {self.comma_format(transaction.value)} at the time)"
+        if transaction.channel and transaction.message:
+            line += f" [JUMP](https://discord.com/channels/{guild.id}/{transaction.channel}/{transaction.message})"
+        return line
+
+    def format_value_time(self, timestamp: float) -> str:
+        # the baseline version is dated 0 since it covers everything before tracking started
+        if not timestamp:
+            return "Before tracking"
+        return datetime.utcfromtimestamp(timestamp).strftime("%a, %d %b %Y %H:%M:%S")
+
+    async def get_name_index(self, guild: discord.Guild) -> NameIndex:
+        """The guild's name index, built on first use and kept current by the member listeners"""
+        if guild.id not in self.name_indexes:
+            stored = {}
+            for member_id, data in (await self.config.all_members(guild)).items():
+                if data["storedname"]:
+                    stored.setdefault(data["storedname"], int(member_id))
+            if guild.id not in self.name_indexes:
+                self.name_indexes[guild.id] = NameIndex(guild.members, stored)
+        return self.name_indexes[guild.id]
+
+    async def store_name(self, index: NameIndex, member: discord.Member, name: str):
+        if index.stored.get(name) == member.id:
+            return
+        index.set_stored(name, member.id)
+        await self.config.member(member).storedname.set(name)
 
     async def get_fuzzy_member(self, ctx, name):
-        user = discord.utils.get(ctx.guild.members, name=name)
-        if user:
-            await self.config.member(user).storedname.set(name)
-            return user
-        all_users = await self.config.all_members(ctx.guild)
+        index = await self.get_name_index(ctx.guild)
 
-        for user, data in all_users.items():
-            user = ctx.guild.get_member(int(user))
-            if not user:
-                continue
-            if data["storedname"] == name:
+        member_id = index.exact(name)
+        if member_id is not None:
+            user = ctx.guild.get_member(member_id)
+            if user:
+                await self.store_name(index, user, name)
                 return user
 
-        result = []
-        for r in process.extract(
-            name,
-            {m: self.decode_cancer_name(m.name) for m in ctx.guild.members},
-            limit=None,
-            score_cutoff=75,
-        ):
-            result.append((r[2], r[1]))
+        member_id = index.stored_match(name)
+        if member_id is not None:
+            user = ctx.guild.get_member(member_id)
+            if user:
+                return user
 
-            sorted_result = sorted(result, key=lambda r: r[1], reverse=True)
-            await self.config.member(sorted_result[0][0]).storedname.set(name)
-            return sorted_result[0][0]
+        member_id = index.fuzzy(name)
+        if member_id is None:
+            return None
+        user = ctx.guild.get_member(member_id)
+        if user:
+            await self.store_name(index, user, name)
+        return user
 
     @commands.group(aliases=["dls"])
     @commands.mod_or_permissions(manage_guild=True)
@@ -220,10 +335,62 @@ class DankLogs(commands.Cog):
         item_values = await self.config.guild(ctx.guild).itemvalues()
         if item not in item_values:
             return await ctx.send("This item does not exist")
-        item_values[item] = price
-        await self.config.guild(ctx.guild).itemvalues.set(item_values)
+        await self.set_item_values(ctx.guild, {item: price}, ctx.author, "itemvalue")
         await ctx.send(f"Done. The price for **{item}** is now **{price}**")
 
+    @danklogset.command(aliases=["importprices"])
+    async def importvalues(self, ctx):
+        """Import item values from an attached CSV or JSON file
+
+        CSV files have an `item,value` row per item, JSON files are an object of `{"item": value}`.
+        Items that aren't in the file keep their value and new items are added."""
+        if not ctx.message.attachments:
+            return await ctx.send("Attach a CSV or JSON file with the item values")
+        attachment = ctx.message.attachments[0]
+        if attachment.size > 1_000_000:
+            return await ctx.send("That file is too big")
+        try:
+            values = parse_price_table(await attachment.read(), attachment.filename)
+        except ValueError as e:
+            return await ctx.send(str(e))
+        except discord.HTTPException:
+            return await ctx.send("I couldn't download that file")
+
+        item_values = await self.config.guild(ctx.guild).itemvalues()
+        added = sum(1 for item in values if item not in item_values)
+        changed = await self.set_item_values(ctx.guild, values, ctx.author, attachment.filename)
+        await ctx.send(
+            f"Imported {len(values)} item values: {len(changed) - added} updated, {added} added, {len(values) - len(changed)} unchanged"
+        )
+
+    @danklogset.command(aliases=["pricehistory"])
+    async def valuehistory(self, ctx, item: str = None):
+        """View the latest item value changes, or every value an item has had"""
+        store = await self.get_store(ctx.guild)
+        if item:
+            item = normalize_item(item)
+            history = store.price_history(ctx.guild.id, item)
+            if not history:
+                return await ctx.send("This item has never had a value")
+            lines = [
+                f"{self.format_value_time(timestamp)}: {self.comma_format(value)}"
+                for timestamp, value in history
+            ]
+            title = f"Value history for {item}"
+        else:
+            lines = [
+                f"#{version.version} {self.format_value_time(version.timestamp)}: "
+                f"{version.changes} items from {version.source or 'unknown'}"
+                + (f" by <@{version.author}>" if version.author else "")
+                for version in store.price_versions(ctx.guild.id)
+            ]
+            title = "Item value changes"
+
+        for page in pagify("\n".join(lines)):
+            await ctx.send(
+                embed=discord.Embed(title=title, description=page, color=await ctx.embed_color())
+            )
+
     @commands.group(aliases=["dankstats"], invoke_without_command=True)
     async def dankinfo(self, ctx, user: Optional[discord.Member] = None):
         """View info for yourself or a user from dankmemer"""
@@ -359,44 +526,64 @@ class DankLogs(commands.Cog):
             await ctx.send(embed=e)
 
     @dankinfo.command()
-    async def receivedamount(self, ctx, user: Optional[discord.Member] = None):
-        """View the price of the items you have received, the list is from a custom list and can be changed using `[p]danklogset itemprice <item> <price>`"""
-        total_amount = 0
+    async def receivedamount(
+        self, ctx, user: Optional[discord.Member] = None, at_gift_time: bool = False
+    ):
+        """View the price of the items you have received, the list is from a custom list and can be changed using `[p]danklogset itemprice <item> <price>`
+
+        Pass `True` after the user to price every gift with the values from when it was made, this only covers gifts logged since the transaction log was added"""
         if not user:
             user = ctx.author
 
-        item_prices = await self.config.guild(ctx.guild).itemvalues()
-        received = await self.config.member(user).receiveditems()
+        if at_gift_time:
+            store = await self.get_store(ctx.guild)
+            total_amount = store.value_at_time(ctx.guild.id, user.id, received=True)
+            if not total_amount:
+                return await ctx.send("You haven't received any items")
+            return await ctx.send(
+                "You have received **{}** worth of items in **{}**, priced when they were gifted".format(
+                    self.comma_format(total_amount), ctx.guild.name
+                )
+            )
 
-        if not received:
+        board = (await self.get_aggregates(ctx.guild))["receivedvalue"]
+        total_amount = board.get(user.id)
+        if not total_amount:
             return await ctx.send("You haven't received any items")
-        with contextlib.suppress(KeyError):
-            for item, amount in received.items():
-                total_amount += amount * item_prices[item]
         return await ctx.send(
-            "You have received **{}** worth of items in **{}**".format(
-                self.comma_format(total_amount), ctx.guild.name
+            "You have received **{}** worth of items in **{}** (rank #{})".format(
+                self.comma_format(total_amount), ctx.guild.name, board.rank(user.id)
             )
         )
 
     @dankinfo.command()
-    async def giftedamount(self, ctx, user: Optional[discord.Member] = None):
-        """View the price of the items you have given, the list is from a custom list and can be changed using `[p]danklogset itemprice <item> <price>`"""
-        total_amount = 0
+    async def giftedamount(
+        self, ctx, user: Optional[discord.Member] = None, at_gift_time: bool = False
+    ):
+        """View the price of the items you have given, the list is from a custom list and can be changed using `[p]danklogset itemprice <item> <price>`
+
+        Pass `True` after the user to price every gift with the values from when it was made, this only covers gifts logged since the transaction log was added"""
         if not user:
             user = ctx.author
 
-        item_prices = await self.config.guild(ctx.guild).itemvalues()
-        gifted = await self.config.member(user).gifted()
+        if at_gift_time:
+            store = await self.get_store(ctx.guild)
+            total_amount = store.value_at_time(ctx.guild.id, user.id, received=False)
+            if not total_amount:
+                return await ctx.send("You haven't gifted out anything")
+            return await ctx.send(
+                "You have shared **{}** worth of items in **{}**, priced when they were gifted".format(
+                    self.comma_format(total_amount), ctx.guild.name
+                )
+            )
 
-        if not gifted:
+        board = (await self.get_aggregates(ctx.guild))["giftedvalue"]
+        total_amount = board.get(user.id)
+        if not total_amount:
             return await ctx.send("You haven't gifted out anything")
-        with contextlib.suppress(KeyError):
-            for item, amount in gifted.items():
-                total_amount += amount * item_prices[item]
         return await ctx.send(
-            "You have shared **{}** worth of items in **{}**".format(
-                self.comma_format(total_amount), ctx.guild.name
+            "You have shared **{}** worth of items in **{}** (rank #{})".format(
+                self.comma_format(total_amount), ctx.guild.name, board.rank(user.id)
             )
         )
 
@@ -475,48 +662,48 @@ class DankLogs(commands.Cog):
 
     @dankinfo.command()
     @commands.mod_or_permissions(manage_guild=True)
-    async def logs(self, ctx, user: Optional[discord.Member] = None):
+    async def logs(self, ctx, user: Optional[discord.Member] = None, page: int = 1):
+        """View a user's shares and gifts, newest first"""
         if not user:
             user = ctx.author
 
-        logs = await self.config.member(user).logs()
+        per_page = 10
+        store = await self.get_store(ctx.guild)
+        count = store.count(ctx.guild.id, user.id)
+        legacy_count = store.legacy_count(ctx.guild.id, user.id)
+        total = count + legacy_count
 
-        if len(logs) == 0:
+        if total == 0:
             return await ctx.send("This user has no logs to show")
 
-        logs = "\n\n".join(logs[::-1])
+        pages = (total + per_page - 1) // per_page
+        page = min(max(page, 1), pages)
+        offset = (page - 1) * per_page
 
-        if len(logs) >= 2048:
-            pages = list(pagify(logs))
-            embeds = []
-            for i, p in enumerate(pages, start=1):
-                e = discord.Embed(
-                    title=f"Logs for {user}",
-                    description=p,
-                    color=await ctx.embed_color(),
-                )
-                e.set_footer(text=f"Page {i} out of {len(pages)} pages")
-                embeds.append(e)
-            await menu(ctx, embeds, DEFAULT_CONTROLS)
-        else:
-            await ctx.send(
-                embed=discord.Embed(
-                    title=f"Logs for {user}",
-                    description=logs,
-                    color=await ctx.embed_color(),
-                )
+        lines = [
+            self.format_transaction(ctx.guild, user.id, transaction)
+            for transaction in store.history(ctx.guild.id, user.id, per_page, offset)
+        ]
+        if len(lines) < per_page:
+            lines += store.legacy(
+                ctx.guild.id, user.id, per_page - len(lines), max(offset - count, 0)
             )
 
+        e = discord.Embed(
+            title=f"Logs for {user}",
+            description="\n\n".join(lines)[:2048],
+            color=await ctx.embed_color(),
+        )
+        e.set_footer(text=f"Page {page} out of {pages} pages")
+        await ctx.send(embed=e)
+
     @dankinfo.command(aliases=["mostshared"])
     async def topshared(self, ctx, amount: int = 10):
         """View the people in the server that have shared the most COINS"""
-        member_data = await self.config.all_members(ctx.guild)
-        member_list = [
-            (member, data["shared"])
-            for member, data in member_data.items()
-            if data["shared"] > 0 and ctx.guild.get_member(int(member)) is not None
-        ]
-        ordered_list = sorted(member_list, key=lambda m: m[1], reverse=True)[:amount]
+        board = (await self.get_aggregates(ctx.guild))["shared"]
+        ordered_list = board.top(
+            amount, include=lambda member_id: ctx.guild.get_member(member_id) is not None
+        )
 
         if not ordered_list:
             return await ctx.send("I have no tracked data for this server")
@@ -551,6 +738,54 @@ class DankLogs(commands.Cog):
                 )
             )
 
+    @commands.Cog.listener()
+    async def on_member_join(self, member: discord.Member):
+        index = self.name_indexes.get(member.guild.id)
+        if index is not None:
+            index.add(member)
+
+    @commands.Cog.listener()
+    async def on_member_remove(self, member: discord.Member):
+        index = self.name_indexes.get(member.guild.id)
+        if index is not None:
+            index.remove(member.id)
+
+    @commands.Cog.listener()
+    async def on_member_update(self, before: discord.Member, after: discord.Member):
+        if before.name == after.name:
+            return
+        index = self.name_indexes.get(after.guild.id)
+        if index is not None:
+            index.add(after)
+
+    @commands.Cog.listener()
+    async def on_user_update(self, before: discord.User, after: discord.User):
+        # username changes are sent once per user rather than per guild
+        if before.name == after.name:
+            return
+        for guild_id, index in self.name_indexes.items():
+            if after.id not in index:
+                continue
+            guild = self.bot.get_guild(guild_id)
+            member = guild.get_member(after.id) if guild else None
+            if member:
+                index.add(member)
+
+    @commands.Cog.listener()
+    async def on_guild_remove(self, guild: discord.Guild):
+        self.name_indexes.pop(guild.id, None)
+
+    @commands.Cog.listener()
+    async def on_guild_channel_delete(self, channel):
+        self.invocations.forget(channel.id)
+
+    @commands.Cog.listener()
+    async def on_message(self, message):
+        # every message counts towards the window, including ones that run bot commands,
+        # this is dispatched before on_message_without_command looks at the window
+        if message.guild:
+            self.invocations.observe(message)
+
     @commands.Cog.listener()
     async def on_message_without_command(self, message):
         if not message.author.id == 270904126974590976:
@@ -561,6 +796,8 @@ class DankLogs(commands.Cog):
         if await self.config.channel(message.channel).ignored():
             return
         last_message = await self.get_last_message(message)
+        if not last_message:
+            return
         filtered_content = (
             message.content.strip()
             .lstrip(f"<@{last_message.author.id}>")
@@ -568,7 +805,7 @@ class DankLogs(commands.Cog):
             .replace("⏣ ", "")
             .strip()
         )
-        filtered_content = self.decode_cancer_name(filtered_content)
+        filtered_content = decode_cancer_name(filtered_content)
 
         match = re.match(gift_regex, filtered_content)
         if not match:
@@ -589,27 +826,29 @@ class DankLogs(commands.Cog):
         if not shared_user:
             return
 
-        shared_user_data = await self.config.member(shared_user).all()
-        user_data = await self.config.member(last_message.author).all()
+        author = last_message.author
+        author_config = self.config.member(author)
+        receiver_config = self.config.member(shared_user)
+        store = await self.get_store(message.guild)
 
         if last_message.content.lower().startswith(
             "pls share"
         ) or last_message.content.lower().startswith("pls give"):
-            if str(shared_user.id) not in user_data["sharedusers"]:
-                user_data["sharedusers"][str(shared_user.id)] = 0
-
-            user_data["sharedusers"][str(shared_user.id)] += 1
-            user_data["shared"] += amount
-            shared_user_data["received"] += amount
-            formatted_now = datetime.utcnow().strftime("%a, %d %b %Y %H:%M:%S")
-            user_data["logs"].append(
-                f"At {formatted_now}, {self.comma_format(amount)} was shared to {shared_user} (ID of {shared_user.id})"
+            times = await author_config.sharedusers.get_raw(str(shared_user.id), default=0)
+            await author_config.sharedusers.set_raw(str(shared_user.id), value=times + 1)
+            await author_config.shared.set(await author_config.shared() + amount)
+            await receiver_config.received.set(await receiver_config.received() + amount)
+            aggregates = self.aggregates.get(message.guild.id)
+            if aggregates:
+                aggregates.share(author.id, shared_user.id, amount)
+            store.add(
+                message.guild.id,
+                author.id,
+                shared_user.id,
+                amount,
+                channel=message.channel.id,
+                message=message.id,
             )
-            shared_user_data["logs"].append(
-                f"At {formatted_now}, {self.comma_format(amount)} was received from {last_message.author} (ID of {last_message.author.id})"
-            )
-            await self.config.member(shared_user).set(shared_user_data)
-            await self.config.member(last_message.author).set(user_data)
 
             channel = await self.config.guild(message.guild).channel()
             channel = self.bot.get_channel(channel)
@@ -617,40 +856,39 @@ class DankLogs(commands.Cog):
                 return
             e = discord.Embed(
                 title="Dankmemer Logs",
-                description=f"{last_message.author.mention} shared {self.comma_format(amount)} coins to {shared_user.mention} in {message.channel.mention}\n [JUMP]({message.jump_url})",
+                description=f"{author.mention} shared {self.comma_format(amount)} coins to {shared_user.mention} in {message.channel.mention}\n [JUMP]({message.jump_url})",
             )
             await channel.send(embed=e)
 
         else:
-            if str(shared_user.id) not in user_data["giftedusers"]:
-                user_data["giftedusers"][str(shared_user.id)] = 0
-
-            user_data["giftedusers"][str(shared_user.id)] += 1
             item = match.group("item")
-            if item not in user_data["gifted"]:
-                user_data["gifted"][item] = 0
-            user_data["gifted"][item] += amount
-
-            if item not in shared_user_data["receiveditems"]:
-                shared_user_data["receiveditems"][item] = 0
-            shared_user_data["receiveditems"][item] += amount
-
-            formatted_now = datetime.utcnow().strftime("%a, %d %b %Y %H:%M:%S")
-            shared_user_data["logs"].append(
-                f"On {formatted_now}, {last_message.author} gave {self.comma_format(amount)} {item}"
-            )
-            user_data["logs"].append(
-                f"On {formatted_now}, {self.comma_format(amount)} {item} was sent to {shared_user}"
+            if not item:
+                return
+            times = await author_config.giftedusers.get_raw(str(shared_user.id), default=0)
+            await author_config.giftedusers.set_raw(str(shared_user.id), value=times + 1)
+            gifted = await author_config.gifted.get_raw(item, default=0)
+            await author_config.gifted.set_raw(item, value=gifted + amount)
+            received = await receiver_config.receiveditems.get_raw(item, default=0)
+            await receiver_config.receiveditems.set_raw(item, value=received + amount)
+            aggregates = self.aggregates.get(message.guild.id)
+            if aggregates:
+                aggregates.gift(author.id, shared_user.id, item, amount)
+            store.add(
+                message.guild.id,
+                author.id,
+                shared_user.id,
+                amount,
+                item=item,
+                channel=message.channel.id,
+                message=message.id,
             )
 
             channel = await self.config.guild(message.guild).channel()
             channel = self.bot.get_channel(channel)
-            await self.config.member(shared_user).set(shared_user_data)
-            await self.config.member(last_message.author).set(user_data)
             if not channel:
                 return
             e = discord.Embed(
                 title="Dankmemer Logs",
-                description=f"{last_message.author.mention} gave {amount} {item} to {shared_user.mention} in {message.channel.mention}\n [JUMP]({message.jump_url})",
+                description=f"{author.mention} gave {amount} {item} to {shared_user.mention} in {message.channel.mention}\n [JUMP]({message.jump_url})",
             )
             await channel.send(embed=e)
@@ -0,0 +1,132 @@
+import re
+import unicodedata
+
+from collections import Counter
+from typing import Dict, Iterable, List, Optional, Set
+
+import discord
+
+from rapidfuzz import process
+from unidecode import unidecode
+
+
+def strip_accs(text: str) -> str:
+    try:
+        text = unicodedata.normalize("NFKC", text)
+        text = unicodedata.normalize("NFD", text)
+        text = unidecode(text)
+        text = text.encode("ascii", "ignore")
+        text = text.decode("utf-8")
+    except Exception:
+        pass
+    return str(text)
+
+
+def is_cancer_name(text: str) -> bool:
+    for segment in text.split():
+        for char in segment:
+            if not (char.isascii() and char.isalnum()):
+                return True
+    return False
+
+
+def decode_cancer_name(old_name: str) -> str:
+    if not is_cancer_name(old_name):
+        return old_name
+    old_name = strip_accs(old_name)
+    new_name = re.sub("[^a-zA-Z0-9 \n.]", "", old_name)
+    new_name = " ".join(new_name.split())
+
+    return new_name
+
+
+def ngrams(text: str, n: int = 3) -> Set[str]:
+    text = f" {text.lower()} "
+    return {text[i : i + n] for i in range(max(len(text) - n + 1, 1))}
+
+
+class NameIndex:
+    """A guild's member names, normalized once and kept current from member events.
+
+    Exact lookups go through hash maps of usernames and stored names. Fuzzy lookups
+    only score the members whose normalized names share the most trigrams with the
+    query instead of the whole guild.
+    """
+
+    def __init__(
+        self,
+        members: Iterable[discord.Member] = (),
+        stored: Optional[Dict[str, int]] = None,
+        candidates: int = 25,
+    ):
+        self.candidates = candidates
+        self.names: Dict[int, str] = {}
+        self._raw: Dict[int, str] = {}
+        self.by_name: Dict[str, Set[int]] = {}
+        self.grams: Dict[str, Set[int]] = {}
+        self.stored: Dict[str, int] = dict(stored or {})
+        for member in members:
+            self.add(member)
+
+    def __len__(self) -> int:
+        return len(self.names)
+
+    def __contains__(self, member_id: int) -> bool:
+        return member_id in self.names
+
+    def add(self, member: discord.Member) -> None:
+        if member.id in self.names:
+            self.remove(member.id)
+        normalized = decode_cancer_name(member.name)
+        self.names[member.id] = normalized
+        self.by_name.setdefault(member.name, set()).add(member.id)
+        for gram in ngrams(normalized):
+            self.grams.setdefault(gram, set()).add(member.id)
+        self._raw[member.id] = member.name
+
+    def remove(self, member_id: int) -> None:
+        normalized = self.names.pop(member_id, None)
+        if normalized is None:
+            return
+        raw = self._raw.pop(member_id)
+        self._discard(self.by_name, raw, member_id)
+        for gram in ngrams(normalized):
+            self._discard(self.grams, gram, member_id)
+
+    @staticmethod
+    def _discard(mapping: Dict[str, Set[int]], key: str, member_id: int) -> None:
+        ids = mapping.get(key)
+        if ids is None:
+            return
+        ids.discard(member_id)
+        if not ids:
+            del mapping[key]
+
+    def set_stored(self, name: str, member_id: int) -> None:
+        self.stored[name] = member_id
+
+    def exact(self, name: str) -> Optional[int]:
+        """A member whose username is ``name``"""
+        ids = self.by_name.get(name)
+        return next(iter(ids)) if ids else None
+
+    def stored_match(self, name: str) -> Optional[int]:
+        """The member ``name`` was last matched to"""
+        member_id = self.stored.get(name)
+        if member_id is not None and member_id in self.names:
+            return member_id
+        return None
+
+    def shortlist(self, name: str) -> List[int]:
+        """The members sharing the most trigrams with ``name``, best first"""
+        overlap = Counter()
+        for gram in ngrams(decode_cancer_name(name)):
+            overlap.update(self.grams.get(gram, ()))
+        return [member_id for member_id, _ in overlap.most_common(self.candidates)]
+
+    def fuzzy(self, name: str, score_cutoff: int = 75) -> Optional[int]:
+        choices = {member_id: self.names[member_id] for member_id in self.shortlist(name)}
+        if not choices:
+            return None
+        best = process.extractOne(name, choices, score_cutoff=score_cutoff)
+        return best[2] if best else None
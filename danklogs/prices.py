@@ -0,0 +1,62 @@
+import csv
+import io
+import json
+
+from typing import Dict
+
+
+def normalize_item(item: str) -> str:
+    return "".join(str(item).lower().split())
+
+
+def parse_value(value) -> int:
+    if isinstance(value, str):
+        value = value.replace(",", "").replace("⏣", "").strip()
+    value = int(value)
+    if value < 0:
+        raise ValueError("Item values can't be negative")
+    return value
+
+
+def parse_price_table(data: bytes, filename: str = "") -> Dict[str, int]:
+    """Read ``{item: value}`` from a JSON object, a JSON list of ``{"item", "value"}``
+    objects or CSV rows of ``item,value`` with an optional header.
+
+    Raises ValueError with a message that can be shown to the user.
+    """
+    try:
+        text = data.decode("utf-8-sig").strip()
+    except UnicodeDecodeError:
+        raise ValueError("The file has to be UTF-8 text")
+    if not text:
+        raise ValueError("The file is empty")
+
+    prices = {}
+    if filename.lower().endswith(".json") or text[0] in "[{":
+        try:
+            parsed = json.loads(text)
+        except json.JSONDecodeError as e:
+            raise ValueError(f"Invalid JSON: {e}")
+        if isinstance(parsed, dict):
+            rows = parsed.items()
+        elif isinstance(parsed, list):
+            try:
+                rows = [(row["item"], row["value"]) for row in parsed]
+            except (KeyError, TypeError):
+                raise ValueError('Every entry in a JSON list needs an "item" and a "value"')
+        else:
+            raise ValueError("The JSON has to be an object or a list")
+    else:
+        rows = [row for row in csv.reader(io.StringIO(text)) if row and any(row)]
+        if rows and rows[0][0].strip().lower() == "item":
+            rows = rows[1:]
+
+    for line, row in enumerate(rows, start=1):
+        try:
+            item, value = row
+            prices[normalize_item(item)] = parse_value(value)
+        except (TypeError, ValueError):
+            raise ValueError(f"Entry {line} isn't a valid `item, value` pair")
+    if not prices:
+        raise ValueError("No item values were found")
+    return prices
@@ -0,0 +1,277 @@
+import sqlite3
+
+from datetime import datetime
+from pathlib import Path
+from typing import Dict, Iterable, List, NamedTuple, Optional, Tuple
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS transactions (
+    id INTEGER PRIMARY KEY,
+    timestamp REAL NOT NULL,
+    sender INTEGER NOT NULL,
+    receiver INTEGER NOT NULL,
+    amount INTEGER NOT NULL,
+    item TEXT,
+    channel INTEGER,
+    message INTEGER
+);
+CREATE INDEX IF NOT EXISTS transactions_sender ON transactions (sender, id);
+CREATE INDEX IF NOT EXISTS transactions_receiver ON transactions (receiver, id);
+CREATE TABLE IF NOT EXISTS legacy_logs (
+    id INTEGER PRIMARY KEY,
+    member INTEGER NOT NULL,
+    text TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS legacy_logs_member ON legacy_logs (member, id);
+CREATE TABLE IF NOT EXISTS price_versions (
+    version INTEGER PRIMARY KEY,
+    timestamp REAL NOT NULL,
+    author INTEGER,
+    source TEXT
+);
+CREATE TABLE IF NOT EXISTS prices (
+    version INTEGER NOT NULL,
+    item TEXT NOT NULL,
+    value INTEGER NOT NULL,
+    PRIMARY KEY (item, version)
+);
+CREATE TABLE IF NOT EXISTS totals (
+    member INTEGER NOT NULL,
+    item TEXT NOT NULL,
+    sent INTEGER NOT NULL DEFAULT 0,
+    received INTEGER NOT NULL DEFAULT 0,
+    PRIMARY KEY (member, item)
+);
+CREATE TABLE IF NOT EXISTS meta (
+    key TEXT PRIMARY KEY,
+    value TEXT
+);
+"""
+
+COLUMNS = "id, timestamp, sender, receiver, amount, item, channel, message"
+
+ADD_TOTAL = """
+INSERT INTO totals (member, item, sent, received) VALUES (?, ?, ?, ?)
+ON CONFLICT (member, item) DO UPDATE
+SET sent = sent + excluded.sent, received = received + excluded.received
+"""
+
+# the price an item had when a transaction was made, from the newest version before it
+VALUE_AT_TIME = """
+(SELECT prices.value FROM prices JOIN price_versions USING (version)
+ WHERE prices.item = t.item AND price_versions.timestamp <= t.timestamp
+ ORDER BY prices.version DESC LIMIT 1)
+"""
+
+
+class Transaction(NamedTuple):
+    id: int
+    timestamp: float
+    sender: int
+    receiver: int
+    amount: int
+    # None for coins
+    item: Optional[str]
+    channel: Optional[int]
+    message: Optional[int]
+    # what the items were worth when they were gifted
+    value: Optional[int] = None
+
+
+class Total(NamedTuple):
+    member: int
+    # "" for coins
+    item: str
+    sent: int
+    received: int
+
+
+class PriceVersion(NamedTuple):
+    version: int
+    timestamp: float
+    author: Optional[int]
+    source: Optional[str]
+    changes: int
+
+
+class TransactionStore:
+    """Append only log of shares and gifts, one SQLite database per guild.
+
+    Records are stored as plain values and only formatted when they are shown.
+    ``legacy_logs`` keeps the old pre-formatted log lines that were moved out of config.
+    ``totals`` holds every member's running totals per item, seeded from config once and
+    updated with each transaction, so leaderboards don't have to sum the whole log.
+    Every change to the item values is saved as a version holding the items that changed,
+    so a gift can be priced with the values from when it was made.
+    """
+
+    def __init__(self, path: Path):
+        self.path = path
+        self.path.mkdir(parents=True, exist_ok=True)
+        self._connections: Dict[int, sqlite3.Connection] = {}
+
+    def _db(self, guild_id: int) -> sqlite3.Connection:
+        connection = self._connections.get(guild_id)
+        if connection is None:
+            connection = sqlite3.connect(str(self.path / f"{guild_id}.db"))
+            connection.execute("PRAGMA journal_mode=WAL")
+            connection.execute("PRAGMA synchronous=NORMAL")
+            connection.executescript(SCHEMA)
+            self._connections[guild_id] = connection
+        return connection
+
+    def close(self) -> None:
+        for connection in self._connections.values():
+            connection.close()
+        self._connections.clear()
+
+    def add(
+        self,
+        guild_id: int,
+        sender: int,
+        receiver: int,
+        amount: int,
+        item: Optional[str] = None,
+        channel: Optional[int] = None,
+        message: Optional[int] = None,
+        timestamp: Optional[float] = None,
+    ) -> int:
+        if timestamp is None:
+            timestamp = datetime.utcnow().timestamp()
+        db = self._db(guild_id)
+        with db:
+            cursor = db.execute(
+                "INSERT INTO transactions (timestamp, sender, receiver, amount, item, channel, message)"
+                " VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (timestamp, sender, receiver, amount, item, channel, message),
+            )
+            db.executemany(
+                ADD_TOTAL, [(sender, item or "", amount, 0), (receiver, item or "", 0, amount)]
+            )
+        return cursor.lastrowid
+
+    def count(self, guild_id: int, member_id: int) -> int:
+        row = self._db(guild_id).execute(
+            "SELECT (SELECT COUNT(*) FROM transactions WHERE sender = ?)"
+            " + (SELECT COUNT(*) FROM transactions WHERE receiver = ? AND sender != ?)",
+            (member_id, member_id, member_id),
+        ).fetchone()
+        return row[0]
+
+    def history(
+        self, guild_id: int, member_id: int, limit: int = 10, offset: int = 0
+    ) -> List[Transaction]:
+        """A member's transactions either way, newest first"""
+        rows = self._db(guild_id).execute(
+            f"SELECT {COLUMNS}, t.amount * {VALUE_AT_TIME} FROM ("
+            f" SELECT {COLUMNS} FROM transactions WHERE sender = ?"
+            f" UNION ALL"
+            f" SELECT {COLUMNS} FROM transactions WHERE receiver = ? AND sender != ?"
+            f") AS t ORDER BY id DESC LIMIT ? OFFSET ?",
+            (member_id, member_id, member_id, limit, offset),
+        ).fetchall()
+        return [Transaction(*row) for row in rows]
+
+    def legacy_count(self, guild_id: int, member_id: int) -> int:
+        row = self._db(guild_id).execute(
+            "SELECT COUNT(*) FROM legacy_logs WHERE member = ?", (member_id,)
+        ).fetchone()
+        return row[0]
+
+    def legacy(self, guild_id: int, member_id: int, limit: int = 10, offset: int = 0) -> List[str]:
+        """A member's old log lines, newest first"""
+        rows = self._db(guild_id).execute(
+            "SELECT text FROM legacy_logs WHERE member = ? ORDER BY id DESC LIMIT ? OFFSET ?",
+            (member_id, limit, offset),
+        ).fetchall()
+        return [row[0] for row in rows]
+
+    def migrated(self, guild_id: int) -> bool:
+        row = self._db(guild_id).execute(
+            "SELECT value FROM meta WHERE key = 'legacy_migrated'"
+        ).fetchone()
+        return row is not None
+
+    def migrate_legacy(self, guild_id: int, logs: Dict[int, Iterable[str]]) -> int:
+        """Store the old config log lines, oldest first per member as they were in config"""
+        db = self._db(guild_id)
+        rows = [(member_id, text) for member_id, lines in logs.items() for text in lines]
+        with db:
+            db.executemany("INSERT INTO legacy_logs (member, text) VALUES (?, ?)", rows)
+            db.execute("INSERT OR REPLACE INTO meta (key, value) VALUES ('legacy_migrated', '1')")
+        return len(rows)
+
+    def totals_seeded(self, guild_id: int) -> bool:
+        row = self._db(guild_id).execute(
+            "SELECT value FROM meta WHERE key = 'totals_seeded'"
+        ).fetchone()
+        return row is not None
+
+    def seed_totals(self, guild_id: int, totals: Iterable[Total]) -> None:
+        """Add the totals from before the store kept them, like the ones in config"""
+        db = self._db(guild_id)
+        with db:
+            db.executemany(ADD_TOTAL, totals)
+            db.execute("INSERT OR REPLACE INTO meta (key, value) VALUES ('totals_seeded', '1')")
+
+    def totals(self, guild_id: int) -> List[Total]:
+        rows = self._db(guild_id).execute(
+            "SELECT member, item, sent, received FROM totals"
+        ).fetchall()
+        return [Total(*row) for row in rows]
+
+    def has_prices(self, guild_id: int) -> bool:
+        row = self._db(guild_id).execute("SELECT 1 FROM price_versions LIMIT 1").fetchone()
+        return row is not None
+
+    def record_prices(
+        self,
+        guild_id: int,
+        changes: Dict[str, int],
+        author: Optional[int] = None,
+        source: Optional[str] = None,
+        timestamp: Optional[float] = None,
+    ) -> int:
+        """Save a new price version with the items in ``changes``, returns its number"""
+        if timestamp is None:
+            timestamp = datetime.utcnow().timestamp()
+        db = self._db(guild_id)
+        with db:
+            cursor = db.execute(
+                "INSERT INTO price_versions (timestamp, author, source) VALUES (?, ?, ?)",
+                (timestamp, author, source),
+            )
+            version = cursor.lastrowid
+            db.executemany(
+                "INSERT INTO prices (version, item, value) VALUES (?, ?, ?)",
+                [(version, item, value) for item, value in changes.items()],
+            )
+        return version
+
+    def price_versions(self, guild_id: int, limit: int = 10) -> List[PriceVersion]:
+        rows = self._db(guild_id).execute(
+            "SELECT version, timestamp, author, source,"
+            " (SELECT COUNT(*) FROM prices WHERE prices.version = price_versions.version)"
+            " FROM price_versions ORDER BY version DESC LIMIT ?",
+            (limit,),
+        ).fetchall()
+        return [PriceVersion(*row) for row in rows]
+
+    def price_history(self, guild_id: int, item: str) -> List[Tuple[float, int]]:
+        """Every (timestamp, value) an item has had, newest first"""
+        return self._db(guild_id).execute(
+            "SELECT price_versions.timestamp, prices.value FROM prices"
+            " JOIN price_versions USING (version)"
+            " WHERE prices.item = ? ORDER BY prices.version DESC",
+            (item,),
+        ).fetchall()
+
+    def value_at_time(self, guild_id: int, member_id: int, received: bool = False) -> int:
+        """The value of a member's gifted or received items, each priced when it was gifted"""
+        column = "receiver" if received else "sender"
+        row = self._db(guild_id).execute(
+            f"SELECT SUM(t.amount * {VALUE_AT_TIME}) FROM transactions AS t"
+            f" WHERE t.{column} = ? AND t.item IS NOT NULL",
+            (member_id,),
+        ).fetchone()
+        return row[0] or 0
@@ -0,0 +1,69 @@
+from collections import deque
+from typing import Deque, Dict, Optional, Tuple
+
+import discord
+
+
+def is_invocation(message: discord.Message) -> bool:
+    return not message.author.bot and message.content.lower().startswith("pls")
+
+
+class ChannelBuffer:
+    __slots__ = ("seen", "invocations")
+
+    def __init__(self, size: int):
+        # how many messages this channel has had since we started watching it
+        self.seen = 0
+        self.invocations: Deque[Tuple[int, discord.Message]] = deque(maxlen=size)
+
+
+class InvocationTracker:
+    """The latest Dank Memer commands in each channel, filled from the message stream.
+
+    Every message in a channel, including ones that invoke bot commands, has to be
+    observed. Each one bumps the channel's counter and ``pls`` commands are kept in a
+    small ring buffer with the position they were sent at, so a bot reply can find the
+    command within the last ``window`` messages without fetching the channel history.
+    """
+
+    def __init__(self, window: int = 5):
+        self.window = window
+        self.channels: Dict[int, ChannelBuffer] = {}
+
+    def observe(self, message: discord.Message) -> None:
+        buffer = self.channels.get(message.channel.id)
+        if buffer is None:
+            buffer = self.channels[message.channel.id] = ChannelBuffer(self.window)
+        buffer.seen += 1
+        if is_invocation(message):
+            buffer.invocations.append((buffer.seen, message))
+
+    def get(self, channel_id: int, message_id: int) -> Optional[discord.Message]:
+        buffer = self.channels.get(channel_id)
+        if buffer is None:
+            return None
+        for _, message in buffer.invocations:
+            if message.id == message_id:
+                return message
+        return None
+
+    def last_before(self, message: discord.Message) -> Tuple[bool, Optional[discord.Message]]:
+        """The newest command in the ``window`` messages before ``message``, which must be
+        the latest message observed in its channel.
+
+        The first value is whether the answer is certain, it isn't when we haven't
+        watched the channel for a whole window yet and found nothing.
+        """
+        buffer = self.channels.get(message.channel.id)
+        if buffer is None:
+            return False, None
+        earliest = buffer.seen - self.window
+        for position, invocation in reversed(buffer.invocations):
+            if position < earliest:
+                break
+            if invocation.id != message.id:
+                return True, invocation
+        return buffer.seen > self.window, None
+
+    def forget(self, channel_id: int) -> None:
+        self.channels.pop(channel_id, None)
@@ -1,78 +1,219 @@
 from mee6_py_api import API
 from aiohttp import ClientSession
 from bs4 import BeautifulSoup
-import re
+from typing import Awaitable, Callable, Dict, Hashable, Optional, Tuple
+import asyncio
+import time
 import discord
 
+from .metrics import metrics
+
+
+class TokenBucket:
+    """Allows ``rate`` calls per second on average with bursts of up to ``capacity``"""
+
+    def __init__(self, rate: float, capacity: int):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated = time.monotonic()
+        self._lock = asyncio.Lock()
+
+    def _refill(self):
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def try_acquire(self) -> bool:
+        self._refill()
+        if self.tokens >= 1:
+            self.tokens -= 1
+            return True
+        return False
+
+    def retry_after(self) -> float:
+        """Seconds until the next token is available"""
+        self._refill()
+        return max(1 - self.tokens, 0) / self.rate
+
+    async def acquire(self):
+        async with self._lock:
+            while not self.try_acquire():
+                await asyncio.sleep((1 - self.tokens) / self.rate)
+
+
+class Coalescer:
+    """Runs one coroutine per key at a time, concurrent callers share the result"""
 
-class mee6_api:
     def __init__(self):
+        self._inflight: Dict[Hashable, asyncio.Future] = {}
+
+    async def run(self, key: Hashable, factory: Callable[[], Awaitable]):
+        if key in self._inflight:
+            return await asyncio.shield(self._inflight[key])
+        task = asyncio.ensure_future(factory())
+        self._inflight[key] = task
+        try:
+            return await asyncio.shield(task)
+        finally:
+            if task.done():
+                self._inflight.pop(key, None)
+            else:
+                task.add_done_callback(lambda _: self._inflight.pop(key, None))
+
+
+class mee6_api:
+    def __init__(self, ttl: int = 300, rate: float = 2, burst: int = 5):
         self.api_guild_cache = {}
+        self.ttl = ttl
+        self.bucket = TokenBucket(rate, burst)
+        self.levels: Dict[int, Dict[int, Tuple[float, int]]] = {}
+        # guild id: (expires, pages read, whether that was the whole leaderboard)
+        self.prefetched: Dict[int, Tuple[float, int, bool]] = {}
+        self.coalescer = Coalescer()
 
-    async def get_user_rank(self, guild: str, user: str):
+    def _api(self, guild) -> API:
         if guild not in self.api_guild_cache:
             self.api_guild_cache[guild] = API(int(guild))
+        return self.api_guild_cache[guild]
 
-        api = self.api_guild_cache[guild]
+    def _cached(self, guild: int, user: int) -> Optional[int]:
+        expires, level = self.levels.get(guild, {}).get(user, (0, None))
+        if expires < time.monotonic():
+            return None
+        return level
 
-        return await api.levels.get_user_level(int(user))
+    def _store(self, guild: int, user: int, level: int):
+        self.levels.setdefault(guild, {})[user] = (time.monotonic() + self.ttl, level)
 
+    async def get_user_rank(self, guild: str, user: str):
+        guild, user = int(guild), int(user)
+        level = self._cached(guild, user)
+        if level is not None:
+            return level
 
-class Amari:
-    def __init__(self):
-        self.session = ClientSession()
+        async def fetch():
+            await self.bucket.acquire()
+            with metrics.time("api", api="mee6", call="user"):
+                level = await self._api(guild).levels.get_user_level(user)
+            self._store(guild, user, level or 0)
+            return level
 
-    async def get_amari_rank(self, guild: int, user: discord.User):
-        gid = guild
-        username = user.name
-        url = f"https://lb.amaribot.com/weekly.php?gID={gid}"
+        return await self.coalescer.run((guild, user), fetch)
 
-        async with self.session.request("GET", url) as response:
-            text = await response.text()
-        obj = BeautifulSoup(text, "html.parser")
-        rank_list = obj.body.main.findAll("div")[2].div.find("table").findAll("tr")
-        tag = None
-        for tag in rank_list:
-            if username in str(tag):
-                break
-        check = re.compile(
-                r"<tr><td>(\d+)<\/td><td>({})<\/td><td>(\d+)<\/td><td>(\d+)<\/td><\/tr>".format(
-                    re.escape(username)
-                )
-            )
-        
-        if not tag:
-            return None
-        match = re.match(check, str(tag))
+    async def lookup(self, guild, user, pages: int = 5) -> int:
+        """A member's level without queueing a rate limited request per member.
 
-        try:
-            return int(match.group(4))
-        except (TypeError, AttributeError):
+        On a miss everyone waiting shares one fetch of the guild's top ``pages`` pages,
+        only members who aren't on them in a bigger guild are looked up on their own.
+        """
+        guild, user = int(guild), int(user)
+        level = self._cached(guild, user)
+        if level is not None:
+            return level
+        complete = await self.prefetch(guild, pages)
+        level = self._cached(guild, user)
+        if level is not None:
+            return level
+        if complete:
+            # the whole leaderboard was read and they aren't on it
+            self._store(guild, user, 0)
             return 0
+        return await self.get_user_rank(guild, user) or 0
 
-    async def get_weekly_rank(self, guild: int, user: discord.User):
-        gid = guild
-        username = user.name
-        url = f"https://lb.amaribot.com/weekly.php?gID={gid}"
+    async def prefetch(self, guild: int, max_pages: int = 50) -> bool:
+        """Load the guild's top ``max_pages`` leaderboard pages into the cache, returns
+        whether that was the whole leaderboard.
+
+        Pages read within ``ttl`` aren't fetched again, a prefetch wanting more pages
+        continues after them. One that finds a smaller prefetch running waits for it and
+        then reads the rest.
+        """
+        guild = int(guild)
+        while True:
+            expires, pages, complete = self.prefetched.get(guild, (0, 0, False))
+            if expires < time.monotonic():
+                expires, pages, complete = time.monotonic() + self.ttl, 0, False
+            if complete or pages >= max_pages:
+                return complete
+
+            async def fetch(expires=expires, first=pages):
+                api = self._api(guild)
+                for page in range(first, max_pages):
+                    await self.bucket.acquire()
+                    with metrics.time("api", api="mee6", call="leaderboard"):
+                        data = await api.levels.get_leaderboard_page(page)
+                    players = (data or {}).get("players") or []
+                    for player in players:
+                        self._store(guild, int(player["id"]), player["level"])
+                    complete = len(players) < 100
+                    # the first page read decides when the whole run expires
+                    self.prefetched[guild] = (expires, page + 1, complete)
+                    if complete:
+                        return
+
+            await self.coalescer.run(("prefetch", guild), fetch)
+
+
+class Amari:
+    def __init__(self, ttl: int = 120, rate: float = 1, burst: int = 3):
+        self._session: Optional[ClientSession] = None
+        self.ttl = ttl
+        self.bucket = TokenBucket(rate, burst)
+        self.leaderboards: Dict[int, Tuple[float, Dict[str, Tuple[int, int]]]] = {}
+        self.coalescer = Coalescer()
+
+    @property
+    def session(self) -> ClientSession:
+        if self._session is None or self._session.closed:
+            self._session = ClientSession()
+        return self._session
 
-        async with self.session.request("GET", url) as response:
-            text = await response.text()
+    @staticmethod
+    def parse_leaderboard(text: str) -> Dict[str, Tuple[int, int]]:
+        """Turn the weekly.php page into {username: (weekly points, level)}"""
         obj = BeautifulSoup(text, "html.parser")
-        rank_list = obj.body.main.findAll("div")[2].div.find("table").findAll("tr")
-        tag = None
+        try:
+            rank_list = obj.body.main.findAll("div")[2].div.find("table").findAll("tr")
+        except (AttributeError, IndexError):
+            return {}
+
+        leaderboard = {}
         for tag in rank_list:
-            if username in str(tag):
-                break
-        check = re.compile(
-                r"<tr><td>(\d+)<\/td><td>({})<\/td><td>(\d+)<\/td><td>(\d+)<\/td><\/tr>".format(
-                    re.escape(username)
-                )
-            )
-        if not tag:
-            return
-        match = re.match(check, str(tag))
+            cells = [td.get_text() for td in tag.findAll("td")]
+            if len(cells) < 4:
+                continue
+            try:
+                leaderboard.setdefault(cells[1], (int(cells[2]), int(cells[3])))
+            except ValueError:
+                continue
+        return leaderboard
 
-        try:
-            return int(match.group(3))
-        except (TypeError, AttributeError):
-            return 0
+    async def get_leaderboard(self, guild: int) -> Dict[str, Tuple[int, int]]:
+        guild = int(guild)
+        expires, leaderboard = self.leaderboards.get(guild, (0, None))
+        if leaderboard is not None and expires >= time.monotonic():
+            return leaderboard
+
+        async def fetch():
+            await self.bucket.acquire()
+            url = f"https://lb.amaribot.com/weekly.php?gID={guild}"
+            with metrics.time("api", api="amari", call="leaderboard"):
+                async with self.session.request("GET", url) as response:
+                    text = await response.text()
+            leaderboard = self.parse_leaderboard(text)
+            self.leaderboards[guild] = (time.monotonic() + self.ttl, leaderboard)
+            return leaderboard
+
+        return await self.coalescer.run(guild, fetch)
+
+    async def prefetch(self, guild: int):
+        await self.get_leaderboard(guild)
+
+    async def get_amari_rank(self, guild: int, user: discord.User):
+        leaderboard = await self.get_leaderboard(guild)
+        return leaderboard.get(user.name, (0, 0))[1]
+
+    async def get_weekly_rank(self, guild: int, user: discord.User):
+        leaderboard = await self.get_leaderboard(guild)
+        return leaderboard.get(user.name, (0, 0))[0]
@@ -0,0 +1,149 @@
+import asyncio
+import gzip
+import json
+import logging
+import zlib
+
+from pathlib import Path
+from typing import Callable, Dict, Iterator, Optional, Set
+
+log = logging.getLogger("red.andycogs.giveaways.archive")
+
+
+class ColdArchive:
+    """Compressed, append only storage for giveaways that ended a long time ago.
+
+    Each guild gets a ``<guild id>.jsonl.gz`` file. Every compaction appends one gzip
+    member holding a JSON line per giveaway, and ``<guild id>.index.json`` maps message
+    ids to the offset of the member their latest copy is in, so a lookup only
+    decompresses that one batch.
+
+    The file work runs in the default executor one call at a time, so reading or
+    compacting a big archive doesn't block the event loop.
+    """
+
+    def __init__(self, path: Path):
+        self.path = path
+        self.path.mkdir(parents=True, exist_ok=True)
+        self._indexes: Dict[int, Dict[str, int]] = {}
+        self._lock: Optional[asyncio.Lock] = None
+
+    async def _run(self, func: Callable, *args):
+        if self._lock is None:
+            self._lock = asyncio.Lock()
+        async with self._lock:
+            return await asyncio.get_running_loop().run_in_executor(None, func, *args)
+
+    def _data_file(self, guild_id: int) -> Path:
+        return self.path / f"{guild_id}.jsonl.gz"
+
+    def _index_file(self, guild_id: int) -> Path:
+        return self.path / f"{guild_id}.index.json"
+
+    def _index(self, guild_id: int) -> Dict[str, int]:
+        if guild_id not in self._indexes:
+            file = self._index_file(guild_id)
+            try:
+                self._indexes[guild_id] = json.loads(file.read_text())
+            except FileNotFoundError:
+                self._indexes[guild_id] = {}
+            except ValueError:
+                log.warning("The archive index for %s is corrupt, rebuilding it", guild_id)
+                self._indexes[guild_id] = self._rebuild_index(guild_id)
+                self._save_index(guild_id)
+        return self._indexes[guild_id]
+
+    def _save_index(self, guild_id: int) -> None:
+        file = self._index_file(guild_id)
+        temp = file.with_suffix(".tmp")
+        temp.write_text(json.dumps(self._indexes[guild_id]))
+        temp.replace(file)
+
+    def _rebuild_index(self, guild_id: int) -> Dict[str, int]:
+        index = {}
+        for offset, record in self._scan(guild_id):
+            index[record["messageid"]] = offset
+        return index
+
+    def _scan(self, guild_id: int) -> Iterator:
+        """Yield (member offset, record) for every giveaway in the file, oldest first"""
+        file = self._data_file(guild_id)
+        if not file.exists():
+            return
+        with file.open("rb") as raw:
+            size = file.stat().st_size
+            while raw.tell() < size:
+                offset = raw.tell()
+                for record in self._read_member(raw):
+                    yield offset, record
+
+    @staticmethod
+    def _read_member(raw) -> list:
+        """Read one gzip member from the current position, leaving ``raw`` just past it"""
+        decompressor = zlib.decompressobj(16 + zlib.MAX_WBITS)
+        data = b""
+        while not decompressor.eof:
+            chunk = raw.read(64 * 1024)
+            if not chunk:
+                break
+            data += decompressor.decompress(chunk)
+        # give back whatever belongs to the next member
+        raw.seek(-len(decompressor.unused_data), 1)
+        return [json.loads(line) for line in data.splitlines() if line]
+
+    async def messageids(self, guild_id: int) -> Set[str]:
+        return set(await self._run(self._index, guild_id))
+
+    async def count(self, guild_id: int) -> int:
+        return len(await self._run(self._index, guild_id))
+
+    async def append(self, guild_id: int, giveaways: Dict[str, dict]) -> None:
+        if giveaways:
+            await self._run(self._append, guild_id, giveaways)
+
+    async def get(self, guild_id: int, messageid) -> Optional[dict]:
+        return await self._run(self._get, guild_id, messageid)
+
+    async def clear(self, guild_id: int, keep=()) -> int:
+        """Delete a guild's archive, copying the giveaways in ``keep`` to a fresh one"""
+        return await self._run(self._clear, guild_id, keep)
+
+    def _append(self, guild_id: int, giveaways: Dict[str, dict]) -> None:
+        if not giveaways:
+            return
+        index = self._index(guild_id)
+        lines = "".join(
+            json.dumps({"messageid": str(messageid), "info": info}) + "\n"
+            for messageid, info in giveaways.items()
+        )
+        file = self._data_file(guild_id)
+        with file.open("ab") as raw:
+            offset = raw.tell()
+            raw.write(gzip.compress(lines.encode()))
+        for messageid in giveaways:
+            index[str(messageid)] = offset
+        self._save_index(guild_id)
+
+    def _get(self, guild_id: int, messageid) -> Optional[dict]:
+        offset = self._index(guild_id).get(str(messageid))
+        if offset is None:
+            return None
+        with self._data_file(guild_id).open("rb") as raw:
+            raw.seek(offset)
+            for record in self._read_member(raw):
+                if record["messageid"] == str(messageid):
+                    return record["info"]
+        return None
+
+    def _clear(self, guild_id: int, keep=()) -> int:
+        index = self._index(guild_id)
+        kept = {str(m): self._get(guild_id, m) for m in keep if str(m) in index}
+        cleared = len(index) - len(kept)
+        for file in (self._data_file(guild_id), self._index_file(guild_id)):
+            try:
+                file.unlink()
+            except FileNotFoundError:
+                pass
+        self._indexes[guild_id] = {}
+        self._append(guild_id, kept)
+        return cleared
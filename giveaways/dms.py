@@ -0,0 +1,143 @@
+import asyncio
+import discord
+import itertools
+import logging
+import time
+
+from typing import Dict, Hashable, List, Optional, Set
+
+from .metrics import metrics
+
+log = logging.getLogger("red.andycogs.giveaways.dms")
+
+# lower goes first
+PRIORITY_HIGH = 0
+PRIORITY_LOW = 1
+
+
+class DMQueue:
+    """Shared outbound queue for giveaway DMs.
+
+    Winner and host DMs are high priority and always queued. Low priority DMs (missing
+    requirement notices) are deduplicated per key while one is queued and for
+    ``dedup_window`` seconds after it was sent, and dropped once ``max_low`` of them are
+    already waiting, so a raid can't build an endless backlog.
+    """
+
+    def __init__(
+        self,
+        workers: int = 3,
+        max_low: int = 500,
+        dedup_window: int = 300,
+        max_attempts: int = 3,
+    ):
+        self.workers = workers
+        self.max_low = max_low
+        self.dedup_window = dedup_window
+        self.max_attempts = max_attempts
+        self._queue: asyncio.PriorityQueue = asyncio.PriorityQueue()
+        self._counter = itertools.count()
+        # dedup keys by when their DM was sent, and the keys still waiting in the queue
+        self._recent: Dict[Hashable, float] = {}
+        self._queued: Set[Hashable] = set()
+        self._tasks: List[asyncio.Task] = []
+        self.low_pending = 0
+        self.sent = 0
+        self.failed = 0
+        self.dropped = 0
+        self.deduped = 0
+
+    @property
+    def depth(self) -> int:
+        return self._queue.qsize()
+
+    def start(self) -> None:
+        if self._tasks:
+            return
+        self._tasks = [asyncio.create_task(self._worker()) for _ in range(self.workers)]
+
+    def stop(self) -> None:
+        for task in self._tasks:
+            task.cancel()
+        self._tasks = []
+
+    def _seen_recently(self, key: Hashable) -> bool:
+        if key in self._queued:
+            return True
+        sent_at = self._recent.get(key)
+        return sent_at is not None and time.monotonic() - sent_at < self.dedup_window
+
+    def _remember(self, key: Hashable) -> None:
+        now = time.monotonic()
+        if len(self._recent) > 10000:
+            self._recent = {
+                k: t for k, t in self._recent.items() if now - t < self.dedup_window
+            }
+        self._recent[key] = now
+
+    def send(
+        self,
+        user: discord.abc.User,
+        *,
+        embed: Optional[discord.Embed] = None,
+        content: Optional[str] = None,
+        priority: int = PRIORITY_HIGH,
+        dedup_key: Optional[Hashable] = None,
+    ) -> bool:
+        """Queue a DM, returns False if it was dropped or deduplicated"""
+        if dedup_key is not None and self._seen_recently(dedup_key):
+            self.deduped += 1
+            return False
+        if priority != PRIORITY_HIGH:
+            if self.low_pending >= self.max_low:
+                self.dropped += 1
+                return False
+            self.low_pending += 1
+
+        if dedup_key is not None:
+            self._queued.add(dedup_key)
+        self._queue.put_nowait((priority, next(self._counter), user, content, embed, dedup_key))
+        return True
+
+    async def _worker(self) -> None:
+        while True:
+            priority, _, user, content, embed, dedup_key = await self._queue.get()
+            try:
+                # a DM that went out or can never go out counts for dedup, one that ran out
+                # of retries can be sent again
+                if await self._deliver(user, content, embed) and dedup_key is not None:
+                    self._remember(dedup_key)
+            except Exception:
+                log.exception("Unexpected error sending a giveaway DM")
+                self.failed += 1
+            finally:
+                self._queued.discard(dedup_key)
+                if priority != PRIORITY_HIGH:
+                    self.low_pending -= 1
+                self._queue.task_done()
+
+    async def _deliver(self, user, content, embed) -> bool:
+        """Send a DM with retries, returns False only if it could still succeed later"""
+        for attempt in range(self.max_attempts):
+            try:
+                with metrics.time("api", api="discord", call="dm"):
+                    await user.send(content=content, embed=embed)
+            except discord.Forbidden:
+                # closed DMs or a blocked bot, trying again won't help
+                self.failed += 1
+                return True
+            except discord.HTTPException as e:
+                if e.status != 429 and e.status < 500:
+                    self.failed += 1
+                    return True
+                retry_after = None
+                if e.response is not None:
+                    retry_after = e.response.headers.get("Retry-After")
+                delay = float(retry_after) if retry_after else 2 ** attempt
+                log.debug("DM to %s failed with %s, retrying in %ss", user.id, e.status, delay)
+                await asyncio.sleep(delay)
+            else:
+                self.sent += 1
+                return True
+        self.failed += 1
+        return False
@@ -0,0 +1,230 @@
+import asyncio
+import discord
+import logging
+
+from typing import Awaitable, Callable, Dict, List, Optional, Set, Tuple
+
+from redbot.core import Config
+
+from .api import TokenBucket
+
+log = logging.getLogger("red.andycogs.giveaways.donators")
+
+Progress = Callable[[int, int], Awaitable[None]]
+
+
+class RoleChange:
+    __slots__ = ("member", "add", "remove")
+
+    def __init__(self, member: discord.Member, add: List[discord.Role], remove: List[discord.Role]):
+        self.member = member
+        self.add = add
+        self.remove = remove
+
+
+class ReconcilePlan:
+    """The role changes needed to bring a guild's donators in line with the thresholds"""
+
+    def __init__(self):
+        self.changes: List[RoleChange] = []
+        self.missing: List[str] = []
+        # roles that stopped being donator roles, taken off everyone who still has them
+        self.retired: List[discord.Role] = []
+        self.checked = 0
+        self.applied = 0
+        self.failed = 0
+
+    @property
+    def additions(self) -> int:
+        return sum(len(change.add) for change in self.changes)
+
+    @property
+    def removals(self) -> int:
+        return sum(len(change.remove) for change in self.changes)
+
+
+def resolve_roles(
+    guild: discord.Guild, thresholds: Dict[str, int]
+) -> Tuple[Dict[discord.Role, int], List[str]]:
+    """Split the configured donator roles into the ones that exist and the ids that don't"""
+    roles = {}
+    missing = []
+    for role_id, amount in thresholds.items():
+        role = guild.get_role(int(role_id))
+        if role is None:
+            missing.append(role_id)
+        else:
+            roles[role] = amount
+    return roles, missing
+
+
+def role_change(
+    member: discord.Member, roles: Dict[discord.Role, int], donated: int
+) -> Optional[RoleChange]:
+    current = set(member.roles)
+    add = [role for role, amount in roles.items() if donated >= amount and role not in current]
+    remove = [role for role, amount in roles.items() if donated < amount and role in current]
+    if not add and not remove:
+        return None
+    return RoleChange(member, add, remove)
+
+
+class DonatorReconciler:
+    """Syncs donator roles for whole guilds.
+
+    Donations and thresholds are read in bulk, every member who donated or holds a
+    donator role is diffed against their target roles, and only the differences are
+    applied, paced by a per guild token bucket. A guild is synced by one caller at a
+    time, a sync requested while one is running is done once more when it finishes.
+    """
+
+    def __init__(self, config: Config, rate: float = 1, burst: int = 5):
+        self.config = config
+        self.rate = rate
+        self.burst = burst
+        self._buckets: Dict[int, TokenBucket] = {}
+        self._scheduled: Dict[int, asyncio.Task] = {}
+        self._running: Dict[int, ReconcilePlan] = {}
+        self._retired: Dict[int, Set[int]] = {}
+        self._locks: Dict[int, asyncio.Lock] = {}
+        # guilds whose scheduled sync is past its delay, and the ones that need another
+        self._syncing: Set[int] = set()
+        self._dirty: Set[int] = set()
+
+    def bucket(self, guild_id: int) -> TokenBucket:
+        if guild_id not in self._buckets:
+            self._buckets[guild_id] = TokenBucket(self.rate, self.burst)
+        return self._buckets[guild_id]
+
+    def running(self, guild_id: int) -> Optional[ReconcilePlan]:
+        return self._running.get(guild_id)
+
+    def lock(self, guild_id: int) -> asyncio.Lock:
+        """Held for the whole plan and apply of a sync"""
+        if guild_id not in self._locks:
+            self._locks[guild_id] = asyncio.Lock()
+        return self._locks[guild_id]
+
+    def retire(self, guild: discord.Guild, role: discord.Role) -> None:
+        """Take a role that is no longer a donator role off its members on the next sync"""
+        self._retired.setdefault(guild.id, set()).add(role.id)
+        self.schedule(guild)
+
+    async def prune_missing(self, guild: discord.Guild, missing: List[str]) -> None:
+        """Forget donator roles that were deleted from the guild"""
+        if not missing:
+            return
+        async with self.config.guild(guild).donatorroles() as thresholds:
+            for role_id in missing:
+                thresholds.pop(role_id, None)
+
+    async def plan(self, guild: discord.Guild) -> ReconcilePlan:
+        plan = ReconcilePlan()
+        thresholds = await self.config.guild(guild).donatorroles()
+        roles, plan.missing = resolve_roles(guild, thresholds)
+        for role_id in self._retired.get(guild.id, ()):
+            role = guild.get_role(role_id)
+            if role is not None and str(role_id) not in thresholds:
+                plan.retired.append(role)
+        if not roles and not plan.retired:
+            return plan
+
+        member_data = await self.config.all_members(guild)
+        donations = {int(member_id): data["donated"] for member_id, data in member_data.items()}
+        candidates = {member_id for member_id, donated in donations.items() if donated > 0}
+        for role in [*roles, *plan.retired]:
+            candidates.update(member.id for member in role.members)
+
+        for member_id in candidates:
+            member = guild.get_member(member_id)
+            if member is None or member.bot:
+                continue
+            plan.checked += 1
+            change = role_change(member, roles, donations.get(member_id, 0))
+            stale = [role for role in plan.retired if role in member.roles]
+            if stale:
+                change = change or RoleChange(member, [], [])
+                change.remove.extend(stale)
+            if change:
+                plan.changes.append(change)
+        return plan
+
+    async def apply(
+        self, guild: discord.Guild, plan: ReconcilePlan, progress: Optional[Progress] = None
+    ) -> ReconcilePlan:
+        bucket = self.bucket(guild.id)
+        reason = "Donator role sync"
+        total = len(plan.changes)
+        self._running[guild.id] = plan
+        try:
+            for done, change in enumerate(plan.changes, start=1):
+                try:
+                    if change.add:
+                        await bucket.acquire()
+                        await change.member.add_roles(*change.add, reason=reason)
+                    if change.remove:
+                        await bucket.acquire()
+                        await change.member.remove_roles(*change.remove, reason=reason)
+                    plan.applied += 1
+                except discord.HTTPException:
+                    plan.failed += 1
+                if progress:
+                    await progress(done, total)
+            retired = self._retired.get(guild.id)
+            if retired:
+                retired.difference_update(role.id for role in plan.retired)
+        finally:
+            self._running.pop(guild.id, None)
+        return plan
+
+    async def reconcile(
+        self, guild: discord.Guild, dry_run: bool = False, progress: Optional[Progress] = None
+    ) -> ReconcilePlan:
+        if dry_run:
+            return await self.plan(guild)
+        async with self.lock(guild.id):
+            plan = await self.plan(guild)
+            await self.prune_missing(guild, plan.missing)
+            await self.apply(guild, plan, progress)
+        log.info(
+            "Synced donator roles in %s: %s members changed, %s failed",
+            guild.id,
+            plan.applied,
+            plan.failed,
+        )
+        return plan
+
+    def schedule(self, guild: discord.Guild, delay: float = 30) -> None:
+        """Reconcile a guild in the background, later calls push the run back.
+
+        A sync that already started is never cancelled halfway through its role edits,
+        it runs once more when it's done instead.
+        """
+        task = self._scheduled.get(guild.id)
+        if task and not task.done():
+            if guild.id in self._syncing:
+                self._dirty.add(guild.id)
+                return
+            task.cancel()
+
+        async def run():
+            await asyncio.sleep(delay)
+            self._syncing.add(guild.id)
+            try:
+                while True:
+                    self._dirty.discard(guild.id)
+                    try:
+                        await self.reconcile(guild)
+                    except Exception:
+                        log.exception("Failed to sync donator roles in %s", guild.id)
+                    if guild.id not in self._dirty:
+                        break
+            finally:
+                self._syncing.discard(guild.id)
+
+        self._scheduled[guild.id] = asyncio.create_task(run())
+
+    def cancel(self) -> None:
+        for task in self._scheduled.values():
+            task.cancel()
+        self._scheduled.clear()
@@ -0,0 +1,326 @@
+import asyncio
+import logging
+import time
+
+from datetime import datetime
+from typing import Dict, Iterable, Optional, Set, Tuple, Union
+
+import discord
+
+from .metrics import metrics
+from .requirements import REMOTE_KEYS, Requirements
+
+log = logging.getLogger("red.andycogs.giveaways.evaluation")
+
+CheckResult = Union[bool, Tuple[bool, str]]
+
+STACKING_MODES = ("additive", "max", "multiplicative")
+
+
+def stack_multipliers(multipliers: Iterable[int], mode: str = "additive") -> int:
+    """A member's entries from the multipliers of their roles, everyone starts with 1"""
+    multipliers = [m for m in multipliers if m]
+    if not multipliers:
+        return 1
+    if mode == "max":
+        return 1 + max(multipliers)
+    if mode == "multiplicative":
+        weight = 1
+        for multiplier in multipliers:
+            weight *= 1 + multiplier
+        return weight
+    return 1 + sum(multipliers)
+
+
+class GuildSnapshot:
+    """The guild wide settings every requirement check needs, read once"""
+
+    __slots__ = ("bypass", "blacklist", "secretblacklist", "multipliers", "stacking")
+
+    def __init__(
+        self,
+        bypass: Iterable[int],
+        blacklist: Iterable[int],
+        secretblacklist: Iterable[int],
+        multipliers: Optional[Dict[int, int]] = None,
+        stacking: str = "additive",
+    ):
+        self.bypass = frozenset(bypass)
+        self.blacklist = frozenset(blacklist)
+        self.secretblacklist = frozenset(secretblacklist)
+        self.multipliers = multipliers or {}
+        self.stacking = stacking
+
+    def weight(self, role_ids: Iterable[int]) -> int:
+        return stack_multipliers(
+            (self.multipliers.get(r, 0) for r in role_ids), self.stacking
+        )
+
+
+class MemberFacts:
+    """What we know about a member, remote values are only filled when needed"""
+
+    __slots__ = ("member", "role_ids", "days") + REMOTE_KEYS
+
+    def __init__(self, member: discord.Member):
+        self.member = member
+        self.role_ids = frozenset(r.id for r in member.roles)
+        self.days = (
+            (datetime.utcnow() - member.joined_at).days if member.joined_at else 0
+        )
+        for key in REMOTE_KEYS:
+            setattr(self, key, None)
+
+
+class Evaluation:
+    __slots__ = ("weights", "rejected", "timings")
+
+    def __init__(self):
+        self.weights: Dict[int, int] = {}
+        self.rejected = 0
+        self.timings: Dict[str, float] = {}
+
+
+def check_requirements(
+    bot,
+    facts: MemberFacts,
+    requirements: Requirements,
+    snapshot: GuildSnapshot,
+    remote: bool = True,
+) -> CheckResult:
+    """Check a member against a giveaway's requirements without touching config.
+
+    Checks that only need the member run before the ones that need remote data,
+    and when ``remote`` is False the remote ones are skipped.
+    The server requirement's message keeps an ``[INVITE_URL_HERE]`` placeholder.
+    """
+    member = facts.member
+    if member.id in snapshot.secretblacklist:
+        return False
+    if snapshot.bypass & facts.role_ids:
+        return True
+
+    for r in snapshot.blacklist & facts.role_ids:
+        role = member.guild.get_role(int(r))
+        if not role:
+            continue
+        return (
+            False,
+            f"You have the {role.name} role which has prevented you from entering [JUMP_URL_HERE] giveaway",
+        )
+
+    for r in requirements.roles - facts.role_ids:
+        role = member.guild.get_role(r)
+        if not role:
+            continue
+        return (
+            False,
+            f"You do not have the `{role.name}` role which is required for [JUMP_URL_HERE] giveaway",
+        )
+
+    if requirements.joindays and facts.days < requirements.joindays:
+        return (
+            False,
+            f"You need to be in the server for {requirements.joindays - facts.days} more days to enter [JUMP_URL_HERE] giveaway",
+        )
+
+    if requirements.server:
+        server = bot.get_guild(requirements.server)
+        if server and not server.get_member(member.id):
+            return (
+                False,
+                f"You need to be in the **[{server.name}]([INVITE_URL_HERE])** server to join [JUMP_URL_HERE] giveaway",
+            )
+
+    if not remote or not requirements.remote:
+        return True
+
+    if requirements.mee6 and facts.mee6 < requirements.mee6:
+        return (
+            False,
+            f"You need {requirements.mee6 - facts.mee6} more MEE6 levels to enter [JUMP_URL_HERE] giveaway",
+        )
+
+    if requirements.amari and facts.amari < requirements.amari:
+        return (
+            False,
+            f"You need {requirements.amari - facts.amari} more Amari levels to enter [JUMP_URL_HERE] giveaway",
+        )
+
+    if requirements.weeklyamari and facts.weeklyamari < requirements.weeklyamari:
+        return (
+            False,
+            f"You need {requirements.weeklyamari - facts.weeklyamari} more weekly amari points to enter [JUMP_URL_HERE] giveaway",
+        )
+
+    if requirements.shared and facts.shared is not None:
+        if facts.shared < requirements.shared:
+            return (
+                False,
+                f"You need to share {requirements.shared - facts.shared} more coins in this server to join [JUMP_URL_HERE] giveaway",
+            )
+
+    if requirements.invites and facts.invites < requirements.invites:
+        return (
+            False,
+            f"You need to have {requirements.invites - facts.invites} more invites to join [JUMP_URL_HERE] giveaway",
+        )
+
+    return True
+
+
+async def load_snapshot(cog, guild: discord.Guild) -> GuildSnapshot:
+    data = await cog.get_settings(guild)
+    return GuildSnapshot(
+        data["bypassrole"],
+        data["blacklist"],
+        await cog.get_secretblacklist(),
+        await cog.get_multipliers(guild),
+        data["multistack"],
+    )
+
+
+async def fill_remote(cog, facts: MemberFacts, keys: Iterable[str]) -> MemberFacts:
+    for key in keys:
+        with metrics.time("requirement", requirement=key):
+            setattr(facts, key, await cog.get_requirement_value(facts.member, key))
+    return facts
+
+
+async def check_giveaways(
+    cog, member: discord.Member, giveaways: Dict[str, dict]
+) -> Dict[str, CheckResult]:
+    """Check one member against many giveaways, reading the member's facts only once.
+
+    Local checks run against every giveaway first, then each remote value needed by
+    the giveaways still in the running is looked up a single time.
+    """
+    snapshot = await load_snapshot(cog, member.guild)
+    facts = MemberFacts(member)
+    results = {}
+    pending = []
+    keys = set()
+    for messageid, info in giveaways.items():
+        requirements = info["requirements"]
+        with metrics.time("requirement", requirement="local"):
+            result = check_requirements(cog.bot, facts, requirements, snapshot, remote=False)
+        needed = requirements.remote
+        if result == True and needed:
+            pending.append(messageid)
+            keys |= needed
+        else:
+            results[messageid] = result
+
+    if pending:
+        await fill_remote(cog, facts, keys)
+        for messageid in pending:
+            results[messageid] = check_requirements(
+                cog.bot, facts, giveaways[messageid]["requirements"], snapshot
+            )
+    return {messageid: results[messageid] for messageid in giveaways}
+
+
+class EntrantEvaluator:
+    """Works out entrants' eligibility and weight, one page of reactors at a time.
+
+    Guild settings, the blacklist and role multipliers are read once in ``prepare``.
+    Each page runs the cheap local checks first, and remote lookups are fanned out
+    with bounded concurrency.
+    """
+
+    def __init__(
+        self, cog, guild: discord.Guild, info: dict, concurrency: int = 10, entrants: int = 0
+    ):
+        self.cog = cog
+        self.guild = guild
+        self.requirements = info["requirements"]
+        self.keys = self.requirements.remote
+        self.concurrency = concurrency
+        # how many entrants are expected, to size the level prefetch
+        self.entrants = entrants
+        self.evaluation = Evaluation()
+        self.snapshot: Optional[GuildSnapshot] = None
+        self.seen: Set[int] = set()
+        self._prefetched = False
+
+    def _time(self, phase: str, start: float) -> None:
+        timings = self.evaluation.timings
+        timings[phase] = timings.get(phase, 0) + time.perf_counter() - start
+
+    async def prepare(self) -> None:
+        start = time.perf_counter()
+        self.snapshot = await load_snapshot(self.cog, self.guild)
+        self._time("load", start)
+
+    async def add(self, users) -> None:
+        evaluation = self.evaluation
+        snapshot = self.snapshot
+
+        start = time.perf_counter()
+        candidates = []
+        for user in users:
+            if user.id in self.seen or user.bot or not isinstance(user, discord.Member):
+                continue
+            self.seen.add(user.id)
+            facts = MemberFacts(user)
+            if user.id in snapshot.secretblacklist:
+                evaluation.rejected += 1
+            elif snapshot.bypass & facts.role_ids:
+                evaluation.weights[user.id] = snapshot.weight(facts.role_ids)
+            elif (
+                check_requirements(
+                    self.cog.bot, facts, self.requirements, snapshot, remote=False
+                )
+                == True
+            ):
+                candidates.append(facts)
+            else:
+                evaluation.rejected += 1
+        self._time("local", start)
+
+        if self.keys and candidates:
+            if not self._prefetched:
+                start = time.perf_counter()
+                await self.cog.prefetch_levels(self.guild, self.keys, self.entrants)
+                self._prefetched = True
+                self._time("prefetch", start)
+
+            start = time.perf_counter()
+            candidates = await self._fill(candidates)
+            self._time("remote", start)
+
+        start = time.perf_counter()
+        for facts in candidates:
+            if check_requirements(self.cog.bot, facts, self.requirements, snapshot) == True:
+                evaluation.weights[facts.member.id] = snapshot.weight(facts.role_ids)
+            else:
+                evaluation.rejected += 1
+        self._time("weights", start)
+
+    async def _fill(self, candidates):
+        semaphore = asyncio.Semaphore(self.concurrency)
+
+        async def bounded(facts: MemberFacts):
+            async with semaphore:
+                return await fill_remote(self.cog, facts, self.keys)
+
+        results = await asyncio.gather(
+            *(bounded(facts) for facts in candidates), return_exceptions=True
+        )
+        filled = []
+        for result in results:
+            if isinstance(result, Exception):
+                log.debug("Failed to look up requirement data", exc_info=result)
+                self.evaluation.rejected += 1
+                continue
+            filled.append(result)
+        return filled
+
+    def log_timings(self) -> None:
+        log.debug(
+            "Evaluated %s entrants for %s: %s",
+            len(self.seen),
+            self.guild.id,
+            ", ".join(f"{k}={v:.3f}s" for k, v in self.evaluation.timings.items()),
+        )
+
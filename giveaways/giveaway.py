@@ -25,18 +25,44 @@ SOFTWARE.
 import asyncio
 import argparse
 import discord
+import logging
+import time
 
 from datetime import datetime
 from mee6_py_api import API
 from redbot.core import commands, Config
 from redbot.core.bot import Red
+from redbot.core.data_manager import cog_data_path
 from typing import Optional, Union
-from random import choice, randint
 from .converters import FuzzyRole, IntOrLink, TimeConverter
+from .evaluation import (
+    STACKING_MODES,
+    EntrantEvaluator,
+    Evaluation,
+    MemberFacts,
+    check_giveaways,
+    check_requirements,
+    fill_remote,
+    load_snapshot,
+    stack_multipliers,
+)
 from redbot.core.commands import BadArgument
-from redbot.core.utils.chat_formatting import pagify, humanize_list
+from redbot.core.utils.chat_formatting import box, pagify, humanize_list
 from redbot.core.utils.menus import DEFAULT_CONTROLS, menu
-from .api import mee6_api, Amari
+from .api import mee6_api, Amari, TokenBucket
+from .archive import ColdArchive
+from .dms import DMQueue, PRIORITY_LOW
+from .donators import DonatorReconciler, resolve_roles, role_change
+from .invites import InviteCache
+from .leaderboard import DonationLeaderboard
+from .ledger import EntrantLedger
+from .metrics import metrics
+from .registry import GiveawayRegistry
+from .requirements import Requirements
+from .sampling import draw_seed, run_draw
+from .scheduler import GiveawayScheduler
+
+log = logging.getLogger("red.andycogs.giveaways")
 
 mee6_api = mee6_api()
 amari_api = Amari()
@@ -98,6 +124,9 @@ class Giveaways(commands.Cog):
             "hostmessage": "Your giveaway for [{prize}]({url}) in {guild} has ended. The winners were {winners}",
             "emoji": "🎉",
             "donatorroles": {},
+            "progressthreshold": 1000,
+            "archivedays": 30,
+            "multistack": "additive",
         }
 
         default_member = {
@@ -114,6 +143,25 @@ class Giveaways(commands.Cog):
 
         self.message_cache = {}
         self.giveaway_cache = {}
+        self.settings_cache = {}
+        self.multiplier_cache = {}
+        self.render_cache = {}
+        self.invite_cache = InviteCache()
+        self.dm_queue = DMQueue()
+        self.ledger = EntrantLedger(cog_data_path(self) / "entrants")
+        self.edit_buckets = {}
+        self.leaderboards = {}
+        self.donators = DonatorReconciler(self.config)
+        self.secretblacklist_cache = None
+        self.tasks = []
+        self.end_slots = asyncio.Semaphore(5)
+        self.rehydration = None
+        self.registry = GiveawayRegistry(
+            self.config, cold=ColdArchive(cog_data_path(self) / "archive")
+        )
+        self.scheduler = GiveawayScheduler(
+            self.refresh_giveaways, self.dispatch_endings
+        )
 
         self.config.register_guild(**default_guild)
         self.config.register_member(**default_member)
@@ -154,122 +202,171 @@ class Giveaways(commands.Cog):
 
     async def giveaway_loop(self):
         await self.bot.wait_until_ready()
-        self.tasks = []
+        self.dm_queue.start()
+        await self.rehydrate()
+        self.tasks.append(asyncio.create_task(self.compaction_loop()))
+        await self.scheduler.run()
 
-        for guild, data in (await self.config.all_guilds()).items():
-            for messageid, info in data["giveaways"].items():
-                if info["Ongoing"]:
-                    self.tasks.append(
-                        asyncio.create_task(self.start_giveaway(int(messageid), info))
-                    )
+    async def compaction_loop(self):
+        while True:
+            for guild in list(self.bot.guilds):
+                try:
+                    await self.compact_archive(guild)
+                except Exception:
+                    log.exception("Failed to compact the giveaway archive for %s", guild.id)
+            await asyncio.sleep(21_600)
+
+    async def compact_archive(self, guild: discord.Guild) -> int:
+        """Move giveaways that ended more than ``archivedays`` ago out of config"""
+        days = (await self.get_settings(guild))["archivedays"]
+        if not days:
+            return 0
+        cutoff = datetime.utcnow().timestamp() - days * 86_400
+        compacted = await self.registry.compact(guild.id, cutoff)
+        for messageid in compacted:
+            self.ledger.delete(messageid)
+        if compacted:
+            log.info("Compacted %s ended giveaways in %s", len(compacted), guild.id)
+        return len(compacted)
+
+    async def rehydrate(self):
+        """Load every live giveaway in one scan, queueing the ones that ended while we were down"""
+        started = time.perf_counter()
+        migrated = await self.registry.load()
+
+        current = datetime.utcnow().timestamp()
+        overdue = []
+        for guild_id, messageid, info in self.registry.all_giveaways():
+            if info["Ongoing"] and info["endtime"] > current:
+                self.giveaway_cache[str(messageid)] = True
+                self.scheduler.schedule(messageid, info)
+            elif info["Ongoing"] or "ending" in info:
+                overdue.append((messageid, info))
+
+        # oldest first, the end pool keeps them from all firing at once
+        overdue.sort(key=lambda item: item[1]["endtime"])
+        for messageid, info in overdue:
+            self.giveaway_cache[str(messageid)] = False
+            self.start_ending(int(messageid), info)
+
+        self.rehydration = {
+            "seconds": time.perf_counter() - started,
+            "live": len(self.registry),
+            "overdue": len(overdue),
+            "migrated": migrated,
+        }
+        log.info(
+            "Loaded %s live giveaways in %.2fs, %s ended while offline",
+            len(self.registry),
+            self.rehydration["seconds"],
+            len(overdue),
+        )
 
-    async def can_join(self, user: discord.Member, info):
-        try:
-            data = await self.config.guild(user.guild).all()
-        except AttributeError:
-            return False
-        secretblacklist = await self.config.secretblacklist()
-        if user.id in secretblacklist:
-            return False
-        if len(data["bypassrole"]) == 0:
-            pass
-        else:
-            for r in data["bypassrole"]:
-                if r in [r.id for r in user.roles]:
-                    return True
+    def start_ending(self, messageid: int, info: dict):
+        async def end():
+            async with self.end_slots:
+                await self.end_giveaway(messageid, info)
+
+        task = asyncio.create_task(end())
+        self.tasks.append(task)
+        task.add_done_callback(self.tasks.remove)
+
+    async def get_settings(self, guild: discord.Guild) -> dict:
+        """A cached copy of the guild's settings, without the giveaways themselves"""
+        if guild.id not in self.settings_cache:
+            with metrics.time("config", op="settings"):
+                data = await self.config.guild(guild).all()
+            data.pop("giveaways", None)
+            self.settings_cache[guild.id] = data
+        return self.settings_cache[guild.id]
+
+    async def get_secretblacklist(self) -> list:
+        if self.secretblacklist_cache is None:
+            with metrics.time("config", op="secretblacklist"):
+                self.secretblacklist_cache = await self.config.secretblacklist()
+        return self.secretblacklist_cache
+
+    async def get_multipliers(self, guild: discord.Guild) -> dict:
+        """A cached {role id: multiplier} table for the guild's roles"""
+        if guild.id not in self.multiplier_cache:
+            with metrics.time("config", op="roles"):
+                all_roles = await self.config.all_roles()
+            self.multiplier_cache[guild.id] = {
+                int(role_id): data["multiplier"]
+                for role_id, data in all_roles.items()
+                if data["multiplier"] and guild.get_role(int(role_id))
+            }
+        return self.multiplier_cache[guild.id]
 
-        requirements = info["requirements"]
-        if len(data["blacklist"]) == 0:
-            pass
+    def invalidate_settings(self, guild: Optional[discord.Guild] = None):
+        if guild:
+            self.settings_cache.pop(guild.id, None)
+            self.multiplier_cache.pop(guild.id, None)
         else:
-            for r in data["blacklist"]:
-                if r in [r.id for r in user.roles]:
-                    r = user.guild.get_role(int(r))
-                    if not r:
-                        continue
-                    return (
-                        False,
-                        f"You have the {r.name} role which has prevented you from entering [JUMP_URL_HERE] giveaway",
-                    )
-        if not requirements["roles"]:
-            pass
-        else:
-            for r in requirements["roles"]:
-                if r in [role.id for role in user.roles]:
-                    continue
-                r = user.guild.get_role(int(r))
-                if not r:
-                    continue
-                return (
-                    False,
-                    f"You do not have the `{r.name}` role which is required for [JUMP_URL_HERE] giveaway",
-                )
-
-        if requirements["mee6"]:
-            user_level = await mee6_api.get_user_rank(user.guild.id, user.id)
-
-            if user_level < requirements["mee6"]:
-                return (
-                    False,
-                    f"You need {requirements['mee6'] - user_level} more MEE6 levels to enter [JUMP_URL_HERE] giveaway",
-                )
-
-        if requirements["amari"]:
-            user_level = await amari_api.get_amari_rank(user.guild.id, user)
-            if user_level < requirements["amari"]:
-                return (
-                    False,
-                    f"You need {requirements['amari'] - user_level} more Amari levels to enter [JUMP_URL_HERE] giveaway",
-                )
-
-        if requirements["weeklyamari"]:
-            user_level = await amari_api.get_weekly_rank(user.guild.id, user)
+            self.settings_cache.clear()
+            self.multiplier_cache.clear()
+            self.secretblacklist_cache = None
+
+    async def get_requirement_value(self, member: discord.Member, key: str):
+        if key == "mee6":
+            return await mee6_api.lookup(member.guild.id, member.id)
+        elif key == "amari":
+            return await amari_api.get_amari_rank(member.guild.id, member) or 0
+        elif key == "weeklyamari":
+            return await amari_api.get_weekly_rank(member.guild.id, member) or 0
+        elif key == "shared":
+            cog = self.bot.get_cog("DankLogs")
+            if not cog or cog.__author__ != "Andy":
+                return None
+            return await cog.config.member(member).shared()
+        elif key == "invites":
+            return await self.count_invites(member)
+
+    async def prefetch_levels(self, guild: discord.Guild, keys, entrants: int = 0):
+        """Warm the level caches so bulk checks don't hit the APIs per member"""
+        try:
+            if "mee6" in keys:
+                # a page holds 100 members, read one for every 50 entrants at most
+                pages = min(50, max(1, entrants // 50))
+                await mee6_api.prefetch(guild.id, pages)
+            if "amari" in keys or "weeklyamari" in keys:
+                await amari_api.prefetch(guild.id)
+        except Exception:
+            log.debug("Failed to prefetch levels for %s", guild.id, exc_info=True)
 
-            if user_level < requirements["weeklyamari"]:
-                return (
-                    False,
-                    f"You need {requirements['weeklyamari'] - user_level} more weekly amari points to enter [JUMP_URL_HERE] giveaway",
-                )
+    async def can_join(self, user: discord.Member, info):
+        if not isinstance(user, discord.Member):
+            return False
+        snapshot = await load_snapshot(self, user.guild)
+        facts = MemberFacts(user)
+        requirements = info["requirements"]
 
-        if requirements["joindays"]:
-            days = (datetime.utcnow() - user.joined_at).days
-            if days < requirements["joindays"]:
-                return (
-                    False,
-                    f"You need to be in the server for {requirements['joindays'] - days} more days to enter [JUMP_URL_HERE] giveaway",
-                )
-        if requirements["server"]:
-            server: discord.Guild = self.bot.get_guild(requirements["server"])
-            if not server:
-                return True
-            elif user.id not in [m.id for m in server.members]:
-                invite = await self.create_invite(server)
-                return (
-                    False,
-                    f"You need to be in the **[{server.name}]({invite})** server to join [JUMP_URL_HERE] giveaway",
-                )
-        if requirements["shared"]:
-            cog = self.bot.get_cog("DankLogs")
-            if not cog:
-                pass
-            elif cog.__author__ != "Andy":
-                pass
-            else:
-                shared = await cog.config.member(user).shared()
-                if shared < requirements["shared"]:
-                    return (
-                        False,
-                        f"You need to share {requirements['shared'] - shared} more coins in this server to join [JUMP_URL_HERE] giveaway",
-                    )
-        if requirements["invites"]:
-            invites = await self.count_invites(user)
-            if invites < requirements["invites"]:
-                return (
-                    False,
-                    f"You need to have {requirements['invites'] - invites} more invites to join [JUMP_URL_HERE] giveaway",
-                )
+        with metrics.time("requirement", requirement="local"):
+            result = check_requirements(self.bot, facts, requirements, snapshot, remote=False)
+        if result == True:
+            await fill_remote(self, facts, requirements.remote)
+            result = check_requirements(self.bot, facts, requirements, snapshot)
+        return await self.fill_invite(result, requirements)
+
+    async def can_join_all(self, user: discord.Member, giveaways: dict) -> dict:
+        """can_join for every giveaway in ``giveaways``, looking the member up only once"""
+        if not isinstance(user, discord.Member):
+            return {messageid: False for messageid in giveaways}
+        results = await check_giveaways(self, user, giveaways)
+        for messageid, result in results.items():
+            results[messageid] = await self.fill_invite(
+                result, giveaways[messageid]["requirements"]
+            )
+        return results
 
-        return True
+    async def fill_invite(self, result, requirements):
+        if result == True or result == False:
+            return result
+        if "[INVITE_URL_HERE]" in result[1]:
+            server = self.bot.get_guild(requirements.server)
+            invite = await self.create_invite(server)
+            result = (False, result[1].replace("[INVITE_URL_HERE]", invite))
+        return result
 
     def get_color(self, timeleft: int):
         if timeleft <= 30:
@@ -281,30 +378,81 @@ class Giveaways(commands.Cog):
         return discord.Color.green()
 
     async def calculate_multi(self, user: discord.Member):
-        total_multi = 1
-        for r in user.roles:
-            total_multi += await self.config.role(r).multiplier()
-
-        return total_multi
+        multipliers = await self.get_multipliers(user.guild)
+        stacking = (await self.get_settings(user.guild))["multistack"]
+        return stack_multipliers((multipliers.get(r.id, 0) for r in user.roles), stacking)
 
     async def create_invite(self, guild: discord.Guild):
-        for channel in guild.text_channels:
-            if channel.permissions_for(guild.me).create_instant_invite:
-                invite = await channel.create_invite(
-                    reason="For a server join requirement", unique=False
-                )
-                if not invite:
-                    invite = await channel.create_invite(
-                        reason="For a server join requirement"
-                    )
-                return f"https://discord.gg/{invite.id}"
-        return "Couldn't make an invite"
+        return await self.invite_cache.get(guild)
+
+    async def refresh_giveaways(self, batch):
+        with metrics.time("refresh"):
+            await self._refresh_giveaways(batch)
+
+    async def _refresh_giveaways(self, batch):
+        guild_data = {}
+        to_update = []
+        for messageid, info in batch:
+            if self.giveaway_cache.get(str(messageid), False) == False:
+                self.scheduler.cancel(messageid)
+                continue
+            channel = self.bot.get_channel(info["channel"])
+            if not channel:
+                self.scheduler.cancel(messageid)
+                continue
+            if channel.guild.id not in guild_data:
+                guild_data[channel.guild.id] = await self.get_settings(channel.guild)
+            data = guild_data[channel.guild.id]
+            if messageid not in self.registry:
+                self.scheduler.cancel(messageid)
+                continue
+            to_update.append(self.update_giveaway_message(messageid, info, data))
+
+        for result in await asyncio.gather(*to_update, return_exceptions=True):
+            if isinstance(result, Exception) and not isinstance(
+                result, discord.HTTPException
+            ):
+                log.exception("Error refreshing a giveaway", exc_info=result)
+
+    async def dispatch_endings(self, batch):
+        for messageid, info in batch:
+            if self.giveaway_cache.get(str(messageid), False) == False:
+                continue
+            self.giveaway_cache[str(messageid)] = False
+            self.start_ending(int(messageid), info)
+
+    def countdown_bucket(self, seconds: float) -> int:
+        """Round the time left so the countdown only changes when it visibly should"""
+        if seconds >= 86_400:
+            granularity = 3_600
+        elif seconds >= 3_600:
+            granularity = 300
+        elif seconds >= 60:
+            granularity = 60
+        else:
+            granularity = 1
+        return max(round(seconds / granularity) * granularity, 0)
+
+    async def render_static(self, message: discord.Message, info, data) -> dict:
+        """The parts of a giveaway embed that don't change while it counts down"""
+        host = message.guild.get_member(info["host"])
+        return {
+            "settings": data,
+            "content": data["startHeader"].replace("{giveawayEmoji}", data["emoji"]),
+            "description": data["description"].replace("{emoji}", data["emoji"]),
+            "host": host.mention if host else "Host Not Found",
+            "reqs": await self.gen_req_message(message.guild, info["requirements"]),
+            "rendered": None,
+            "reacted": False,
+        }
+
+    def edit_budget(self, channel_id: int) -> TokenBucket:
+        if channel_id not in self.edit_buckets:
+            self.edit_buckets[channel_id] = TokenBucket(rate=1, capacity=5)
+        return self.edit_buckets[channel_id]
 
-    async def start_giveaway(self, messageid: int, info):
+    async def update_giveaway_message(self, messageid: int, info, data):
         channel = self.bot.get_channel(info["channel"])
-        self.bot._connection._get_message(int(messageid))
-        if not channel:
-            return
 
         message = self.message_cache.get(
             str(messageid), self.bot._connection._get_message(int(messageid))
@@ -314,152 +462,293 @@ class Giveaways(commands.Cog):
             message = channel.get_partial_message(int(messageid))
 
         self.message_cache[str(messageid)] = message
-        self.giveaway_cache[str(messageid)] = True
 
-        bypassrole = await self.config.guild(message.guild).bypassrole()
-        data = await self.config.guild(message.guild).all()
-        gaws = await self.config.guild(message.guild).giveaways()
+        static = self.render_cache.get(str(messageid))
+        if not static or static["settings"] is not data:
+            static = await self.render_static(message, info, data)
+            self.render_cache[str(messageid)] = static
 
-        while True:
-            remaining = info["endtime"] - datetime.utcnow().timestamp()
-            if str(messageid) not in gaws:
-                return
-            elif self.giveaway_cache.get(str(messageid), False) == False:
-                return
+        remaining = datetime.fromtimestamp(info["endtime"]) - datetime.utcnow()
+        bucket = self.countdown_bucket(remaining.total_seconds())
+        color = self.get_color(remaining.total_seconds())
 
-            elif remaining <= 0:
-                self.message_cache[str(messageid)] = await channel.fetch_message(
-                    messageid
-                )
-                self.giveaway_cache[str(messageid)] = False
-                self.tasks.append(
-                    asyncio.create_task(self.end_giveaway(int(messageid), info))
-                )
-                return
+        if static["rendered"] == (bucket, color.value):
+            return
 
-            remaining = datetime.fromtimestamp(info["endtime"]) - datetime.utcnow()
-            pretty_time = self.display_time(round(remaining.total_seconds()))
+        budget = self.edit_budget(channel.id)
+        if not budget.try_acquire():
+            self.scheduler.schedule(
+                messageid, info, datetime.utcnow().timestamp() + budget.retry_after()
+            )
+            return
 
-            host = message.guild.get_member(info["host"])
+        pretty_time = self.display_time(bucket) or "Ending"
 
-            if not host:
-                host = "Host Not Found"
-            else:
-                host = host.mention
-
-            color = self.get_color(remaining.total_seconds())
+        e = discord.Embed(
+            title=info["title"],
+            description=static["description"],
+            color=color,
+        )
+        e.description += f"\nTime Left: **{pretty_time}** \n"
+        e.description += f"Host: {static['host']}"
 
-            e = discord.Embed(
-                title=info["title"],
-                description=data["description"].replace("{emoji}", data["emoji"]),
-                color=color,
+        if info["donor"]:
+            e.add_field(
+                name="Donor", value="<@{0}>".format(info["donor"]), inline=False
             )
-            e.description += f"\nTime Left: **{pretty_time}** \n"
-            e.description += f"Host: {host}"
 
-            if info["donor"]:
-                e.add_field(
-                    name="Donor", value="<@{0}>".format(info["donor"]), inline=False
-                )
+        if static["reqs"]:
+            e.add_field(name="Requirements", value=static["reqs"], inline=False)
 
-            requirements = info["requirements"]
+        e.timestamp = datetime.fromtimestamp(info["endtime"])
+        e.set_footer(text="Winners: {0} | Ends at".format(info["winners"]))
 
-            reqs = await self.gen_req_message(message.guild, info["requirements"])
-            if reqs:
-                e.add_field(name="Requirements", value=reqs, inline=False)
+        try:
+            with metrics.time("api", api="discord", call="edit"):
+                await message.edit(embed=e, content=static["content"])
+        except discord.NotFound:
+            self.scheduler.cancel(messageid)
+            self.render_cache.pop(str(messageid), None)
+            return
+        static["rendered"] = (bucket, color.value)
+
+        if not static["reacted"]:
+            await message.add_reaction(data["emoji"])
+            static["reacted"] = True
+
+    async def ledger_evaluation(
+        self,
+        messageid: int,
+        message: discord.Message,
+        info,
+        reaction: Optional[discord.Reaction],
+    ) -> Optional[Evaluation]:
+        """The entrants from the ledger, or None for giveaways that don't have one.
+
+        A ledger that may have missed events (we were offline or disconnected) is first
+        diffed against one pass over the reactors, only members who aren't in it yet are
+        evaluated. Members who left the server are never entrants.
+        """
+        start = time.perf_counter()
+        entries = self.ledger.entries(messageid)
+        if entries is None:
+            return None
+        guild = message.guild
+
+        if not self.ledger.complete(messageid):
+            reactors = {}
+            if reaction:
+                async for user in reaction.users():
+                    if not user.bot:
+                        reactors[user.id] = user
+            left = set(entries) - reactors.keys()
+            missing = [user for user_id, user in reactors.items() if user_id not in entries]
+            log.debug(
+                "Reconciled the ledger for %s, %s left and %s joined while it wasn't tracked",
+                messageid,
+                len(left),
+                len(missing),
+            )
+            for user_id in left:
+                self.ledger.remove(messageid, user_id)
+            if missing:
+                evaluator = EntrantEvaluator(self, guild, info, entrants=len(missing))
+                await evaluator.prepare()
+                await evaluator.add(missing)
+                for user in missing:
+                    self.ledger.add(messageid, user.id, evaluator.evaluation.weights.get(user.id, 0))
+            if messageid in self.registry:
+                self.ledger.mark_complete(messageid)
+
+        secretblacklist = set(await self.get_secretblacklist())
+        evaluation = Evaluation()
+        for user_id, weight in entries.items():
+            if guild.get_member(user_id) is None:
+                continue
+            if weight > 0 and user_id not in secretblacklist:
+                evaluation.weights[user_id] = weight
+            else:
+                evaluation.rejected += 1
+        evaluation.timings["ledger"] = time.perf_counter() - start
+        return evaluation
 
-            e.timestamp = datetime.fromtimestamp(info["endtime"])
-            e.set_footer(text="Winners: {0} | Ends at".format(info["winners"]))
+    async def collect_entrants(
+        self,
+        messageid: int,
+        message: discord.Message,
+        info,
+        reaction: Optional[discord.Reaction],
+        data,
+        checkpoint: bool = False,
+    ) -> Evaluation:
+        """Stream the reactors page by page, evaluating each page as it arrives.
+
+        With ``checkpoint`` the progress is saved on the giveaway every few pages,
+        so an end that gets interrupted by a restart picks up where it left off.
+        """
+        evaluator = EntrantEvaluator(
+            self, message.guild, info, entrants=reaction.count if reaction else 0
+        )
+        await evaluator.prepare()
+        evaluation = evaluator.evaluation
+        if reaction is None:
+            return evaluation
+
+        state = info.get("ending") if checkpoint else None
+        after = None
+        if state:
+            evaluation.weights.update(
+                {int(user_id): weight for user_id, weight in state["weights"].items()}
+            )
+            evaluation.rejected = state["rejected"]
+            if state["after"]:
+                after = discord.Object(id=state["after"])
 
+        progress = None
+        threshold = data["progressthreshold"]
+        if threshold and reaction.count >= threshold:
             try:
-                await message.edit(
-                    embed=e,
-                    content=data["startHeader"].replace(
-                        "{giveawayEmoji}", data["emoji"]
-                    ),
+                progress = await message.channel.send(
+                    f"Collecting {self.comma_format(reaction.count)} entries for the **{info['title']}** giveaway..."
                 )
-            except discord.NotFound:
+            except discord.HTTPException:
+                pass
+
+        pages = 0
+        page = []
+
+        async def process_page():
+            nonlocal pages
+            await evaluator.add(page)
+            pages += 1
+            if pages % 10:
                 return
+            if state is not None:
+                state["after"] = page[-1].id
+                state["rejected"] = evaluation.rejected
+                state["weights"] = {
+                    str(user_id): weight
+                    for user_id, weight in evaluation.weights.items()
+                }
+                self.registry.touch(messageid)
+            if progress:
+                done = len(evaluation.weights) + evaluation.rejected
+                try:
+                    await progress.edit(
+                        content=f"Collected {self.comma_format(done)}/{self.comma_format(reaction.count)} entries for the **{info['title']}** giveaway..."
+                    )
+                except discord.HTTPException:
+                    pass
 
-            emoji = data["emoji"]
-            await message.add_reaction(emoji)
-            self.message_cache[str(messageid)] = message
-            if remaining.total_seconds() <= 60:
-                await asyncio.sleep(remaining.total_seconds())
-            else:
-                await asyncio.sleep(round(remaining.total_seconds() / 4))
+        async for user in reaction.users(after=after):
+            page.append(user)
+            if len(page) >= 100:
+                await process_page()
+                page = []
+        if page:
+            await process_page()
+
+        if progress:
+            try:
+                await progress.delete()
+            except discord.HTTPException:
+                pass
+
+        evaluator.log_timings()
+        return evaluation
+
+    async def end_giveaway(
+        self,
+        messageid: int,
+        info,
+        reroll: int = -1,
+        seed: Optional[int] = None,
+        exclude_previous: bool = False,
+    ):
+        with metrics.time("end"):
+            await self._end_giveaway(messageid, info, reroll, seed, exclude_previous)
 
-    async def end_giveaway(self, messageid: int, info, reroll: int = -1):
+    async def _end_giveaway(
+        self,
+        messageid: int,
+        info,
+        reroll: int = -1,
+        seed: Optional[int] = None,
+        exclude_previous: bool = False,
+    ):
+        self.scheduler.cancel(messageid)
+        self.render_cache.pop(str(messageid), None)
         channel = self.bot.get_channel(info["channel"])
 
         if not channel:
+            # the channel was deleted or we left the server, nothing can be drawn or announced
+            if messageid in self.registry:
+                log.info("The channel of giveaway %s is gone, archiving it without winners", messageid)
+                info["Ongoing"] = False
+                self.giveaway_cache[str(messageid)] = False
+                await self.registry.archive(messageid)
+                self.ledger.delete(messageid)
             return
 
         message = self.bot._connection._get_message(int(messageid))
 
         if not message:
             try:
-                message = await channel.fetch_message(messageid)
+                with metrics.time("api", api="discord", call="fetch_message"):
+                    message = await channel.fetch_message(messageid)
             except discord.NotFound:
-                giveaways = await self.config.guild(channel.guild).giveaways()
-                giveaways.pop(str(messageid))
-                await self.config.guild(channel.guild).giveaways.set(giveaways)
+                await self.registry.remove(messageid)
                 return
 
-        giveaways = await self.config.guild(message.guild).giveaways()
-        giveaways[str(messageid)]["Ongoing"] = False
+        live = messageid in self.registry
+        if live:
+            info["Ongoing"] = False
+            info.setdefault("ending", {"after": None, "weights": {}, "rejected": 0})
+            self.registry.touch(messageid)
         self.giveaway_cache[str(messageid)] = False
-        await self.config.guild(message.guild).giveaways.set(giveaways)
-
-        winners_list = []
-
-        users = []
-        data = await self.config.guild(message.guild).all()
-        for i, r in enumerate(message.reactions):
-            if str(r) == data["emoji"]:
-                users = await message.reactions[i].users().flatten()
-                break
-
-        if users == [None]:
-            return
-
-        bypassrole = await self.config.guild(message.guild).bypassrole()
 
-        for user in users:
-            if user.mention in winners_list:
-                continue
-            if user.bot:
-                continue
-            if isinstance(user, discord.User):
-                continue
-            can_join = await self.can_join(user, info)
-            if can_join == True:
-                multi = await self.calculate_multi(user)
-                for i in range(multi):
-                    winners_list.append(user.mention)
-
-        final_list = []
+        data = await self.get_settings(message.guild)
+        reaction = discord.utils.find(
+            lambda r: str(r) == data["emoji"], message.reactions
+        )
+        mark = time.perf_counter()
+        evaluation = await self.ledger_evaluation(messageid, message, info, reaction)
+        if evaluation is None:
+            evaluation = await self.collect_entrants(
+                messageid, message, info, reaction, data, checkpoint=live
+            )
+        # the reactors are streamed and evaluated a page at a time, split the two back out
+        evaluated = sum(evaluation.timings.values())
+        metrics.observe("end_phase", time.perf_counter() - mark - evaluated, phase="reactors")
+        metrics.observe("end_phase", evaluated, phase="evaluate")
+        mark = time.perf_counter()
 
         if reroll == -1:
             winners = info["winners"]
+            previous_winners = []
         else:
             winners = reroll
+            previous_winners = info.get("winnerids", [])
 
-        for i in range(winners):
-            if len(winners_list) == 0:
-                continue
-            count = 0
-            win = choice(winners_list)
-            x = False
-            while win in final_list:
-                win = choice(winners_list)
-                count += 1
-                if count >= 6:
-                    x = True
-                    break  # for when it runs out of reactions etc.
-            if x:
-                continue
-            final_list.append(win)
+        if seed is None:
+            seed = draw_seed()
+        draw = run_draw(
+            evaluation.weights.items(), winners, seed, previous_winners, exclude_previous
+        )
+        winner_ids = draw["winners"]
+        final_list = [f"<@{user_id}>" for user_id in winner_ids]
+        mark = metrics.lap("end_phase", mark, phase="select")
+
+        info["winnerids"] = previous_winners + winner_ids
+        # every draw keeps its own seed so the first one isn't lost to a reroll
+        info.setdefault("draws", []).append(draw)
+        if live:
+            info.pop("ending", None)
+            await self.registry.archive(messageid)
+            self.ledger.forget(messageid)
+        else:
+            await self.registry.update_archived(message.guild.id, messageid, info)
+        mark = metrics.lap("end_phase", mark, phase="archive")
 
         if len(final_list) == 0:
             host = (
@@ -488,6 +777,7 @@ class Giveaways(commands.Cog):
                 content=data["endHeader"].replace("{giveawayEmoji}", data["emoji"]),
                 embed=e,
             )
+            metrics.lap("end_phase", mark, phase="announce")
 
         else:
             winners = humanize_list(final_list)
@@ -513,7 +803,7 @@ class Giveaways(commands.Cog):
                 else:
                     e.add_field(name="Donor", value=donor.mention, inline=False)
 
-            e.set_footer(text="Ended at ")
+            e.set_footer(text=f"Seed: {seed} | Ended at ")
             e.timestamp = datetime.utcnow()
             await message.edit(
                 content=data["endHeader"].replace("{giveawayEmoji}", data["emoji"]),
@@ -522,6 +812,7 @@ class Giveaways(commands.Cog):
             await message.channel.send(
                 f"The winners for the **{info['title']}** giveaway are \n{winners}\n{message.jump_url}"
             )
+            mark = metrics.lap("end_phase", mark, phase="announce")
 
             dmhost = await self.config.guild(message.guild).dmhost()
             dmwin = await self.config.guild(message.guild).dmwin()
@@ -538,10 +829,7 @@ class Giveaways(commands.Cog):
                         .replace("{guild}", message.guild.name)
                         .replace("{url}", message.jump_url),
                     )
-                    try:
-                        await host.send(embed=e)
-                    except discord.errors.Forbidden:
-                        pass
+                    self.dm_queue.send(host, embed=e)
             if dmwin:
                 winmessage = await self.config.guild(message.guild).winmessage()
                 for mention in final_list:
@@ -558,14 +846,28 @@ class Giveaways(commands.Cog):
                         .replace("{guild}", message.guild.name)
                         .replace("{url}", message.jump_url),
                     )
-                    try:
-                        await mention.send(embed=e)
-                    except discord.errors.Forbidden:
-                        pass
+                    self.dm_queue.send(mention, embed=e)
+            metrics.lap("end_phase", mark, phase="dm")
+
+    async def cog_before_invoke(self, ctx: commands.Context):
+        await self.registry.wait_until_loaded()
+
+    async def cog_after_invoke(self, ctx: commands.Context):
+        name = ctx.command.qualified_name
+        if name.startswith("giveawayset") and ctx.guild:
+            self.invalidate_settings(ctx.guild)
+        elif name.startswith("giveaway secretblacklist"):
+            self.invalidate_settings()
 
     def cog_unload(self):
         self.giveaway_task.cancel()
-        for task in self.tasks:
+        self.dm_queue.stop()
+        self.donators.cancel()
+        asyncio.create_task(self.registry.flush())
+        self.ledger.flush()
+        if amari_api._session:
+            asyncio.create_task(amari_api._session.close())
+        for task in list(self.tasks):
             task.cancel()
 
     async def send_final_message(self, ctx, ping, msg, embed):
@@ -579,6 +881,7 @@ class Giveaways(commands.Cog):
                 role = ctx.guild.get_role(int(pingrole))
                 if not role:
                     await self.config.guild(ctx.guild).pingrole.clear()
+                    self.invalidate_settings(ctx.guild)
                 else:
                     final_message += role.mention
                     final_message += " "
@@ -613,39 +916,55 @@ class Giveaways(commands.Cog):
         previous = await self.config.member(user).donated()
         previous += amt
         await self.config.member(user).donated.set(previous)
-        await self.update_donator_roles(user)
-
-    async def update_donator_roles(self, member: discord.Member) -> None:
-        roles = await self.config.guild(member.guild).donatorroles()
-        donated = await self.config.member(member).donated()
-
-        for role_id, amount_required in roles.items():
-            role = member.guild.get_role(int(role_id))
-            if not role:
-                all_roles = await self.config.guild(member.guild).donatorroles()
-                all_roles.pop(role_id)
-                await self.config.guild(member.guild).roles.set(all_roles)
-                continue
-            if donated < amount_required:
-                if role not in member.roles:
-                    continue
-                try:
-                    await member.remove_roles(role)
-                except (discord.errors.Forbidden, discord.HTTPException):
-                    pass
-            else:
-                if role in member.roles:
-                    continue
-                try:
-                    await member.add_roles(role)
-                except discord.errors.Forbidden:
-                    pass
+        if user.guild.id in self.leaderboards:
+            self.leaderboards[user.guild.id].update(user.id, previous)
+        await self.update_donator_roles(user, previous)
+
+    async def get_leaderboard(self, guild: discord.Guild) -> DonationLeaderboard:
+        """The guild's donation leaderboard, built from config the first time it's needed.
 
-    async def gen_req_message(self, guild: discord.Guild, requirements: dict) -> str:
+        Only current members are on it, the member listeners keep it that way.
+        """
+        if guild.id not in self.leaderboards:
+            member_data = await self.config.all_members(guild)
+            self.leaderboards[guild.id] = DonationLeaderboard(
+                {
+                    int(member_id): data["donated"]
+                    for member_id, data in member_data.items()
+                    if guild.get_member(int(member_id)) is not None
+                }
+            )
+        return self.leaderboards[guild.id]
+
+    async def update_donator_roles(
+        self, member: discord.Member, donated: Optional[int] = None
+    ) -> None:
+        thresholds = (await self.get_settings(member.guild))["donatorroles"]
+        if not thresholds:
+            return
+        roles, missing = resolve_roles(member.guild, thresholds)
+        if missing:
+            await self.donators.prune_missing(member.guild, missing)
+            self.invalidate_settings(member.guild)
+
+        if donated is None:
+            donated = await self.config.member(member).donated()
+        change = role_change(member, roles, donated)
+        if not change:
+            return
+        try:
+            if change.add:
+                await member.add_roles(*change.add)
+            if change.remove:
+                await member.remove_roles(*change.remove)
+        except discord.HTTPException:
+            pass
+
+    async def gen_req_message(self, guild: discord.Guild, requirements: Requirements) -> str:
         reqs = ""
-        if requirements["roles"]:
+        if requirements.roles:
             roles = []
-            for r in requirements["roles"]:
+            for r in sorted(requirements.roles):
                 role = guild.get_role(r)
                 if not role:
                     continue
@@ -653,35 +972,35 @@ class Giveaways(commands.Cog):
             roles = humanize_list(roles)
             reqs += f"Roles: {roles}\n"
 
-        if requirements["mee6"]:
-            reqs += f"Minimum MEE6 Level: {requirements['mee6']}\n"
+        if requirements.mee6:
+            reqs += f"Minimum MEE6 Level: {requirements.mee6}\n"
 
-        if requirements["amari"]:
-            reqs += f"Minimum Amari Level: {requirements['amari']}\n"
+        if requirements.amari:
+            reqs += f"Minimum Amari Level: {requirements.amari}\n"
 
-        if requirements["weeklyamari"]:
-            reqs += f"Minimum Weekly Amari: {requirements['weeklyamari']}\n"
+        if requirements.weeklyamari:
+            reqs += f"Minimum Weekly Amari: {requirements.weeklyamari}\n"
 
-        if requirements["joindays"]:
-            reqs += f"Minimum days in server: {requirements['joindays']}\n"
+        if requirements.joindays:
+            reqs += f"Minimum days in server: {requirements.joindays}\n"
 
-        if requirements["server"]:
-            server = self.bot.get_guild(requirements["server"])
+        if requirements.server:
+            server = self.bot.get_guild(requirements.server)
             if not server:
                 pass
             else:
                 invite = await self.create_invite(server)
-                reqs += "Must join **[{server.name}]({invite})**\n"
+                reqs += f"Must join **[{server.name}]({invite})**\n"
 
-        if requirements["invites"]:
-            reqs += f"Minimum number of invites: {requirements['invites']}"
+        if requirements.invites:
+            reqs += f"Minimum number of invites: {requirements.invites}"
 
-        if requirements["shared"]:
+        if requirements.shared:
             reqs += (
-                f"Minimum shared dankmemer coins in server: {requirements['shared']}\n"
+                f"Minimum shared dankmemer coins in server: {requirements.shared}\n"
             )
 
-        bypassroles = await self.config.guild(guild).bypassrole()
+        bypassroles = (await self.get_settings(guild))["bypassrole"]
 
         if bypassroles:
             roles = []
@@ -853,6 +1172,7 @@ class Giveaways(commands.Cog):
     ):
         """Sets a multiplier for a role. At the end when a giveaway ends, for each role they have, the multilpier will add on that amount, not multiply.
         It will enter the user that many times into the giveaway, if they enter a giveaway, they automatically have 1 entry. So each role multiplier adds one on to it.
+        Use `gset multistack` to change how the multipliers of several roles combine.
         """
         if not role:
             role = ctx.guild.default_role
@@ -863,6 +1183,46 @@ class Giveaways(commands.Cog):
         await self.config.role(role).multiplier.set(multi)
         await ctx.send(f"`{role}` will now have a multilpier of {multi}")
 
+    @giveawayset.command(name="multistack", aliases=["stacking"])
+    @commands.admin_or_permissions(administrator=True)
+    async def multistack(self, ctx, mode: str = "additive"):
+        """Set how role multipliers stack when a member has more than one
+
+        `additive` - 1 entry plus every multiplier added together (default)
+        `max` - 1 entry plus only the highest multiplier
+        `multiplicative` - each role multiplies the entries by 1 + its multiplier"""
+        mode = mode.lower()
+        if mode not in STACKING_MODES:
+            return await ctx.send(f"The mode has to be one of {humanize_list(STACKING_MODES)}")
+        await self.config.guild(ctx.guild).multistack.set(mode)
+        await ctx.send(f"Role multipliers will now stack with the `{mode}` mode")
+
+    @giveawayset.command(name="progress", aliases=["progressthreshold"])
+    @commands.admin_or_permissions(administrator=True)
+    async def progress(self, ctx, entries: int = 1000):
+        """Set how many entries a giveaway needs before the bot posts its progress while ending it. Use 0 to turn this off"""
+        if entries < 0:
+            return await ctx.send("The amount of entries can't be negative")
+        await self.config.guild(ctx.guild).progressthreshold.set(entries)
+        if not entries:
+            return await ctx.send("I will no longer post progress when ending giveaways")
+        await ctx.send(
+            f"I will now post progress when ending giveaways with at least {self.comma_format(entries)} entries"
+        )
+
+    @giveawayset.command(name="archivedays", aliases=["archive"])
+    @commands.admin_or_permissions(administrator=True)
+    async def archivedays(self, ctx, days: int = 30):
+        """Set how many days ended giveaways stay in the config before they're compressed into the archive. Use 0 to never archive them
+
+        Archived giveaways can still be rerolled"""
+        if days < 0:
+            return await ctx.send("The amount of days can't be negative")
+        await self.config.guild(ctx.guild).archivedays.set(days)
+        if not days:
+            return await ctx.send("I will no longer archive ended giveaways")
+        await ctx.send(f"Giveaways will be archived {days} days after they end")
+
     @giveawayset.command(name="settings", aliases=["showsettings", "stats"])
     async def settings(self, ctx):
         """View server settings"""
@@ -908,7 +1268,16 @@ class Giveaways(commands.Cog):
                 else "None"
             ),
         )
-        e.add_field(name="Total Giveaways", value=len(data["giveaways"].keys()))
+        archived = await self.registry.archived_count(ctx.guild.id)
+        e.add_field(
+            name="Total Giveaways",
+            value=len(self.registry.guild_giveaways(ctx.guild.id)) + archived,
+        )
+        e.add_field(name="Multiplier Stacking", value=data["multistack"])
+        e.add_field(
+            name="Archive After",
+            value=f"{data['archivedays']} days" if data["archivedays"] else "Never",
+        )
         e.add_field(name="DM on win", value=data["dmwin"])
         e.add_field(name="DM host", value=data["dmhost"])
         e.add_field(name="Autodelete invocation messages", value=data["delete"])
@@ -944,6 +1313,11 @@ class Giveaways(commands.Cog):
             inline=False,
         )
         e.add_field(name="Emoji", value=data["emoji"])
+        hits, misses, failed, cached = self.invite_cache.stats()
+        e.add_field(
+            name="Invite Cache",
+            value=f"{hits} hits, {misses} misses, {failed} skipped after a failure, {cached} cached invites",
+        )
 
         await ctx.send(embed=e)
 
@@ -1042,7 +1416,8 @@ class Giveaways(commands.Cog):
         roles = await self.config.guild(ctx.guild).donatorroles()
         roles[str(role.id)] = amount
         await self.config.guild(ctx.guild).donatorroles.set(roles)
-        await ctx.send("Updated")
+        self.donators.schedule(ctx.guild)
+        await ctx.send("Updated, member roles will be synced shortly")
 
     @donator.command()
     async def remove(self, ctx: commands.Context, role: discord.Role):
@@ -1054,7 +1429,56 @@ class Giveaways(commands.Cog):
             return await ctx.send("This role isn't a donator role")
 
         await self.config.guild(ctx.guild).donatorroles.set(roles)
-        await ctx.send(f"Removed `{role.name}` as a donator role")
+        self.donators.retire(ctx.guild, role)
+        await ctx.send(
+            f"Removed `{role.name}` as a donator role, it will be taken off its members shortly"
+        )
+
+    @donator.command(name="sync", aliases=["reconcile"])
+    @commands.max_concurrency(1, commands.BucketType.guild)
+    async def donator_sync(self, ctx: commands.Context, dry_run: bool = False):
+        """Give and remove donator roles for everyone based on their donations
+
+        Specify True for dry_run to see what would change without touching any roles"""
+        lock = self.donators.lock(ctx.guild.id)
+        if lock.locked():
+            return await ctx.send("Donator roles are already being synced in this server")
+        async with lock:
+            await self._donator_sync(ctx, dry_run)
+
+    async def _donator_sync(self, ctx: commands.Context, dry_run: bool):
+        async with ctx.typing():
+            plan = await self.donators.plan(ctx.guild)
+        summary = (
+            f"Checked {self.comma_format(plan.checked)} members, "
+            f"{self.comma_format(len(plan.changes))} need changes "
+            f"({plan.additions} roles to add, {plan.removals} to remove)"
+        )
+        if plan.missing:
+            summary += f"\n{len(plan.missing)} donator roles no longer exist and will be removed"
+        if dry_run or not plan.changes:
+            return await ctx.send(summary)
+
+        message = await ctx.send(summary + "\nSyncing...")
+        last_edit = 0
+
+        async def progress(done: int, total: int):
+            nonlocal last_edit
+            now = datetime.utcnow().timestamp()
+            if done != total and now - last_edit < 5:
+                return
+            last_edit = now
+            try:
+                await message.edit(content=f"{summary}\nSynced {done}/{total} members...")
+            except discord.HTTPException:
+                pass
+
+        await self.donators.prune_missing(ctx.guild, plan.missing)
+        await self.donators.apply(ctx.guild, plan, progress)
+        await ctx.send(
+            f"Done, updated {plan.applied} members"
+            + (f" and failed on {plan.failed}" if plan.failed else "")
+        )
 
     @donator.command(name="settings", aliases=["show", "showsettings"])
     async def _settings(self, ctx: commands.Context):
@@ -1123,18 +1547,8 @@ class Giveaways(commands.Cog):
     @commands.admin_or_permissions(manage_guild=True)
     async def clearended(self, ctx, *dontclear):
         """Clear the giveaways that have already ended in your server. Put all the message ids you dont want to clear after this to not clear them"""
-        gaws = await self.config.guild(ctx.guild).giveaways()
-        to_delete = []
-        for messageid, info in gaws.items():
-            if str(messageid) in dontclear:
-                continue
-            if not info["Ongoing"]:
-                to_delete.append(str(messageid))
-
-        for messageid in to_delete:
-            gaws.pop(messageid)
-        await self.config.guild(ctx.guild).giveaways.set(gaws)
-        await ctx.send(f"Successfully cleared {len(to_delete)} inactive giveaways")
+        cleared = await self.registry.clear_archived(ctx.guild.id, keep=dontclear)
+        await ctx.send(f"Successfully cleared {cleared} inactive giveaways")
 
     @giveaway.command(name="help")
     async def g_help(self, ctx):
@@ -1281,21 +1695,9 @@ class Giveaways(commands.Cog):
             return await ctx.send(str(exc))
 
         guild = ctx.guild
-        data = await self.config.guild(guild).all()
-
-        gaws = await self.config.guild(guild).giveaways()
 
         if not requirements:
-            requirements = {
-                "mee6": None,
-                "amari": None,
-                "weeklyamari": None,
-                "roles": None,
-                "joindays": None,
-                "invites": None,
-                "server": None,
-                "shared": None,
-            }
+            requirements = Requirements()
         else:
             if requirements["roles"]:
                 requirements["roles"] = [r.id for r in requirements["roles"]]
@@ -1316,6 +1718,7 @@ class Giveaways(commands.Cog):
                         f"I cannot fetch this invite, please make sure it is valid and I am in this server"
                     )
                 requirements["server"] = fetched_server.id
+            requirements = Requirements.from_dict(requirements)
 
         e = discord.Embed(
             title=title,
@@ -1341,17 +1744,18 @@ class Giveaways(commands.Cog):
 
         msg = str(gaw_msg.id)
 
-        gaws[msg] = {}
-        gaws[msg]["host"] = ctx.author.id
-        gaws[msg]["Ongoing"] = True
-        gaws[msg]["requirements"] = requirements
-        gaws[msg]["winners"] = winners
-        gaws[msg]["title"] = title
-        gaws[msg]["endtime"] = datetime.utcnow().timestamp() + int(time)
-        gaws[msg]["channel"] = ctx.channel.id
-        gaws[msg]["donor"] = flags["donor"]
+        info = {}
+        info["host"] = ctx.author.id
+        info["Ongoing"] = True
+        info["requirements"] = requirements
+        info["winners"] = winners
+        info["title"] = title
+        info["endtime"] = datetime.utcnow().timestamp() + int(time)
+        info["channel"] = ctx.channel.id
+        info["donor"] = flags["donor"]
 
-        await self.config.guild(guild).giveaways.set(gaws)
+        self.registry.add(guild.id, msg, info)
+        self.ledger.start(msg)
 
         delete = await self.config.guild(ctx.guild).delete()
 
@@ -1403,7 +1807,7 @@ class Giveaways(commands.Cog):
         self.message_cache[str(msg)] = gaw_msg
         self.giveaway_cache[str(msg)] = True
 
-        self.tasks.append(asyncio.create_task(self.start_giveaway(int(msg), gaws[msg])))
+        self.scheduler.schedule(msg, info)
 
     @giveaway.command(name="end")
     async def end(self, ctx, messageid: Optional[IntOrLink] = None):
@@ -1415,7 +1819,7 @@ class Giveaways(commands.Cog):
                 msg = ctx.message.reference.resolved
                 if isinstance(msg, discord.Message):
                     messageid = msg.id
-        gaws = await self.config.guild(ctx.guild).giveaways()
+        gaws = self.registry.guild_giveaways(ctx.guild.id)
         if messageid is None:
             for messageid, info in list(gaws.items())[::-1]:
                 if info["channel"] == ctx.channel.id and info["Ongoing"]:
@@ -1424,21 +1828,30 @@ class Giveaways(commands.Cog):
             return await ctx.send(
                 "There aren't any giveaways in this channel, specify a message id/link to end another channels giveaways"
             )
-        gaws = await self.config.guild(ctx.guild).giveaways()
         if str(messageid) not in gaws:
+            if await self.registry.get_archived(ctx.guild.id, messageid):
+                return await ctx.send(
+                    f"This giveaway has ended. You can reroll it with `{ctx.prefix}g reroll {messageid}`"
+                )
             return await ctx.send("This isn't a giveaway.")
-        elif gaws[str(messageid)]["Ongoing"] == False:
-            return await ctx.send(
-                f"This giveaway has ended. You can reroll it with `{ctx.prefix}g reroll {messageid}`"
-            )
+        elif not gaws[str(messageid)]["Ongoing"]:
+            return await ctx.send("This giveaway is already ending.")
         else:
             await self.end_giveaway(messageid, gaws[str(messageid)])
 
     @giveaway.command(name="reroll")
     async def reroll(
-        self, ctx, messageid: Optional[IntOrLink], winners: Optional[int] = 1
+        self,
+        ctx,
+        messageid: Optional[IntOrLink],
+        winners: Optional[int] = 1,
+        seed: Optional[int] = None,
+        exclude_previous: Optional[bool] = False,
     ):
-        """Reroll a giveaway"""
+        """Reroll a giveaway
+
+        Previous winners can win again unless `exclude_previous` is true, e.g. `[p]g reroll <message> 2 true`.
+        To check an earlier draw use `[p]g replay` instead"""
         if not is_manager(ctx):
             return await ctx.send("You do not have proper permissions to do this. You need to be either admin or have the giveaway role. This cannot be run outside announcement channels either.")
         if not messageid:
@@ -1446,25 +1859,77 @@ class Giveaways(commands.Cog):
                 msg = ctx.message.reference.resolved
                 if isinstance(msg, discord.Message):
                     messageid = msg.id
-        gaws = await self.config.guild(ctx.guild).giveaways()
         if not messageid:
+            gaws = await self.registry.all_archived(ctx.guild.id)
             for messageid, info in list(gaws.items())[::-1]:
-                if info["channel"] == ctx.channel.id and info["Ongoing"] == False:
-                    await self.end_giveaway(messageid, info)
+                if info["channel"] == ctx.channel.id:
+                    await self.end_giveaway(messageid, info, winners, seed, exclude_previous)
                     return
             return await ctx.send(
                 "There aren't any giveaways in this channel, specify a message id/link to end another channels giveaways"
             )
         elif winners <= 0:
             return await ctx.send("You can't have no winners.")
-        if str(messageid) not in gaws:
-            return await ctx.send("This giveaway does not exist")
-        elif gaws[str(messageid)]["Ongoing"] == True:
+        if messageid in self.registry:
             return await ctx.send(
                 f"This giveaway has not yet ended, you can end it with `{ctx.prefix}g end {messageid}`"
             )
-        else:
-            await self.end_giveaway(messageid, gaws[str(messageid)], winners)
+        info = await self.registry.get_archived(ctx.guild.id, messageid)
+        if not info:
+            return await ctx.send("This giveaway does not exist")
+        await self.end_giveaway(messageid, info, winners, seed, exclude_previous)
+
+    @giveaway.command(name="replay")
+    async def replay(self, ctx, messageid: IntOrLink, draw: int = 1):
+        """Repeat a draw of an ended giveaway with its seed, for auditing.
+
+        Draw 1 is the original end and every reroll adds another. The draw is run again
+        on the current entrants, leaving out the winners of the draws before it if that draw did"""
+        if not is_manager(ctx):
+            return await ctx.send("You do not have proper permissions to do this. You need to be either admin or have the giveaway role. This cannot be run outside announcement channels either.")
+        info = await self.registry.get_archived(ctx.guild.id, messageid)
+        if not info:
+            return await ctx.send("This giveaway does not exist or hasn't ended")
+        draws = info.get("draws", [])
+        if not draws:
+            return await ctx.send("This giveaway has no recorded draws to replay")
+        if not 1 <= draw <= len(draws):
+            return await ctx.send(f"This giveaway has {len(draws)} draw(s)")
+        channel = self.bot.get_channel(info["channel"])
+        if not channel:
+            return await ctx.send("This message is no longer available")
+        try:
+            message = await channel.fetch_message(int(messageid))
+        except discord.NotFound:
+            return await ctx.send("Couldn't find this giveaway")
+
+        data = await self.get_settings(ctx.guild)
+        reaction = discord.utils.find(lambda r: str(r) == data["emoji"], message.reactions)
+        async with ctx.typing():
+            evaluation = await self.ledger_evaluation(messageid, message, info, reaction)
+            if evaluation is None:
+                evaluation = await self.collect_entrants(
+                    messageid, message, info, reaction, data
+                )
+        recorded = draws[draw - 1]
+        previous = [user_id for d in draws[: draw - 1] for user_id in d["winners"]]
+        winner_ids = run_draw(
+            evaluation.weights.items(),
+            len(recorded["winners"]),
+            recorded["seed"],
+            previous,
+            recorded.get("exclude_previous", True),
+        )["winners"]
+        outcome = (
+            "matches the recorded winners"
+            if winner_ids == recorded["winners"]
+            else "doesn't match the recorded winners, the entrants have changed since"
+        )
+        winners = ", ".join(f"<@{user_id}>" for user_id in winner_ids) or "None"
+        await ctx.send(
+            f"Draw {draw} with seed `{recorded['seed']}`: {winners}\nThis {outcome}",
+            allowed_mentions=discord.AllowedMentions.none(),
+        )
 
     @giveaway.command(name="ping")
     async def g_ping(self, ctx, *, message: str = None):
@@ -1482,6 +1947,7 @@ class Giveaways(commands.Cog):
         role = ctx.guild.get_role(pingrole)
         if not role:
             await self.config.guild(ctx.guild).pingrole.clear()
+            self.invalidate_settings(ctx.guild)
             try:
                 return await ctx.send(message, allowed_mentions=m)
             except discord.HTTPException:
@@ -1500,15 +1966,10 @@ class Giveaways(commands.Cog):
         async with ctx.typing():
             counter = 0
             if cacheglobal == "--global":
-                all_guilds = await self.config.all_guilds()
-                for guild_id, data in all_guilds.items():
+                for guild_id in {g for g, _, _ in self.registry.all_giveaways()}:
                     counter = 0
-                    giveaways = data["giveaways"]
+                    giveaways = self.registry.guild_giveaways(guild_id)
                     for messageid, info in giveaways.items():
-                        if active:
-                            if not info["Ongoing"]:
-                                continue
-
                         if str(messageid) in self.message_cache:
                             continue
                         message = self.bot._connection._get_message(int(messageid))
@@ -1528,13 +1989,10 @@ class Giveaways(commands.Cog):
                         continue
                     e.description += f"Cached {counter} messages in {guild.name}\n"
             else:
-                for messageid, info in (
-                    await self.config.guild(ctx.guild).giveaways()
-                ).items():
-                    if active:
-                        if not info["Ongoing"]:
-                            continue
-
+                giveaways = dict(self.registry.guild_giveaways(ctx.guild.id))
+                if not active:
+                    giveaways.update(await self.registry.all_archived(ctx.guild.id))
+                for messageid, info in giveaways.items():
                     if str(messageid) in self.message_cache:
                         continue
                     message = self.bot._connection._get_message(int(messageid))
@@ -1553,6 +2011,72 @@ class Giveaways(commands.Cog):
 
         await ctx.send(embed=e)
 
+    @giveaway.command(name="status")
+    @commands.is_owner()
+    async def status(self, ctx):
+        """Owner Utility to view the state of the giveaway scheduler and DM queue"""
+        e = discord.Embed(title="Giveaway Scheduler", color=await ctx.embed_color())
+        e.add_field(name="Queued Giveaways", value=self.scheduler.depth)
+        wakeup = self.scheduler.next_wakeup()
+        if wakeup is None:
+            next_event = "Nothing scheduled"
+        else:
+            next_event = self.display_time(
+                max(round(wakeup - datetime.utcnow().timestamp()), 0)
+            )
+            next_event = next_event or "Now"
+        e.add_field(name="Next Event In", value=next_event)
+        if self.rehydration:
+            e.add_field(
+                name="Startup",
+                value=(
+                    f"Loaded {self.rehydration['live']} giveaways in {self.rehydration['seconds']:.2f}s\n"
+                    f"Overdue: {self.rehydration['overdue']}\n"
+                    f"Archived: {self.rehydration['migrated']}"
+                ),
+            )
+        e.add_field(
+            name="DM Queue",
+            value=(
+                f"Queued: {self.dm_queue.depth}\n"
+                f"Sent: {self.dm_queue.sent}\n"
+                f"Failed: {self.dm_queue.failed}\n"
+                f"Dropped: {self.dm_queue.dropped}\n"
+                f"Deduplicated: {self.dm_queue.deduped}"
+            ),
+        )
+        await ctx.send(embed=e)
+
+    @giveaway.command(name="stats", aliases=["metrics"])
+    @commands.is_owner()
+    async def g_stats(self, ctx, export: bool = False):
+        """Owner Utility to view latency percentiles for the giveaway hot paths
+
+        Pass `True` to also write them in the Prometheus text format to the cog's data folder"""
+        series = metrics.series()
+        if not series:
+            return await ctx.send("Nothing has been measured yet")
+
+        header = f"{'metric':<28}{'count':>8}{'p50 ms':>9}{'p95 ms':>9}{'p99 ms':>9}{'max ms':>9}"
+        lines = [header, "-" * len(header)]
+        for name, labels, histogram in series:
+            if labels:
+                name += f"[{'/'.join(value for _, value in labels)}]"
+            lines.append(
+                f"{name:<28}{histogram.count:>8}"
+                f"{histogram.percentile(50) * 1000:>9.2f}"
+                f"{histogram.percentile(95) * 1000:>9.2f}"
+                f"{histogram.percentile(99) * 1000:>9.2f}"
+                f"{histogram.max * 1000:>9.2f}"
+            )
+        for page in pagify("\n".join(lines), page_length=1950):
+            await ctx.send(box(page))
+
+        if export:
+            path = cog_data_path(self) / "metrics.prom"
+            metrics.export(path)
+            await ctx.send(f"Exported the metrics to `{path}`")
+
     @giveaway.command(name="list")
     @commands.cooldown(1, 30, commands.BucketType.member)
     @commands.max_concurrency(2, commands.BucketType.user)
@@ -1560,12 +2084,13 @@ class Giveaways(commands.Cog):
         """List the giveways in the server. Specify True for can_join paramater to only list the ones you can join"""
         async with ctx.typing():
             giveaway_list = []
-            bypassrole = await self.config.guild(ctx.guild).bypassrole()
-            gaws = await self.config.guild(ctx.guild).giveaways()
+            gaws = {
+                str(messageid): info
+                for messageid, info in self.registry.guild_giveaways(ctx.guild.id).items()
+                if info["Ongoing"]
+            }
+            results = await self.can_join_all(ctx.author, gaws)
             for messageid, info in gaws.items():
-                messageid = str(messageid)
-                if not info["Ongoing"]:
-                    continue
                 if not can_join:
                     jump_url = f"https://discord.com/channels/{ctx.guild.id}/{info['channel']}/{messageid}"
 
@@ -1576,7 +2101,7 @@ class Giveaways(commands.Cog):
                     header += " | Channel: <#{0}> | ID: {1}".format(
                         info["channel"], messageid
                     )
-                    can_join_var = await self.can_join(ctx.author, info)
+                    can_join_var = results[messageid]
                     if can_join_var == True:
                         header += " :white_check_mark: You can join this giveaway\n"
                         giveaway_list.append(header)
@@ -1593,8 +2118,7 @@ class Giveaways(commands.Cog):
                     header += " | Channel: <#{0}> | ID: {1}".format(
                         info["channel"], messageid
                     )
-                    can_join_var = await self.can_join(ctx.author, info)
-                    if can_join_var == True:
+                    if results[messageid] == True:
                         header += " :white_check_mark: You can join this giveaway\n"
                         giveaway_list.append(header)
 
@@ -1629,7 +2153,7 @@ class Giveaways(commands.Cog):
                 msg = ctx.message.reference.resolved
                 if isinstance(msg, discord.Message):
                     giveaway = msg.id
-        gaws = await self.config.guild(ctx.guild).giveaways()
+        gaws = self.registry.guild_giveaways(ctx.guild.id)
         if not giveaway:
             for messageid, info in list(gaws.items())[::-1]:
                 if info["Ongoing"] and info["channel"] == ctx.channel.id:
@@ -1659,9 +2183,11 @@ class Giveaways(commands.Cog):
                     except discord.NotFound:
                         continue
                     info["Ongoing"] = False
-                    gaws[messageid] = info
-                    await self.config.guild(ctx.guild).giveaways.set(gaws)
+                    await self.registry.archive(messageid)
+                    self.ledger.delete(messageid)
                     self.giveaway_cache[messageid] = False
+                    self.scheduler.cancel(messageid)
+                    self.render_cache.pop(messageid, None)
                     return await ctx.send(
                         "Cancelled the giveaway for **{0}**".format(info["title"])
                     )
@@ -1671,9 +2197,11 @@ class Giveaways(commands.Cog):
             )
         giveaway = str(giveaway)
         if giveaway not in gaws.keys():
+            if await self.registry.get_archived(ctx.guild.id, giveaway):
+                return await ctx.send("This giveaway has ended")
             return await ctx.send("This giveaway does not exist")
         if not gaws[giveaway]["Ongoing"]:
-            return await ctx.send("This giveaway has ended")
+            return await ctx.send("This giveaway is already ending")
 
         data = gaws[giveaway]
         chan = self.bot.get_channel(data["channel"])
@@ -1686,9 +2214,12 @@ class Giveaways(commands.Cog):
         except discord.NotFound:
             return await ctx.send("Couldn't find this giveaway")
 
-        gaws[giveaway]["Ongoing"] = False
+        data["Ongoing"] = False
         self.giveaway_cache[giveaway] = False
-        await self.config.guild(ctx.guild).giveaways.set(gaws)
+        self.scheduler.cancel(giveaway)
+        self.render_cache.pop(giveaway, None)
+        await self.registry.archive(giveaway)
+        self.ledger.delete(giveaway)
 
         e = discord.Embed(
             title=data["title"],
@@ -1705,8 +2236,6 @@ class Giveaways(commands.Cog):
             await m.edit(content="Giveaway Cancelled", embed=e)
         except discord.NotFound:
             return await ctx.send("I couldn't find this giveaway")
-        gaws[giveaway]["Ongoing"] = False
-        await self.config.guild(ctx.guild).giveaways.set(gaws)
         await ctx.send("Cancelled the giveaway for **{0}**".format(data["title"]))
 
 
@@ -1739,6 +2268,9 @@ class Giveaways(commands.Cog):
             )
             e.description += f"Amount Donated: {format_donated} \n"
             e.description += f"Average Donation Value: {average_donated}"
+            rank = (await self.get_leaderboard(ctx.guild)).rank(ctx.author.id)
+            if rank:
+                e.description += f"\nLeaderboard Rank: #{rank}"
 
             if len(notes) == 0:
                 pass
@@ -1752,13 +2284,7 @@ class Giveaways(commands.Cog):
         """View the top donators"""
         if amt < 1:
             return await ctx.send("no")
-        member_data = await self.config.all_members(ctx.guild)
-        sorted_data = [
-            (member, data["donated"])
-            for member, data in member_data.items()
-            if data["donated"] > 0 and ctx.guild.get_member(int(member)) is not None
-        ]
-        ordered_data = sorted(sorted_data[:amt], key=lambda m: m[1], reverse=True)
+        ordered_data = (await self.get_leaderboard(ctx.guild)).top(amt)
 
         if len(ordered_data) == 0:
             return await ctx.send("I have no data for your server")
@@ -1948,31 +2474,61 @@ class Giveaways(commands.Cog):
         await self.config.member(member).notes.set(notes)
         await ctx.send("Removed a note.")
 
+    @commands.Cog.listener()
+    async def on_member_join(self, member: discord.Member):
+        leaderboard = self.leaderboards.get(member.guild.id)
+        if leaderboard is not None:
+            leaderboard.update(member.id, await self.config.member(member).donated())
+
+    @commands.Cog.listener()
+    async def on_member_remove(self, member: discord.Member):
+        leaderboard = self.leaderboards.get(member.guild.id)
+        if leaderboard is not None:
+            leaderboard.update(member.id, 0)
+
+    @commands.Cog.listener()
+    async def on_disconnect(self):
+        # reactions made while we're away aren't replayed on a new session
+        self.ledger.invalidate()
+
+    @commands.Cog.listener()
+    async def on_invite_delete(self, invite: discord.Invite):
+        if invite.guild:
+            self.invite_cache.invalidate(invite.guild.id, invite.code)
+
     @commands.Cog.listener()
     async def on_raw_reaction_add(self, payload):
-        channel = self.bot.get_channel(payload.channel_id)
-        user = channel.guild.get_member(payload.user_id)
-        if user.bot:
+        if payload.message_id not in self.registry:
             return
-        data = await self.config.guild(channel.guild).all()
-        gaws = data["giveaways"]
-        if str(payload.message_id) not in gaws:
+        info = self.registry.get(payload.message_id)
+        if not info["Ongoing"]:
             return
-        elif gaws[str(payload.message_id)]["Ongoing"] == False:
+        channel = self.bot.get_channel(payload.channel_id)
+        if not channel or not getattr(channel, "guild", None):
             return
-
-        if not channel.permissions_for(channel.guild.me).manage_messages:
+        user = payload.member or channel.guild.get_member(payload.user_id)
+        if not user or user.bot:
             return
+        data = await self.get_settings(channel.guild)
 
         if str(payload.emoji) != data["emoji"]:
             return
 
-        bypassrole = data["bypassrole"]
-        if bypassrole in [r.id for r in user.roles]:
-            return
+        if set(data["bypassrole"]) & {r.id for r in user.roles}:
+            can_join = True
+        else:
+            can_join = await self.can_join(user, info)
 
-        can_join = await self.can_join(user, gaws[str(payload.message_id)])
         if can_join == True:
+            weight = await self.calculate_multi(user)
+        else:
+            weight = 0
+        self.ledger.add(payload.message_id, user.id, weight)
+
+        if not channel.permissions_for(channel.guild.me).manage_messages:
+            return
+
+        if can_join == True or can_join == False:
             return
         else:
             message = self.message_cache.get(
@@ -1988,5 +2544,23 @@ class Giveaways(commands.Cog):
                     "[JUMP_URL_HERE]", f"[this]({message.jump_url})"
                 ),
             )
-            await user.send(embed=e)
-        
+            self.dm_queue.send(
+                user,
+                embed=e,
+                priority=PRIORITY_LOW,
+                dedup_key=(payload.message_id, user.id),
+            )
+
+    @commands.Cog.listener()
+    async def on_raw_reaction_remove(self, payload):
+        if payload.message_id not in self.registry:
+            return
+        if not self.registry.get(payload.message_id)["Ongoing"]:
+            return
+        guild = self.bot.get_guild(payload.guild_id)
+        if not guild:
+            return
+        data = await self.get_settings(guild)
+        if str(payload.emoji) != data["emoji"]:
+            return
+        self.ledger.remove(payload.message_id, payload.user_id)
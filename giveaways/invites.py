@@ -0,0 +1,100 @@
+import discord
+import time
+
+from datetime import datetime, timedelta
+from typing import Dict, Optional, Tuple
+
+NO_INVITE = "Couldn't make an invite"
+
+# how long the invites we make last, they are replaced a minute before they expire
+INVITE_AGE = 86_400
+
+
+class InviteCache:
+    """Reuses one invite per server for server join requirements"""
+
+    def __init__(self, failure_ttl: int = 600):
+        self.failure_ttl = failure_ttl
+        self._invites: Dict[int, discord.Invite] = {}
+        self._failures: Dict[int, float] = {}
+        self.hits = 0
+        self.misses = 0
+        # lookups answered from a recent failure, neither an invite hit nor an API call
+        self.failed = 0
+
+    @staticmethod
+    def is_valid(invite: discord.Invite) -> bool:
+        if invite.revoked:
+            return False
+        if invite.max_uses and (invite.uses or 0) >= invite.max_uses:
+            return False
+        if invite.max_age:
+            if not invite.created_at:
+                return False
+            expires = invite.created_at + timedelta(seconds=invite.max_age)
+            # keep a minute of leeway so we never hand out an invite that's about to expire
+            if expires - timedelta(minutes=1) <= datetime.utcnow():
+                return False
+        return True
+
+    def invalidate(self, guild_id: int, code: Optional[str] = None) -> None:
+        invite = self._invites.get(guild_id)
+        if invite and (code is None or invite.code == code):
+            del self._invites[guild_id]
+        self._failures.pop(guild_id, None)
+
+    def stats(self) -> Tuple[int, int, int, int]:
+        return self.hits, self.misses, self.failed, len(self._invites)
+
+    async def get(self, guild: discord.Guild) -> str:
+        invite = self._invites.get(guild.id)
+        if invite and self.is_valid(invite):
+            self.hits += 1
+            return invite.url
+
+        failed_at = self._failures.get(guild.id)
+        if failed_at and time.monotonic() - failed_at < self.failure_ttl:
+            self.failed += 1
+            return NO_INVITE
+
+        self.misses += 1
+        invite = await self._find_existing(guild) or await self._create(guild)
+        if not invite:
+            self._invites.pop(guild.id, None)
+            self._failures[guild.id] = time.monotonic()
+            return NO_INVITE
+
+        self._invites[guild.id] = invite
+        self._failures.pop(guild.id, None)
+        return invite.url
+
+    async def _find_existing(self, guild: discord.Guild) -> Optional[discord.Invite]:
+        if not guild.me.guild_permissions.manage_guild:
+            return None
+        try:
+            invites = await guild.invites()
+        except discord.HTTPException:
+            return None
+
+        invites = [i for i in invites if not i.temporary and self.is_valid(i)]
+        # prefer our own invites, then ones that don't expire
+        invites.sort(
+            key=lambda i: (
+                getattr(i.inviter, "id", None) != guild.me.id,
+                i.max_age != 0,
+                i.max_uses != 0,
+            )
+        )
+        return invites[0] if invites else None
+
+    async def _create(self, guild: discord.Guild) -> Optional[discord.Invite]:
+        for channel in guild.text_channels:
+            if not channel.permissions_for(guild.me).create_instant_invite:
+                continue
+            try:
+                return await channel.create_invite(
+                    reason="For a server join requirement", max_age=INVITE_AGE, unique=False
+                )
+            except discord.HTTPException:
+                continue
+        return None
@@ -0,0 +1,47 @@
+from typing import Callable, Dict, List, Optional, Tuple
+
+from .skiplist import SkipList
+
+
+class DonationLeaderboard:
+    """A guild's donors ranked by amount donated, highest first.
+
+    Entries are ``(-amount, member_id)`` in a skip list so ties are broken by member id,
+    a donation moves a donor in O(log n) and the top k are read in O(k).
+    """
+
+    def __init__(self, amounts: Optional[Dict[int, int]] = None):
+        self._amounts: Dict[int, int] = {
+            member_id: amount for member_id, amount in (amounts or {}).items() if amount > 0
+        }
+        self._entries = SkipList((-amount, member_id) for member_id, amount in self._amounts.items())
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def update(self, member_id: int, amount: int) -> None:
+        previous = self._amounts.pop(member_id, None)
+        if previous is not None:
+            self._entries.remove((-previous, member_id))
+        if amount > 0:
+            self._amounts[member_id] = amount
+            self._entries.insert((-amount, member_id))
+
+    def rank(self, member_id: int) -> Optional[int]:
+        amount = self._amounts.get(member_id)
+        if amount is None:
+            return None
+        return self._entries.rank((-amount, member_id))
+
+    def top(
+        self, amount: int, include: Optional[Callable[[int], bool]] = None
+    ) -> List[Tuple[int, int]]:
+        """The top ``amount`` (member_id, donated) pairs, skipping members ``include`` rejects"""
+        results = []
+        for negative, member_id in self._entries:
+            if len(results) >= amount:
+                break
+            if include and not include(member_id):
+                continue
+            results.append((member_id, -negative))
+        return results
@@ -0,0 +1,133 @@
+import asyncio
+import logging
+
+from pathlib import Path
+from typing import Dict, List, Optional, Set
+
+log = logging.getLogger("red.andycogs.giveaways.ledger")
+
+
+class EntrantLedger:
+    """Append only record of who entered each giveaway, built from reaction events.
+
+    Every giveaway gets its own file with one line per event, ``+<user id> <weight>``
+    when someone enters and ``-<user id>`` when they leave. A weight of 0 means the
+    member didn't meet the requirements when they reacted. Only giveaways that had a
+    ledger from the start are tracked, so ending older ones falls back to the reactions.
+
+    A ledger is only known to be complete while every reaction event since it started
+    was seen, after a restart or a disconnect it has to be checked against the reactors.
+    """
+
+    def __init__(self, path: Path, flush_delay: float = 2):
+        self.path = path
+        self.path.mkdir(parents=True, exist_ok=True)
+        self.flush_delay = flush_delay
+        self._entries: Dict[str, Dict[int, int]] = {}
+        self._pending: Dict[str, List[str]] = {}
+        self._complete: Set[str] = set()
+        self._flush_task: Optional[asyncio.Task] = None
+
+    def _file(self, messageid: str) -> Path:
+        return self.path / f"{messageid}.log"
+
+    def start(self, messageid) -> None:
+        messageid = str(messageid)
+        self._file(messageid).touch()
+        self._entries[messageid] = {}
+        self._complete.add(messageid)
+
+    def complete(self, messageid) -> bool:
+        return str(messageid) in self._complete
+
+    def mark_complete(self, messageid) -> None:
+        """The ledger was checked against the reactors and is kept up to date from now on"""
+        self._complete.add(str(messageid))
+
+    def invalidate(self) -> None:
+        """Reaction events may have been missed, every ledger has to be checked again"""
+        self._complete.clear()
+
+    def tracked(self, messageid) -> bool:
+        return self.entries(messageid) is not None
+
+    def entries(self, messageid) -> Optional[Dict[int, int]]:
+        """The current {user id: weight} of a giveaway, or None if it isn't tracked"""
+        messageid = str(messageid)
+        if messageid in self._entries:
+            return self._entries[messageid]
+        file = self._file(messageid)
+        if not file.exists():
+            return None
+
+        entries = {}
+        with file.open() as f:
+            for line in f:
+                line = line.strip()
+                if not line:
+                    continue
+                try:
+                    if line[0] == "+":
+                        user_id, weight = line[1:].split()
+                        entries[int(user_id)] = int(weight)
+                    elif line[0] == "-":
+                        entries.pop(int(line[1:]), None)
+                except ValueError:
+                    continue
+        self._entries[messageid] = entries
+        return entries
+
+    def add(self, messageid, user_id: int, weight: int) -> None:
+        entries = self.entries(messageid)
+        if entries is None or entries.get(user_id) == weight:
+            return
+        entries[user_id] = weight
+        self._append(str(messageid), f"+{user_id} {weight}")
+
+    def remove(self, messageid, user_id: int) -> None:
+        entries = self.entries(messageid)
+        if entries is None or user_id not in entries:
+            return
+        del entries[user_id]
+        self._append(str(messageid), f"-{user_id}")
+
+    def forget(self, messageid) -> None:
+        """Drop a ledger from memory, the file stays for rerolls"""
+        messageid = str(messageid)
+        # write what hasn't been flushed yet so a reroll reads the complete file
+        lines = self._pending.pop(messageid, None)
+        if lines:
+            self._write(messageid, lines)
+        self._entries.pop(messageid, None)
+        self._complete.discard(messageid)
+
+    def delete(self, messageid) -> None:
+        messageid = str(messageid)
+        self._entries.pop(messageid, None)
+        self._pending.pop(messageid, None)
+        self._complete.discard(messageid)
+        try:
+            self._file(messageid).unlink()
+        except FileNotFoundError:
+            pass
+
+    def _append(self, messageid: str, line: str) -> None:
+        self._pending.setdefault(messageid, []).append(line)
+        if self._flush_task is None or self._flush_task.done():
+            self._flush_task = asyncio.create_task(self._delayed_flush())
+
+    async def _delayed_flush(self) -> None:
+        await asyncio.sleep(self.flush_delay)
+        self.flush()
+
+    def flush(self) -> None:
+        pending, self._pending = self._pending, {}
+        for messageid, lines in pending.items():
+            self._write(messageid, lines)
+
+    def _write(self, messageid: str, lines: List[str]) -> None:
+        try:
+            with self._file(messageid).open("a") as f:
+                f.write("\n".join(lines) + "\n")
+        except OSError:
+            log.exception("Failed to write the entrant ledger for %s", messageid)
@@ -0,0 +1,110 @@
+import time
+
+from bisect import bisect_left
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Dict, Iterator, List, Tuple
+
+# upper bounds in seconds, 100µs up to about a minute with each bucket 1.5x the last
+BUCKETS = tuple(0.0001 * 1.5 ** i for i in range(34))
+
+Labels = Tuple[Tuple[str, str], ...]
+
+
+class Histogram:
+    """Counts of observations per latency bucket, percentiles are read off the buckets"""
+
+    __slots__ = ("counts", "count", "total", "max")
+
+    def __init__(self):
+        self.counts = [0] * (len(BUCKETS) + 1)
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+
+    def observe(self, seconds: float) -> None:
+        self.counts[bisect_left(BUCKETS, seconds)] += 1
+        self.count += 1
+        self.total += seconds
+        if seconds > self.max:
+            self.max = seconds
+
+    def percentile(self, pct: float) -> float:
+        """The upper bound of the bucket the percentile falls in, capped at the largest value seen"""
+        if not self.count:
+            return 0.0
+        rank = pct / 100 * self.count
+        seen = 0
+        for index, count in enumerate(self.counts):
+            seen += count
+            if seen >= rank and count:
+                bound = BUCKETS[index] if index < len(BUCKETS) else self.max
+                return min(bound, self.max)
+        return self.max
+
+
+class Metrics:
+    """In-process latency histograms, keyed by a metric name and its labels"""
+
+    def __init__(self):
+        self.histograms: Dict[Tuple[str, Labels], Histogram] = {}
+
+    def histogram(self, name: str, **labels) -> Histogram:
+        key = (name, tuple(sorted((k, str(v)) for k, v in labels.items())))
+        histogram = self.histograms.get(key)
+        if histogram is None:
+            histogram = self.histograms[key] = Histogram()
+        return histogram
+
+    def observe(self, name: str, seconds: float, **labels) -> None:
+        self.histogram(name, **labels).observe(seconds)
+
+    def lap(self, name: str, start: float, **labels) -> float:
+        """Observe the time since ``start`` and return the current time for the next lap"""
+        now = time.perf_counter()
+        self.observe(name, now - start, **labels)
+        return now
+
+    @contextmanager
+    def time(self, name: str, **labels) -> Iterator[None]:
+        histogram = self.histogram(name, **labels)
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            histogram.observe(time.perf_counter() - start)
+
+    def series(self) -> List[Tuple[str, Labels, Histogram]]:
+        return [(name, labels, h) for (name, labels), h in sorted(self.histograms.items())]
+
+    def reset(self) -> None:
+        self.histograms.clear()
+
+    def prometheus(self, prefix: str = "giveaways") -> str:
+        """The histograms in the Prometheus text exposition format"""
+        lines = []
+        typed = set()
+        for name, labels, histogram in self.series():
+            metric = f"{prefix}_{name}_seconds"
+            if metric not in typed:
+                lines.append(f"# TYPE {metric} histogram")
+                typed.add(metric)
+            base = [f'{k}="{v}"' for k, v in labels]
+            cumulative = 0
+            for bound, count in zip(BUCKETS + (float("inf"),), histogram.counts):
+                cumulative += count
+                le = "+Inf" if bound == float("inf") else f"{bound:.6g}"
+                bucket_labels = ",".join(base + [f'le="{le}"'])
+                lines.append(f"{metric}_bucket{{{bucket_labels}}} {cumulative}")
+            suffix = f"{{{','.join(base)}}}" if base else ""
+            lines.append(f"{metric}_sum{suffix} {histogram.total:.6f}")
+            lines.append(f"{metric}_count{suffix} {histogram.count}")
+        return "\n".join(lines) + "\n"
+
+    def export(self, path: Path) -> None:
+        temp = path.with_suffix(".tmp")
+        temp.write_text(self.prometheus())
+        temp.replace(path)
+
+
+metrics = Metrics()
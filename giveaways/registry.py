@@ -0,0 +1,233 @@
+import asyncio
+import logging
+
+from datetime import datetime
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from redbot.core import Config
+
+from .archive import ColdArchive
+from .metrics import metrics
+from .requirements import compile_info, serialize
+
+log = logging.getLogger("red.andycogs.giveaways.registry")
+
+ARCHIVE = "ENDED_GIVEAWAY"
+
+
+class GiveawayRegistry:
+    """In memory index of live giveaways, written through to Config.
+
+    Live giveaways stay in the guild's ``giveaways`` dict, but every write only touches the
+    changed entry through ``set_raw``/``clear_raw``. Writes made close together are
+    coalesced into one flush. Ended giveaways are moved to a separate custom group
+    so that reading a guild's config never pays for its whole history.
+
+    Giveaways handed out by the registry have their requirements compiled, and are
+    converted back to the stored form whenever they're written.
+
+    With a ``cold`` archive, giveaways that ended long ago can be compacted out of
+    config entirely and are still found by ``get_archived``.
+    """
+
+    def __init__(
+        self, config: Config, flush_delay: float = 2, cold: Optional[ColdArchive] = None
+    ):
+        self.config = config
+        self.cold = cold
+        self.flush_delay = flush_delay
+        self._live: Dict[int, Dict[str, dict]] = {}
+        self._index: Dict[str, int] = {}
+        self._dirty: Dict[str, int] = {}
+        self._flush_task: Optional[asyncio.Task] = None
+        self._loaded = asyncio.Event()
+
+        self.config.init_custom(ARCHIVE, 2)
+        self.config.register_custom(ARCHIVE)
+
+    @property
+    def loaded(self) -> bool:
+        return self._loaded.is_set()
+
+    async def wait_until_loaded(self) -> None:
+        await self._loaded.wait()
+
+    async def load(self) -> int:
+        """Build the index from config, moving any ended giveaways to the archive"""
+        migrated = 0
+        with metrics.time("config", op="load"):
+            all_guilds = await self.config.all_guilds()
+        for guild_id, data in all_guilds.items():
+            ended = {}
+            for messageid, info in data["giveaways"].items():
+                outdated = compile_info(info)
+                if info["Ongoing"] or "ending" in info:
+                    self._insert(guild_id, str(messageid), info)
+                    if outdated:
+                        self.touch(messageid)
+                else:
+                    ended[str(messageid)] = info
+
+            if not ended:
+                continue
+            for messageid, info in ended.items():
+                await self._archive_group(guild_id, messageid).set(serialize(info))
+            async with self.config.guild_from_id(guild_id).giveaways() as giveaways:
+                for messageid in ended:
+                    giveaways.pop(messageid, None)
+            migrated += len(ended)
+
+        if migrated:
+            log.info("Moved %s ended giveaways to the archive", migrated)
+        self._loaded.set()
+        return migrated
+
+    def _insert(self, guild_id: int, messageid: str, info: dict) -> None:
+        compile_info(info)
+        self._live.setdefault(guild_id, {})[messageid] = info
+        self._index[messageid] = guild_id
+
+    def _archive_group(self, guild_id: int, messageid: str):
+        return self.config.custom(ARCHIVE, str(guild_id), str(messageid))
+
+    def __contains__(self, messageid) -> bool:
+        return str(messageid) in self._index
+
+    def __len__(self) -> int:
+        return len(self._index)
+
+    def get(self, messageid) -> Optional[dict]:
+        guild_id = self._index.get(str(messageid))
+        if guild_id is None:
+            return None
+        return self._live[guild_id][str(messageid)]
+
+    def guild_id(self, messageid) -> Optional[int]:
+        return self._index.get(str(messageid))
+
+    def guild_giveaways(self, guild_id: int) -> Dict[str, dict]:
+        return self._live.get(guild_id, {})
+
+    def all_giveaways(self) -> Iterable[Tuple[int, str, dict]]:
+        for guild_id, giveaways in self._live.items():
+            for messageid, info in giveaways.items():
+                yield guild_id, messageid, info
+
+    def add(self, guild_id: int, messageid, info: dict) -> None:
+        self._insert(guild_id, str(messageid), info)
+        self.touch(messageid)
+
+    def touch(self, messageid) -> None:
+        """Mark a live giveaway as changed so it gets written on the next flush"""
+        messageid = str(messageid)
+        guild_id = self._index.get(messageid)
+        if guild_id is None:
+            return
+        self._dirty[messageid] = guild_id
+        if self._flush_task is None or self._flush_task.done():
+            self._flush_task = asyncio.create_task(self._delayed_flush())
+
+    async def _delayed_flush(self) -> None:
+        # touches that land while a flush is writing are picked up by the next round
+        while self._dirty:
+            await asyncio.sleep(self.flush_delay)
+            await self.flush()
+
+    async def flush(self) -> None:
+        dirty, self._dirty = self._dirty, {}
+        for messageid, guild_id in dirty.items():
+            info = self._live.get(guild_id, {}).get(messageid)
+            if info is None:
+                continue
+            with metrics.time("config", op="flush"):
+                await self.config.guild_from_id(guild_id).giveaways.set_raw(
+                    messageid, value=serialize(info)
+                )
+
+    def _pop(self, messageid: str) -> Tuple[Optional[int], Optional[dict]]:
+        guild_id = self._index.pop(messageid, None)
+        self._dirty.pop(messageid, None)
+        if guild_id is None:
+            return None, None
+        info = self._live[guild_id].pop(messageid)
+        if not self._live[guild_id]:
+            del self._live[guild_id]
+        return guild_id, info
+
+    async def archive(self, messageid) -> Optional[dict]:
+        """Move a giveaway out of the live index and into the archive"""
+        messageid = str(messageid)
+        guild_id, info = self._pop(messageid)
+        if info is None:
+            return None
+        info.setdefault("ended", datetime.utcnow().timestamp())
+        with metrics.time("config", op="archive"):
+            await self._archive_group(guild_id, messageid).set(serialize(info))
+            await self.config.guild_from_id(guild_id).giveaways.clear_raw(messageid)
+        return info
+
+    async def remove(self, messageid) -> None:
+        """Forget a live giveaway completely, used when its message is gone"""
+        messageid = str(messageid)
+        guild_id, info = self._pop(messageid)
+        if info is None:
+            return
+        await self.config.guild_from_id(guild_id).giveaways.clear_raw(messageid)
+
+    async def get_archived(self, guild_id: int, messageid) -> Optional[dict]:
+        with metrics.time("config", op="get_archived"):
+            data = await self._archive_group(guild_id, messageid).all()
+        if not data and self.cold:
+            with metrics.time("config", op="get_cold"):
+                data = await self.cold.get(guild_id, messageid)
+        if not data:
+            return None
+        compile_info(data)
+        return data
+
+    async def update_archived(self, guild_id: int, messageid, info: dict) -> None:
+        with metrics.time("config", op="update_archived"):
+            await self._archive_group(guild_id, messageid).set(serialize(info))
+
+    async def all_archived(self, guild_id: int) -> Dict[str, dict]:
+        """The giveaways in the config archive, this doesn't include compacted ones"""
+        archived = await self.config.custom(ARCHIVE, str(guild_id)).all()
+        for info in archived.values():
+            compile_info(info)
+        return archived
+
+    async def clear_archived(self, guild_id: int, keep: Iterable[str] = ()) -> int:
+        keep = {str(k) for k in keep}
+        archived = await self.all_archived(guild_id)
+        to_delete = [messageid for messageid in archived if messageid not in keep]
+        for messageid in to_delete:
+            await self._archive_group(guild_id, messageid).clear()
+        cleared = set(to_delete)
+        if self.cold:
+            cold_ids = await self.cold.messageids(guild_id)
+            await self.cold.clear(guild_id, keep)
+            cleared |= cold_ids - keep
+        return len(cleared)
+
+    async def archived_count(self, guild_id: int) -> int:
+        archived = set(await self.all_archived(guild_id))
+        if self.cold:
+            archived |= await self.cold.messageids(guild_id)
+        return len(archived)
+
+    async def compact(self, guild_id: int, cutoff: float) -> List[str]:
+        """Move giveaways that ended before ``cutoff`` from config to the cold archive"""
+        if not self.cold:
+            return []
+        archived = await self.all_archived(guild_id)
+        old = {
+            messageid: serialize(info)
+            for messageid, info in archived.items()
+            if info.get("ended", info.get("endtime", 0)) < cutoff
+        }
+        if not old:
+            return []
+        await self.cold.append(guild_id, old)
+        for messageid in old:
+            await self._archive_group(guild_id, messageid).clear()
+        return list(old)
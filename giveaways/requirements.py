@@ -0,0 +1,103 @@
+from typing import Iterable, Optional, Union
+
+# checks that only need the member, in the order they run
+LOCAL_KEYS = ("roles", "joindays", "server")
+# checks that need an API or another cog's config
+REMOTE_KEYS = ("mee6", "amari", "weeklyamari", "shared", "invites")
+FIELDS = LOCAL_KEYS + REMOTE_KEYS
+
+
+class Requirements:
+    """A giveaway's requirements, compiled once when the giveaway starts.
+
+    Instances are immutable. ``remote`` holds the keys that need an outside lookup
+    so callers can skip them entirely when nothing needs them. In config they are
+    stored compactly by ``to_dict``, with only the requirements that are set.
+    """
+
+    __slots__ = FIELDS + ("remote",)
+
+    def __init__(
+        self,
+        roles: Optional[Iterable[int]] = None,
+        joindays: Optional[int] = None,
+        server: Optional[int] = None,
+        mee6: Optional[int] = None,
+        amari: Optional[int] = None,
+        weeklyamari: Optional[int] = None,
+        shared: Optional[int] = None,
+        invites: Optional[int] = None,
+    ):
+        values = {
+            "roles": frozenset(int(r) for r in roles or ()),
+            "joindays": joindays,
+            "server": server,
+            "mee6": mee6,
+            "amari": amari,
+            "weeklyamari": weeklyamari,
+            "shared": shared,
+            "invites": invites,
+        }
+        for key, value in values.items():
+            object.__setattr__(self, key, value)
+        object.__setattr__(
+            self, "remote", frozenset(key for key in REMOTE_KEYS if values[key])
+        )
+
+    def __setattr__(self, key, value):
+        raise AttributeError("Requirements can't be changed once compiled")
+
+    def __bool__(self) -> bool:
+        return any(getattr(self, key) for key in FIELDS)
+
+    def __eq__(self, other) -> bool:
+        if not isinstance(other, Requirements):
+            return NotImplemented
+        return all(getattr(self, key) == getattr(other, key) for key in FIELDS)
+
+    def __hash__(self) -> int:
+        return hash(tuple(getattr(self, key) for key in FIELDS))
+
+    def __repr__(self) -> str:
+        set_values = ", ".join(f"{key}={getattr(self, key)!r}" for key in FIELDS if getattr(self, key))
+        return f"<Requirements {set_values or 'none'}>"
+
+    @classmethod
+    def from_dict(cls, data: Optional[dict]) -> "Requirements":
+        """Compile stored requirements, both the compact form and the old one with every key"""
+        if not data:
+            return cls()
+        return cls(**{key: data.get(key) for key in FIELDS})
+
+    @classmethod
+    def load(cls, data: Union["Requirements", dict, None]) -> "Requirements":
+        if isinstance(data, cls):
+            return data
+        return cls.from_dict(data)
+
+    def to_dict(self) -> dict:
+        data = {}
+        for key in FIELDS:
+            value = getattr(self, key)
+            if not value:
+                continue
+            data[key] = sorted(value) if key == "roles" else value
+        return data
+
+
+def serialize(info: dict) -> dict:
+    """A copy of a giveaway that can be written to config"""
+    requirements = info.get("requirements")
+    if isinstance(requirements, Requirements):
+        info = dict(info, requirements=requirements.to_dict())
+    return info
+
+
+def compile_info(info: dict) -> bool:
+    """Compile a giveaway's requirements in place, returns whether its stored form is outdated"""
+    stored = info.get("requirements")
+    if isinstance(stored, Requirements):
+        return False
+    requirements = Requirements.from_dict(stored)
+    info["requirements"] = requirements
+    return stored != requirements.to_dict()
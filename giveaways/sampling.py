@@ -0,0 +1,51 @@
+import hashlib
+import heapq
+import math
+import secrets
+
+from typing import Iterable, List, Tuple
+
+
+def draw_seed() -> int:
+    return secrets.randbits(63)
+
+
+def _uniform(seed: int, user_id: int) -> float:
+    digest = hashlib.blake2b(f"{seed}:{user_id}".encode(), digest_size=8).digest()
+    return (int.from_bytes(digest, "big") + 1) / 2 ** 64
+
+
+def weighted_sample(
+    entries: Iterable[Tuple[int, int]], k: int, seed: int, exclude: Iterable[int] = ()
+) -> List[int]:
+    """Pick ``k`` distinct user ids, weighted by their entries (Efraimidis-Spirakis).
+
+    Every user gets the key ``log(u) / weight`` and the ``k`` largest keys win. ``u`` is
+    derived from the seed and the user id, so the same seed and entrants always give
+    the same winners no matter what order the reactions came back in.
+    """
+    exclude = set(exclude)
+    keys = (
+        (math.log(_uniform(seed, user_id)) / weight, user_id)
+        for user_id, weight in entries
+        if weight > 0 and user_id not in exclude
+    )
+    return [user_id for _, user_id in heapq.nlargest(k, keys)]
+
+
+def run_draw(
+    entries: Iterable[Tuple[int, int]],
+    k: int,
+    seed: int,
+    previous: Iterable[int] = (),
+    exclude_previous: bool = False,
+) -> dict:
+    """One draw as it's recorded on a giveaway, ``{"seed", "winners", "exclude_previous"}``.
+
+    The ``previous`` winners can win again unless ``exclude_previous`` is set.
+    """
+    return {
+        "seed": seed,
+        "winners": weighted_sample(entries, k, seed, exclude=previous if exclude_previous else ()),
+        "exclude_previous": exclude_previous,
+    }
@@ -0,0 +1,126 @@
+import asyncio
+import heapq
+import itertools
+import logging
+
+from datetime import datetime
+from typing import Awaitable, Callable, Dict, List, Optional, Tuple
+
+Batch = List[Tuple[int, dict]]
+
+log = logging.getLogger("red.andycogs.giveaways.scheduler")
+
+
+def now() -> float:
+    return datetime.utcnow().timestamp()
+
+
+class GiveawayScheduler:
+    """A single worker that drives every giveaway countdown.
+
+    Giveaways sit in a heap keyed on the next time they need attention, which is
+    either a countdown refresh or their end time. Due refreshes and endings are
+    handed to the callbacks in batches instead of having one sleeping task per giveaway.
+    Cancelling marks the heap entry as dead so it is skipped when popped.
+    """
+
+    def __init__(
+        self,
+        refresh: Callable[[Batch], Awaitable[None]],
+        end: Callable[[Batch], Awaitable[None]],
+        batch_size: int = 25,
+    ):
+        self.refresh = refresh
+        self.end = end
+        self.batch_size = batch_size
+        self._heap = []
+        self._entries: Dict[int, list] = {}
+        self._counter = itertools.count()
+        self._wakeup = asyncio.Event()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def __contains__(self, messageid) -> bool:
+        return int(messageid) in self._entries
+
+    @property
+    def depth(self) -> int:
+        return len(self._entries)
+
+    def next_wakeup(self) -> Optional[float]:
+        self._discard_dead()
+        return self._heap[0][0] if self._heap else None
+
+    @staticmethod
+    def next_refresh(endtime: float, current: float) -> float:
+        remaining = endtime - current
+        if remaining <= 60:
+            return endtime
+        return current + round(remaining / 4)
+
+    def schedule(self, messageid, info: dict, when: Optional[float] = None) -> None:
+        """Add or move a giveaway, by default it gets refreshed right away"""
+        messageid = int(messageid)
+        self.cancel(messageid)
+        when = now() if when is None else min(when, info["endtime"])
+        entry = [when, next(self._counter), messageid, info]
+        self._entries[messageid] = entry
+        heapq.heappush(self._heap, entry)
+        if self._heap[0] is entry:
+            self._wakeup.set()
+
+    def reschedule(self, messageid, info: dict) -> None:
+        self.schedule(messageid, info, self.next_refresh(info["endtime"], now()))
+
+    def cancel(self, messageid) -> bool:
+        entry = self._entries.pop(int(messageid), None)
+        if entry is None:
+            return False
+        entry[2] = None
+        return True
+
+    def _discard_dead(self) -> None:
+        while self._heap and self._heap[0][2] is None:
+            heapq.heappop(self._heap)
+
+    def _pop_due(self, current: float) -> Tuple[Batch, Batch]:
+        refresh, end = [], []
+        while self._heap and self._heap[0][0] <= current:
+            _, _, messageid, info = heapq.heappop(self._heap)
+            if messageid is None:
+                continue
+            del self._entries[messageid]
+            if info["endtime"] <= current:
+                end.append((messageid, info))
+            else:
+                refresh.append((messageid, info))
+        return refresh, end
+
+    async def _dispatch(self, callback, batch: Batch) -> None:
+        for i in range(0, len(batch), self.batch_size):
+            try:
+                await callback(batch[i : i + self.batch_size])
+            except asyncio.CancelledError:
+                raise
+            except Exception:
+                log.exception("Scheduler callback %r failed", callback)
+
+    async def run(self) -> None:
+        while True:
+            self._wakeup.clear()
+            current = now()
+            refresh, end = self._pop_due(current)
+
+            for messageid, info in refresh:
+                self.reschedule(messageid, info)
+
+            await self._dispatch(self.end, end)
+            await self._dispatch(self.refresh, refresh)
+
+            wakeup = self.next_wakeup()
+            timeout = None if wakeup is None else max(wakeup - now(), 0)
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout=timeout)
+            except asyncio.TimeoutError:
+                pass
@@ -0,0 +1,127 @@
+import random
+
+from typing import Iterable, Iterator, List, Optional, Tuple
+
+MAX_LEVEL = 32
+
+
+class _Node:
+    __slots__ = ("key", "next", "width")
+
+    def __init__(self, key, level: int):
+        self.key = key
+        self.next: List[Optional[_Node]] = [None] * level
+        # how many places each link moves forward, summed on the way down to find a rank
+        self.width = [1] * level
+
+
+class SkipList:
+    """Sorted unique keys with expected O(log n) insert, remove and rank.
+
+    This is an indexable skip list, every link knows how many nodes it skips so the
+    position of a key is found on the same walk that finds the key. Iterating starts
+    at the smallest key and costs O(1) per key.
+    """
+
+    def __init__(self, keys: Iterable = ()):
+        self.build(sorted(keys))
+
+    def __len__(self) -> int:
+        return self._size
+
+    def __iter__(self) -> Iterator:
+        node = self._head.next[0]
+        while node is not None:
+            yield node.key
+            node = node.next[0]
+
+    @staticmethod
+    def _random_level() -> int:
+        # each extra level is a coin flip, read off the low bits of one random number
+        bits = random.getrandbits(MAX_LEVEL - 1)
+        level = 1
+        while bits & 1:
+            level += 1
+            bits >>= 1
+        return level
+
+    def build(self, keys: Iterable) -> None:
+        """Replace the contents with ``keys``, which must already be sorted, in O(n)"""
+        self._head = _Node(None, MAX_LEVEL)
+        self._level = 1
+        self._size = 0
+        last = [self._head] * MAX_LEVEL
+        last_rank = [0] * MAX_LEVEL
+        for rank, key in enumerate(keys, start=1):
+            level = self._random_level()
+            node = _Node(key, level)
+            for i in range(level):
+                last[i].next[i] = node
+                last[i].width[i] = rank - last_rank[i]
+                last[i] = node
+                last_rank[i] = rank
+            self._level = max(self._level, level)
+            self._size = rank
+
+    def _path(self, key) -> Tuple[List[_Node], List[int]]:
+        """The last node before ``key`` on every level and their ranks"""
+        update = [self._head] * MAX_LEVEL
+        ranks = [0] * MAX_LEVEL
+        node = self._head
+        rank = 0
+        for i in range(self._level - 1, -1, -1):
+            following = node.next[i]
+            while following is not None and following.key < key:
+                rank += node.width[i]
+                node = following
+                following = node.next[i]
+            update[i] = node
+            ranks[i] = rank
+        return update, ranks
+
+    def insert(self, key) -> None:
+        update, ranks = self._path(key)
+        level = self._random_level()
+        self._level = max(self._level, level)
+        node = _Node(key, level)
+        rank = ranks[0] + 1
+        for i in range(level):
+            previous = update[i]
+            node.next[i] = previous.next[i]
+            node.width[i] = previous.width[i] + ranks[i] + 1 - rank
+            previous.next[i] = node
+            previous.width[i] = rank - ranks[i]
+        for i in range(level, self._level):
+            if update[i].next[i] is not None:
+                update[i].width[i] += 1
+        self._size += 1
+
+    def remove(self, key) -> None:
+        update, _ = self._path(key)
+        node = update[0].next[0]
+        if node is None or node.key != key:
+            raise KeyError(key)
+        for i in range(self._level):
+            previous = update[i]
+            if previous.next[i] is node:
+                previous.next[i] = node.next[i]
+                previous.width[i] += node.width[i] - 1
+            elif previous.next[i] is not None:
+                previous.width[i] -= 1
+        while self._level > 1 and self._head.next[self._level - 1] is None:
+            self._level -= 1
+        self._size -= 1
+
+    def rank(self, key) -> Optional[int]:
+        """The 1 based position of ``key``, or None if it isn't in the list"""
+        node = self._head
+        rank = 0
+        for i in range(self._level - 1, -1, -1):
+            following = node.next[i]
+            while following is not None and following.key <= key:
+                rank += node.width[i]
+                node = following
+                following = node.next[i]
+        if node is self._head or node.key != key:
+            return None
+        return rank
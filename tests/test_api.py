@@ -0,0 +1,87 @@
+import asyncio
+
+from giveaways.api import mee6_api
+
+
+class FakeLevels:
+    def __init__(self, members: int):
+        self.members = members
+        self.pages = 0
+        self.users = 0
+
+    async def get_leaderboard_page(self, page: int):
+        self.pages += 1
+        await asyncio.sleep(0.01)
+        ids = range(page * 100, min((page + 1) * 100, self.members))
+        return {"players": [{"id": str(i), "level": 7} for i in ids]}
+
+    async def get_user_level(self, user_id: int):
+        self.users += 1
+        return 3
+
+
+class FakeAPI:
+    def __init__(self, members: int):
+        self.levels = FakeLevels(members)
+
+
+def make_api(members: int):
+    api = mee6_api(rate=1000, burst=5)
+    fake = FakeAPI(members)
+    api._api = lambda guild: fake
+    return api, fake.levels
+
+
+def test_reaction_misses_share_one_prefetch():
+    async def run():
+        api, levels = make_api(members=250)
+        results = await asyncio.gather(*(api.lookup(1, user) for user in range(0, 600, 20)))
+        return results, levels
+
+    results, levels = asyncio.run(run())
+    assert levels.pages == 3
+    assert levels.users == 0
+    # members past the end of a complete leaderboard aren't ranked
+    assert results == [7 if user < 250 else 0 for user in range(0, 600, 20)]
+
+
+def test_lookup_falls_back_past_the_prefetched_pages():
+    async def run():
+        api, levels = make_api(members=10_000)
+        first = await api.lookup(1, 50, pages=2)
+        second = await api.lookup(1, 5_000, pages=2)
+        return first, second, levels
+
+    first, second, levels = asyncio.run(run())
+    assert (first, second) == (7, 3)
+    assert levels.pages == 2
+    assert levels.users == 1
+
+
+def test_prefetch_is_not_repeated_within_ttl():
+    async def run():
+        api, levels = make_api(members=10_000)
+        await api.prefetch(1, 2)
+        await api.prefetch(1, 1)
+        await api.prefetch(1, 2)
+        return levels
+
+    assert asyncio.run(run()).pages == 2
+
+
+def test_bigger_prefetch_continues_after_a_running_one():
+    async def run():
+        api, levels = make_api(members=10_000)
+        reaction = asyncio.ensure_future(api.prefetch(1, 2))
+        await asyncio.sleep(0)
+        end = await api.prefetch(1, 6)
+        await reaction
+        # everyone on the first six pages is cached, nobody needs a call of their own
+        results = [await api.lookup(1, user, pages=6) for user in range(0, 600, 50)]
+        return end, levels, results
+
+    end, levels, results = asyncio.run(run())
+    assert end is False
+    assert levels.pages == 6
+    assert levels.users == 0
+    assert results == [7] * 12
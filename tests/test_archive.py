@@ -0,0 +1,32 @@
+import asyncio
+
+from giveaways.archive import ColdArchive
+
+
+def test_archive_round_trip(tmp_path):
+    async def run():
+        archive = ColdArchive(tmp_path)
+        await archive.append(1, {"10": {"title": "a"}, "11": {"title": "b"}})
+        await archive.append(1, {"11": {"title": "c"}})
+        results = [
+            await archive.get(1, 10),
+            await archive.get(1, "11"),
+            await archive.get(1, 12),
+            await archive.count(1),
+        ]
+        cleared = await archive.clear(1, keep=["11"])
+        results += [cleared, await archive.messageids(1), await archive.get(1, 11)]
+        # a fresh instance reads the index back from disk
+        results.append(await ColdArchive(tmp_path).get(1, 11))
+        return results
+
+    assert asyncio.run(run()) == [
+        {"title": "a"},
+        {"title": "c"},
+        None,
+        2,
+        1,
+        {"11"},
+        {"title": "c"},
+        {"title": "c"},
+    ]
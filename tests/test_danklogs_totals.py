@@ -0,0 +1,32 @@
+from danklogs.aggregates import GuildAggregates, Leaderboard
+from danklogs.store import Total, TransactionStore
+
+
+def test_aggregates_from_seeded_and_logged_totals(tmp_path):
+    store = TransactionStore(tmp_path)
+    store.seed_totals(1, [Total(10, "", 500, 0), Total(10, "meme", 2, 0), Total(20, "", 0, 500)])
+    store.add(1, 20, 10, 300)
+    store.add(1, 10, 30, 3, item="meme")
+    assert store.totals_seeded(1)
+
+    aggregates = GuildAggregates(store.totals(1), {"meme": 1000})
+    assert aggregates["shared"].top(3) == [(10, 500), (20, 300)]
+    assert aggregates["received"].top(3) == [(20, 500), (10, 300)]
+    assert aggregates["giftedvalue"].top(3) == [(10, 5000)]
+    assert aggregates["receivedvalue"].top(3) == [(30, 3000)]
+    store.close()
+
+
+
+def test_leaderboard_bulk_add_matches_single_adds():
+    totals = {member_id: member_id * 10 for member_id in range(1, 101)}
+    few = {5: 1_000, 6: -60}
+    many = {member_id: (-1) ** member_id * 7 for member_id in range(1, 101)}
+    for amounts in (few, many):
+        bulk, single = Leaderboard(totals), Leaderboard(totals)
+        bulk.bulk_add(amounts)
+        for member_id, amount in amounts.items():
+            single.add(member_id, amount)
+        assert bulk.top(100) == single.top(100)
+        assert [bulk.rank(m) for m in totals] == [single.rank(m) for m in totals]
+    assert bulk.top(2) == [(100, 1_007), (98, 987)]
@@ -0,0 +1,66 @@
+import asyncio
+import discord
+
+from giveaways.dms import PRIORITY_LOW, DMQueue
+
+
+class User:
+    def __init__(self, user_id: int):
+        self.id = user_id
+        self.received = []
+
+    async def send(self, content=None, embed=None):
+        self.received.append(content)
+
+
+def test_dedup_key_is_only_kept_for_sent_dms():
+    async def run():
+        queue = DMQueue(workers=1, max_low=1)
+        first, second = User(1), User(2)
+        assert queue.send(first, content="a", priority=PRIORITY_LOW, dedup_key="a")
+        # deduplicated while the first is still waiting
+        assert not queue.send(first, content="a", priority=PRIORITY_LOW, dedup_key="a")
+        # dropped because the low priority queue is full, this must not block a later send
+        assert not queue.send(second, content="b", priority=PRIORITY_LOW, dedup_key="b")
+
+        queue.start()
+        await queue._queue.join()
+        assert queue.send(second, content="b", priority=PRIORITY_LOW, dedup_key="b")
+        await queue._queue.join()
+        assert not queue.send(first, content="a", priority=PRIORITY_LOW, dedup_key="a")
+        queue.stop()
+        return queue, first, second
+
+    queue, first, second = asyncio.run(run())
+    assert first.received == ["a"]
+    assert second.received == ["b"]
+    assert (queue.sent, queue.dropped, queue.deduped) == (2, 1, 2)
+
+
+class ClosedDMs(User):
+    async def send(self, content=None, embed=None):
+        self.received.append(content)
+        raise discord.Forbidden(Response(403, "Forbidden"), "Cannot send messages to this user")
+
+
+class Response:
+    def __init__(self, status: int, reason: str):
+        self.status = status
+        self.reason = reason
+        self.headers = {}
+
+
+def test_closed_dms_are_deduplicated():
+    async def run():
+        queue = DMQueue(workers=1)
+        user = ClosedDMs(1)
+        queue.start()
+        assert queue.send(user, content="a", priority=PRIORITY_LOW, dedup_key="a")
+        await queue._queue.join()
+        assert not queue.send(user, content="a", priority=PRIORITY_LOW, dedup_key="a")
+        queue.stop()
+        return queue, user
+
+    queue, user = asyncio.run(run())
+    assert user.received == ["a"]
+    assert (queue.sent, queue.failed, queue.deduped) == (0, 1, 1)
@@ -0,0 +1,93 @@
+import asyncio
+
+from giveaways.donators import DonatorReconciler
+
+
+class Role:
+    def __init__(self, role_id: int):
+        self.id = role_id
+        self.members = []
+
+    def __hash__(self):
+        return self.id
+
+
+EDITS = {"started": 0, "finished": 0}
+
+
+class Member:
+    def __init__(self, member_id: int, roles):
+        self.id = member_id
+        self.roles = list(roles)
+        self.bot = False
+
+    async def add_roles(self, *roles, reason=None):
+        EDITS["started"] += 1
+        await asyncio.sleep(0.02)
+        self.roles += roles
+        EDITS["finished"] += 1
+
+    async def remove_roles(self, *roles, reason=None):
+        await asyncio.sleep(0.02)
+        self.roles = [role for role in self.roles if role not in roles]
+
+
+class Guild:
+    id = 1
+
+    def __init__(self, roles, members):
+        self._roles = {role.id: role for role in roles}
+        self._members = {member.id: member for member in members}
+
+    def get_role(self, role_id):
+        return self._roles.get(role_id)
+
+    def get_member(self, member_id):
+        return self._members.get(member_id)
+
+
+class Value:
+    def __init__(self, value):
+        self.value = value
+
+    async def __call__(self):
+        return self.value
+
+
+class Config:
+    def __init__(self, thresholds, donations):
+        self.thresholds = thresholds
+        self.donations = donations
+        self.plans = 0
+
+    def guild(self, guild):
+        return type("Group", (), {"donatorroles": Value(self.thresholds)})()
+
+    async def all_members(self, guild):
+        self.plans += 1
+        return {str(m): {"donated": d} for m, d in self.donations.items()}
+
+
+def test_schedule_during_a_sync_runs_it_again_instead_of_cancelling():
+    async def run():
+        role = Role(9)
+        members = [Member(member_id, []) for member_id in range(1, 6)]
+        config = Config({"9": 10}, {member.id: 20 for member in members})
+        reconciler = DonatorReconciler(config, rate=1000)
+        guild = Guild([role], members)
+
+        reconciler.schedule(guild, delay=0)
+        await asyncio.sleep(0.03)
+        assert reconciler.running(guild.id)
+        # a donation lands halfway through the role edits
+        config.donations[6] = 20
+        guild._members[6] = Member(6, [])
+        reconciler.schedule(guild, delay=0)
+        await reconciler._scheduled[guild.id]
+        return config, guild
+
+    config, guild = asyncio.run(run())
+    assert config.plans == 2
+    assert all(member.roles for member in guild._members.values())
+    # no role edit was cut off by the second schedule
+    assert EDITS["started"] == EDITS["finished"] == 6
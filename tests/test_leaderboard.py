@@ -0,0 +1,36 @@
+import random
+
+from giveaways.leaderboard import DonationLeaderboard
+from giveaways.skiplist import SkipList
+
+
+def test_skiplist_matches_a_sorted_list():
+    rng = random.Random(7)
+    skiplist = SkipList(rng.sample(range(10_000), 300))
+    expected = sorted(skiplist)
+    for _ in range(2_000):
+        key = rng.randrange(10_000)
+        if key in expected:
+            skiplist.remove(key)
+            expected.remove(key)
+        else:
+            skiplist.insert(key)
+            expected.append(key)
+            expected.sort()
+        probe = rng.choice(expected)
+        assert skiplist.rank(probe) == expected.index(probe) + 1
+    assert list(skiplist) == expected
+    assert len(skiplist) == len(expected)
+    assert skiplist.rank(-1) is None
+
+
+def test_donation_leaderboard_orders_and_ranks():
+    board = DonationLeaderboard({1: 100, 2: 300, 3: 0, 4: 300})
+    assert board.top(10) == [(2, 300), (4, 300), (1, 100)]
+    board.update(1, 500)
+    board.update(4, 0)
+    assert board.top(2) == [(1, 500), (2, 300)]
+    assert board.rank(2) == 2
+    assert board.rank(4) is None
+    assert board.top(5, include=lambda member_id: member_id != 1) == [(2, 300)]
+    assert len(board) == 2
@@ -0,0 +1,99 @@
+import asyncio
+
+from types import SimpleNamespace
+
+from giveaways import giveaway as giveaway_module
+from giveaways.evaluation import Evaluation
+from giveaways.giveaway import Giveaways
+from giveaways.ledger import EntrantLedger
+
+
+def test_forget_keeps_unflushed_entries(tmp_path):
+    async def run():
+        ledger = EntrantLedger(tmp_path, flush_delay=60)
+        ledger.start(100)
+        ledger.add(100, 1, 2)
+        ledger.add(100, 2, 1)
+        ledger.remove(100, 2)
+        ledger.forget(100)
+        return ledger.entries(100)
+
+    assert asyncio.run(run()) == {1: 2}
+
+
+def test_delete_drops_pending_lines(tmp_path):
+    async def run():
+        ledger = EntrantLedger(tmp_path, flush_delay=60)
+        ledger.start(100)
+        ledger.add(100, 1, 1)
+        ledger.delete(100)
+        ledger.flush()
+        return ledger.entries(100)
+
+    assert asyncio.run(run()) is None
+
+
+class Reactor:
+    def __init__(self, user_id: int):
+        self.id = user_id
+        self.bot = False
+
+
+class Reaction:
+    def __init__(self, user_ids):
+        self.user_ids = user_ids
+
+    async def users(self):
+        for user_id in self.user_ids:
+            yield Reactor(user_id)
+
+
+class Guild:
+    def __init__(self, member_ids):
+        self.member_ids = set(member_ids)
+
+    def get_member(self, user_id):
+        return object() if user_id in self.member_ids else None
+
+
+class Evaluator:
+    def __init__(self, cog, guild, info, entrants=0):
+        self.evaluation = Evaluation()
+
+    async def prepare(self):
+        pass
+
+    async def add(self, users):
+        for user in users:
+            self.evaluation.weights[user.id] = 3
+
+
+class Cog:
+    def __init__(self, ledger):
+        self.ledger = ledger
+        self.registry = {}
+
+    async def get_secretblacklist(self):
+        return []
+
+
+def test_ledger_is_reconciled_with_the_reactors(tmp_path, monkeypatch):
+    monkeypatch.setattr(giveaway_module, "EntrantEvaluator", Evaluator)
+
+    async def run():
+        ledger = EntrantLedger(tmp_path, flush_delay=60)
+        ledger.start(100)
+        for user_id in (1, 2, 4):
+            ledger.add(100, user_id, 1)
+        # restarted, 2 unreacted and 3 reacted while we were offline, 4 left the server
+        ledger.invalidate()
+        message = SimpleNamespace(guild=Guild({1, 2, 3}))
+        cog = Cog(ledger)
+        evaluation = await Giveaways.ledger_evaluation(
+            cog, 100, message, {}, Reaction([1, 3, 4])
+        )
+        return evaluation, ledger
+
+    evaluation, ledger = asyncio.run(run())
+    assert evaluation.weights == {1: 1, 3: 3}
+    assert ledger.entries(100) == {1: 1, 3: 3, 4: 1}
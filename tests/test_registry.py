@@ -0,0 +1,56 @@
+import asyncio
+
+from giveaways.registry import GiveawayRegistry
+
+
+class SlowGroup:
+    def __init__(self, store: dict, delay: float):
+        self.store = store
+        self.delay = delay
+
+    async def set_raw(self, messageid, value):
+        await asyncio.sleep(self.delay)
+        self.store[messageid] = dict(value)
+
+
+class SlowGuild:
+    def __init__(self, store: dict, delay: float):
+        self.giveaways = SlowGroup(store, delay)
+
+
+class SlowConfig:
+    """Just enough of Config for the registry, with a ``set_raw`` that takes a while"""
+
+    def __init__(self, delay: float):
+        self.delay = delay
+        self.stored = {}
+
+    def init_custom(self, *args):
+        pass
+
+    def register_custom(self, *args):
+        pass
+
+    def guild_from_id(self, guild_id: int):
+        return SlowGuild(self.stored.setdefault(guild_id, {}), self.delay)
+
+
+def test_touch_during_flush_is_written():
+    async def run():
+        config = SlowConfig(delay=0.05)
+        registry = GiveawayRegistry(config, flush_delay=0.01)
+        registry.add(1, 100, {"Ongoing": True, "title": "first"})
+
+        # wait until the first flush is in the middle of its set_raw
+        await asyncio.sleep(0.03)
+        assert registry._dirty == {}
+        registry.add(1, 200, {"Ongoing": True, "title": "second"})
+        registry.get(100)["title"] = "changed"
+        registry.touch(100)
+
+        await asyncio.sleep(0.3)
+        return config.stored[1]
+
+    stored = asyncio.run(run())
+    assert stored["200"]["title"] == "second"
+    assert stored["100"]["title"] == "changed"
@@ -0,0 +1,40 @@
+import random
+
+from giveaways.sampling import run_draw, weighted_sample
+
+
+def test_same_seed_and_entries_give_same_winners():
+    entries = [(user_id, user_id % 5) for user_id in range(1, 200)]
+    shuffled = entries[:]
+    random.Random(1).shuffle(shuffled)
+
+    first = weighted_sample(entries, 5, 1234)
+    assert len(first) == 5
+    assert weighted_sample(shuffled, 5, 1234) == first
+    assert weighted_sample(entries, 5, 4321) != first
+
+
+def test_replaying_a_reroll_excludes_earlier_winners():
+    entries = [(user_id, 1) for user_id in range(1, 50)]
+    first = weighted_sample(entries, 3, 1)
+    reroll = weighted_sample(entries, 2, 2, exclude=first)
+    assert not set(first) & set(reroll)
+    assert weighted_sample(entries, 2, 2, exclude=first) == reroll
+
+
+def test_zero_weights_never_win():
+    entries = [(1, 0), (2, 0), (3, 1)]
+    assert weighted_sample(entries, 3, 99) == [3]
+
+
+def test_reroll_can_pick_previous_winners_unless_excluded():
+    entries = [(1, 100), (2, 1), (3, 1)]
+    first = run_draw(entries, 1, 5)
+    assert first == {"seed": 5, "winners": [1], "exclude_previous": False}
+
+    again = run_draw(entries, 1, 5, previous=first["winners"])
+    assert again["winners"] == [1]
+
+    excluded = run_draw(entries, 1, 5, previous=first["winners"], exclude_previous=True)
+    assert excluded["winners"] in ([2], [3])
+    assert excluded["exclude_previous"] is True